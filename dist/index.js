@@ -52294,6 +52294,8 @@ function invokeModel(client_1, modelId_1, payloadInput_1) {
                                     max_new_tokens: 256,
                                     temperature: 0.1,
                                 },
+                                // Re-runs of the same review are answered from the Lambda's prompt cache
+                                cache: true,
                             };
                             return [4 /*yield*/, fetch("https://".concat(endpoint), {
                                     method: 'POST',
@@ -0,0 +1,83 @@
+"""
+Description: Compares one invocation per prompt with the batch request shape of lambda_function.py.
+
+A review burst of --prompts PR files (with two parameter sets and one prompt that makes the model
+fail) is sent once as that many single-prompt invocations, the way the action calls the API today,
+and once as a single {"prompts": [...]} request. Both run against stub_runtime.py, and the report
+shows endpoint calls, wall time, and whether the batched results match the single ones in order.
+Last, a request mixing valid and malformed items checks that each malformed item gets its own error.
+
+Usage:
+python bench_batching.py [--prompts 40] [--overhead 0.05] [--capacity 4]
+"""
+
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "stub-endpoint")
+
+import lambda_function
+import stub_runtime
+
+
+def make_prompts(count):
+    prompts = []
+    for i in range(count):
+        prompt = f"Review this diff of file_{i}.py:\n" + "+    x = compute(x)\n" * (5 + i % 20)
+        if i == count // 2:
+            prompt += "FAIL"
+        # Test files get longer reviews
+        params = {"max_new_tokens": 512 if i % 5 == 0 else 256, "temperature": 0.1}
+        prompts.append({"prompt": prompt, "parameters": params})
+    return prompts
+
+
+def single(prompt):
+    response = lambda_function.lambda_handler({"body": json.dumps(prompt)}, None)
+    return json.loads(response["body"])
+
+
+def main(args):
+    prompts = make_prompts(args.prompts)
+    report = {"prompts": args.prompts}
+
+    stub = lambda_function.smr_client = stub_runtime.StubSageMakerRuntime(args.overhead, capacity=args.capacity)
+    start = time.perf_counter()
+    # Concurrent Lambda invocations, one per prompt
+    with ThreadPoolExecutor(max_workers=args.prompts) as executor:
+        expected = list(executor.map(single, prompts))
+    report["single"] = {"endpoint_calls": stub.calls, "seconds": round(time.perf_counter() - start, 3)}
+
+    stub = lambda_function.smr_client = stub_runtime.StubSageMakerRuntime(args.overhead, capacity=args.capacity)
+    start = time.perf_counter()
+    response = lambda_function.lambda_handler({"body": json.dumps({"prompts": prompts})}, None)
+    body = json.loads(response["body"])
+    report["batched"] = {"endpoint_calls": stub.calls, "batches": body["batches"],
+                         "seconds": round(time.perf_counter() - start, 3)}
+
+    results = body["results"]
+    report["same_results_in_order"] = all(
+        ("error" in got) == ("error" in want) and (got.get("generated_text") == want.get("generated_text"))
+        for got, want in zip(results, expected)) and len(results) == len(expected)
+    report["errors"] = [i for i, result in enumerate(results) if "error" in result]
+
+    # Malformed items get an error in their own slot; the well-formed ones are still answered
+    malformed = [prompts[0], {"prompt": "x", "parameters": "fast"}, {"prompt": 42},
+                 {"prompt": "x", "parameters": {"max_new_tokens": None}}, prompts[1]]
+    response = lambda_function.lambda_handler({"body": json.dumps({"prompts": malformed})}, None)
+    results = json.loads(response["body"]).get("results", [])
+    report["malformed_items"] = {"status": response["statusCode"],
+                                 "errors": [i for i, result in enumerate(results) if "error" in result]}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark batched against per-prompt inference")
+    parser.add_argument("--prompts", type=int, default=40, help="Prompts in the burst (default 40)")
+    parser.add_argument("--overhead", type=float, default=0.05, help="Stub endpoint overhead per call in seconds (default 0.05)")
+    parser.add_argument("--capacity", type=int, default=4, help="Calls the stub endpoint serves at once (default 4)")
+    main(parser.parse_args())
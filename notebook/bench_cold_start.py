@@ -0,0 +1,99 @@
+"""
+Description: Measures cold-start cost of lambda_function.py: import, first invocation and warm invocations.
+
+Every run starts a fresh interpreter, as a new Lambda container would, and times the import of the
+module (which creates the SageMaker runtime client), the first invocation and the median of the
+warm ones. The endpoint is answered by botocore's Stubber on the module's own client, so request
+serialization and the client's first-call setup are part of the timings while nothing leaves the
+machine. --baseline times another version of the file the same way, and the --max-* limits make
+the script exit non-zero on a regression.
+
+Usage:
+python bench_cold_start.py [--runs 5] [--warm 20] [--baseline old_lambda_function.py] [--max-import-ms 400]
+"""
+
+import argparse
+import importlib.util
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ENVIRONMENT = {"AWS_DEFAULT_REGION": "us-east-1", "AWS_ACCESS_KEY_ID": "stub", "AWS_SECRET_ACCESS_KEY": "stub",
+               "SAGEMAKER_ENDPOINT_NAME": "stub-endpoint"}
+
+
+def measure(path, warm):
+    """Timings of one fresh container, in milliseconds."""
+    start = time.perf_counter()
+    spec = importlib.util.spec_from_file_location("lambda_function", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    imported = time.perf_counter()
+
+    from botocore.response import StreamingBody
+    from botocore.stub import Stubber
+    stubber = Stubber(module.smr_client)
+    payload = json.dumps({"generated_text": "# looks good"}).encode()
+    for _ in range(warm + 1):
+        stubber.add_response("invoke_endpoint", {"Body": StreamingBody(io.BytesIO(payload), len(payload)),
+                                                 "ContentType": "application/json"})
+    stubber.activate()
+    # temperature > 0, so the prompt cache does not answer the warm invocations
+    event = {"body": json.dumps({"prompt": "def main():", "parameters": {"max_new_tokens": 16, "temperature": 0.1}})}
+
+    invocation = time.perf_counter()
+    response = module.lambda_handler(event, None)
+    first = time.perf_counter() - invocation
+    assert response["statusCode"] == 200, response
+    timings = []
+    for _ in range(warm):
+        invocation = time.perf_counter()
+        module.lambda_handler(event, None)
+        timings.append(time.perf_counter() - invocation)
+    return {"import_ms": (imported - start) * 1000, "first_ms": first * 1000,
+            "warm_ms": statistics.median(timings) * 1000}
+
+
+def containers(path, runs, warm):
+    """Median timings over `runs` fresh interpreters."""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, __file__, "--child", path, "--warm", str(warm)],
+                                env=dict(os.environ, **ENVIRONMENT), capture_output=True, text=True, check=True).stdout
+        samples.append(json.loads(output))
+    return {name: round(statistics.median(sample[name] for sample in samples), 2) for name in samples[0]}
+
+
+def main(args):
+    here = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lambda_function.py")
+    report = {"current": containers(here, args.runs, args.warm)}
+    if args.baseline:
+        report["baseline"] = containers(args.baseline, args.runs, args.warm)
+    print(json.dumps(report, indent=2))
+
+    limits = {"import_ms": args.max_import_ms, "first_ms": args.max_first_ms, "warm_ms": args.max_warm_ms}
+    failed = [f"{name} {report['current'][name]} > {limit}" for name, limit in limits.items()
+              if limit is not None and report["current"][name] > limit]
+    if failed:
+        print("Regression: " + ", ".join(failed))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure cold and warm start of the inference Lambda")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to measure (default 5)")
+    parser.add_argument("--warm", type=int, default=20, help="Warm invocations per interpreter (default 20)")
+    parser.add_argument("--baseline", help="Another lambda_function.py to measure the same way")
+    parser.add_argument("--max-import-ms", type=float, help="Fail if the median import takes longer")
+    parser.add_argument("--max-first-ms", type=float, help="Fail if the median first invocation takes longer")
+    parser.add_argument("--max-warm-ms", type=float, help="Fail if the median warm invocation takes longer")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        print(json.dumps(measure(args.child, args.warm)))
+    else:
+        main(args)
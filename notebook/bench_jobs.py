@@ -0,0 +1,106 @@
+"""
+Description: Exercises the submit/poll job mode of lambda_function.py with local queue and storage.
+
+A long generation (--tokens at --per-token seconds each, against stub_runtime.py) is first sent
+as a synchronous request, which is timed against a gateway integration timeout of
+--gateway-timeout seconds. The same prompt is then submitted as a job and polled until it
+completes, recording how fast the submit call returns and how the partial output grows. Finally
+--jobs long jobs are submitted at once to show that submits stay fast while the workers drain the
+queue. Last, a job runs against an endpoint that cannot stream and answers with a list
+([{"generated_text": ...}], as the Llama-2 container does), and is submitted again to be
+completed from the prompt cache. Jobs use stub_jobs.py in a temporary directory.
+
+Usage:
+python bench_jobs.py [--tokens 150] [--per-token 0.02] [--gateway-timeout 1.0] [--jobs 12]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "stub-endpoint")
+
+import lambda_function
+import stub_jobs
+import stub_runtime
+
+
+def call(body):
+    response = lambda_function.lambda_handler({"body": json.dumps(body)}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def main(args):
+    # The synchronous path and the job worker have their own clients; both call the same stub
+    lambda_function.smr_client = lambda_function.job_smr_client = stub_runtime.StubSageMakerRuntime(
+        overhead=0.05, per_token=args.per_token, capacity=8)
+    lambda_function.JOB_PROGRESS_INTERVAL = args.progress_interval
+    request = {"prompt": "Review this large diff:\n" + "+    x = compute(x)\n" * 500,
+               "parameters": {"max_new_tokens": args.tokens, "temperature": 0.1}}
+    report = {"tokens": args.tokens, "gateway_timeout_s": args.gateway_timeout}
+
+    start = time.perf_counter()
+    _, result = call(request)
+    seconds = time.perf_counter() - start
+    report["synchronous"] = {"seconds": round(seconds, 3), "exceeds_gateway_timeout": seconds > args.gateway_timeout}
+
+    with tempfile.TemporaryDirectory() as directory:
+        lambda_function.job_store = stub_jobs.DirectoryJobStore(directory)
+        lambda_function.job_queue = stub_jobs.ThreadJobQueue(lambda_function.lambda_handler, workers=args.workers)
+
+        start = time.perf_counter()
+        status_code, job = call(dict(request, action="submit"))
+        submitted = time.perf_counter() - start
+        progress = []
+        while job["status"] not in ("completed", "failed"):
+            time.sleep(args.poll)
+            _, job = call({"action": "status", "job_id": job["job_id"]})
+            progress.append((job["status"], job["tokens"]))
+        report["job"] = {"submit_status": status_code, "submit_ms": round(submitted * 1000, 1),
+                         "finished_s": round(time.perf_counter() - start, 3), "polls": len(progress),
+                         "partial_tokens_seen": sorted({tokens for status, tokens in progress if status == "running" and tokens}),
+                         "same_text": job["generated_text"] == result["generated_text"]}
+
+        start = time.perf_counter()
+        submits = []
+        for i in range(args.jobs):
+            begin = time.perf_counter()
+            _, job = call(dict(request, prompt=f"{request['prompt']}# file {i}\n", action="submit"))
+            submits.append((time.perf_counter() - begin, job["job_id"]))
+        pending = {job_id for _, job_id in submits}
+        while pending:
+            time.sleep(args.poll)
+            pending = {job_id for job_id in pending if call({"action": "status", "job_id": job_id})[1]["status"] not in ("completed", "failed")}
+        report["burst"] = {"jobs": args.jobs, "workers": args.workers,
+                           "max_submit_ms": round(max(seconds for seconds, _ in submits) * 1000, 1),
+                           "all_finished_s": round(time.perf_counter() - start, 3)}
+        report["unknown_job_status"] = call({"action": "status", "job_id": "missing"})[0]
+
+        stub = lambda_function.smr_client = lambda_function.job_smr_client = stub_runtime.StubSageMakerRuntime(
+            overhead=0.05, per_token=0.0, streaming=False, list_results=True)
+        listed = dict(request, prompt=f"{request['prompt']}# list reply\n", action="submit", cache=True)
+        _, job = call(listed)
+        while job["status"] not in ("completed", "failed"):
+            time.sleep(args.poll)
+            _, job = call({"action": "status", "job_id": job["job_id"]})
+        _, cached = call(listed)
+        report["list_reply"] = {"status": job["status"], "error": job.get("error"),
+                                "same_text": job["generated_text"] == stub.complete(listed["prompt"], listed["parameters"])["generated_text"],
+                                "resubmit_status": cached["status"]}
+        lambda_function.job_queue.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Exercise the asynchronous job mode of the inference Lambda")
+    parser.add_argument("--tokens", type=int, default=150, help="Tokens per generation (default 150)")
+    parser.add_argument("--per-token", type=float, default=0.02, help="Stub endpoint seconds per token (default 0.02)")
+    parser.add_argument("--gateway-timeout", type=float, default=1.0, help="Integration timeout to compare against, in seconds (default 1.0)")
+    parser.add_argument("--progress-interval", type=float, default=0.5, help="Seconds between partial saves (default 0.5)")
+    parser.add_argument("--poll", type=float, default=0.25, help="Seconds between status calls (default 0.25)")
+    parser.add_argument("--jobs", type=int, default=12, help="Jobs in the burst (default 12)")
+    parser.add_argument("--workers", type=int, default=4, help="Local worker threads (default 4)")
+    main(parser.parse_args())
@@ -0,0 +1,95 @@
+"""
+Description: Replays CI re-runs against the prompt cache of lambda_function.py.
+
+Each of --prompts review prompts is sent --reruns times, the way re-run and force-pushed
+workflows repeat the same diff, against stub_runtime.py. The report compares endpoint calls and
+wall time with the cache disabled and enabled, shows that sampled requests (temperature > 0)
+bypass the cache unless they opt in, and checks TTL expiry, LRU eviction and a second container
+that is served from the shared SQLite tier. The cache status is read from the X-Prompt-Cache
+headers, also for an endpoint that answers with a list as the Llama-2 container does.
+
+Usage:
+python bench_prompt_cache.py [--prompts 30] [--reruns 5]
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "stub-endpoint")
+
+import lambda_function
+import stub_runtime
+from lambda_function import LRUCache, PromptCache, SQLiteCache
+
+
+def send(body):
+    """Cache metadata of one request: its status and the container's counters."""
+    response = lambda_function.lambda_handler({"body": json.dumps(body)}, None)
+    headers = response["headers"]
+    return dict(json.loads(headers["X-Prompt-Cache-Stats"]), status=headers["X-Prompt-Cache"])
+
+
+def replay(prompts, reruns, stub=None, **extra):
+    """(endpoint calls, seconds, metadata of the last response) of sending every prompt `reruns` times."""
+    stub = lambda_function.smr_client = stub or stub_runtime.StubSageMakerRuntime()
+    start = time.perf_counter()
+    for _ in range(reruns):
+        for prompt in prompts:
+            metadata = send(dict(prompt, **extra))
+    return stub.calls, round(time.perf_counter() - start, 3), metadata
+
+
+def main(args):
+    prompts = [{"prompt": f"Review this diff of file_{i}.py:\n+    x = compute({i})\n",
+                "parameters": {"max_new_tokens": 16, "temperature": 0}} for i in range(args.prompts)]
+    report = {"requests": args.prompts * args.reruns}
+
+    lambda_function.prompt_cache = PromptCache(LRUCache(max_entries=0))
+    calls, seconds, _ = replay(prompts, args.reruns)
+    report["without_cache"] = {"endpoint_calls": calls, "seconds": seconds}
+
+    lambda_function.prompt_cache = PromptCache(LRUCache())
+    calls, seconds, metadata = replay(prompts, args.reruns)
+    report["with_cache"] = {"endpoint_calls": calls, "seconds": seconds, "metadata": metadata}
+
+    lambda_function.prompt_cache = PromptCache(LRUCache())
+    calls, _, metadata = replay(prompts, args.reruns, stub_runtime.StubSageMakerRuntime(list_results=True))
+    report["list_replies"] = {"endpoint_calls": calls, "metadata": metadata}
+
+    sampled = [dict(prompt, parameters={"max_new_tokens": 16, "temperature": 0.1}) for prompt in prompts]
+    lambda_function.prompt_cache = PromptCache(LRUCache())
+    report["sampled_bypass_calls"] = replay(sampled, 2)[0]
+    report["sampled_opt_in_calls"] = replay(sampled, 2, cache=True)[0]
+
+    # Entries expire after the TTL
+    lambda_function.prompt_cache = PromptCache(LRUCache(), ttl=0.2)
+    send(prompts[0])
+    time.sleep(0.3)
+    report["after_ttl"] = send(prompts[0])["status"]
+
+    # The least recently used entry goes first
+    lambda_function.prompt_cache = PromptCache(LRUCache(max_entries=2))
+    for prompt in (prompts[0], prompts[1], prompts[0], prompts[2]):
+        send(prompt)
+    report["lru"] = {"kept": send(prompts[0])["status"], "evicted": send(prompts[1])["status"]}
+
+    # A fresh container starts with an empty local tier but finds results in the shared one
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "prompt_cache.sqlite3")
+        lambda_function.prompt_cache = PromptCache(LRUCache(), SQLiteCache(path))
+        replay(prompts, 1)
+        lambda_function.prompt_cache = PromptCache(LRUCache(), SQLiteCache(path))
+        calls, _, metadata = replay(prompts, 1)
+        report["second_container"] = {"endpoint_calls": calls, "metadata": metadata}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the prompt cache on repeated review prompts")
+    parser.add_argument("--prompts", type=int, default=30, help="Distinct prompts (default 30)")
+    parser.add_argument("--reruns", type=int, default=5, help="Times each prompt is sent (default 5)")
+    main(parser.parse_args())
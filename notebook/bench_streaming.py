@@ -0,0 +1,109 @@
+"""
+Description: Measures time to first byte of the streaming and buffered modes of lambda_function.py.
+
+Serves the handler over local HTTP against stub_runtime.py: POST /buffered calls lambda_handler
+and returns its body in one piece, POST /stream relays stream_handler output with chunked
+transfer encoding, the way a response-streaming function URL would. Each request is timed to its
+first byte and to its last, and the streamed text is checked against the buffered one. The
+fallback for endpoints that cannot stream is checked as well.
+
+Usage:
+python bench_streaming.py [--requests 5] [--tokens 200] [--per-token 0.01]
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "stub-endpoint")
+
+import lambda_function
+import stub_runtime
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        event = {"body": self.rfile.read(int(self.headers["Content-Length"])).decode()}
+        if self.path == "/stream":
+            self.send_response(200)
+            self.send_header("Content-Type", "application/jsonlines")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write(data):
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                self.wfile.flush()
+
+            lambda_function.stream_handler(event, write)
+            self.wfile.write(b"0\r\n\r\n")
+        else:
+            response = lambda_function.lambda_handler(event, None)
+            payload = response["body"].encode()
+            self.send_response(response["statusCode"])
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def request(port, path, body):
+    """(seconds to the first body byte, seconds to the last, body)."""
+    connection = http.client.HTTPConnection("127.0.0.1", port)
+    start = time.perf_counter()
+    connection.request("POST", path, body=json.dumps(body), headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    first = response.read1(1)
+    first_byte = time.perf_counter() - start
+    data = first + response.read()
+    connection.close()
+    return first_byte, time.perf_counter() - start, data
+
+
+def streamed_text(data):
+    lines = [json.loads(line) for line in data.splitlines() if line]
+    return lines[-1].get("generated_text"), sum("token" in line for line in lines)
+
+
+def main(args):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    body = {"prompt": "Review this diff:\n+    x = compute(x)\n", "parameters": {"max_new_tokens": args.tokens, "temperature": 0.1}}
+
+    lambda_function.smr_client = stub_runtime.StubSageMakerRuntime(overhead=args.overhead, per_token=args.per_token)
+    report = {"tokens": args.tokens}
+    for mode in ("buffered", "stream"):
+        timings = [request(port, "/" + mode, body) for _ in range(args.requests)]
+        report[mode] = {"ttfb_ms": round(statistics.median(t[0] for t in timings) * 1000, 1),
+                        "total_ms": round(statistics.median(t[1] for t in timings) * 1000, 1)}
+    buffered = json.loads(request(port, "/buffered", body)[2])["generated_text"]
+    text, chunks = streamed_text(request(port, "/stream", body)[2])
+    report["stream"]["token_lines"] = chunks
+    report["same_text"] = text == buffered
+
+    # An endpoint that cannot stream still answers through the buffered invocation
+    lambda_function.smr_client = stub_runtime.StubSageMakerRuntime(overhead=args.overhead, per_token=args.per_token, streaming=False)
+    text, chunks = streamed_text(request(port, "/stream", body)[2])
+    report["fallback_without_streaming"] = {"same_text": text == buffered, "token_lines": chunks}
+    server.shutdown()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark time to first byte of streamed and buffered inference")
+    parser.add_argument("--requests", type=int, default=5, help="Requests per mode (default 5)")
+    parser.add_argument("--tokens", type=int, default=200, help="Tokens generated per request (default 200)")
+    parser.add_argument("--per-token", type=float, default=0.01, help="Stub endpoint seconds per token (default 0.01)")
+    parser.add_argument("--overhead", type=float, default=0.05, help="Stub endpoint overhead per call in seconds (default 0.05)")
+    main(parser.parse_args())
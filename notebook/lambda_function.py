@@ -1,38 +1,832 @@
 import os
 import json
-import boto3
-# Initialize SageMaker Runtime client
-smr_client = boto3.client('sagemaker-runtime')
-    
+import hashlib
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+# botocore alone: boto3 would also import s3transfer, which only adds to the cold start
+import botocore.session
+from botocore.config import Config
+from botocore.exceptions import ReadTimeoutError
+
+# Configuration is read once per container, at init
+ENDPOINT_NAME = os.environ.get('SAGEMAKER_ENDPOINT_NAME')
+# Endpoints serving the same model: a JSON list of {"name", "weight", "capacity"}, or comma-separated
+# names. Unset means SAGEMAKER_ENDPOINT_NAME alone.
+SAGEMAKER_ENDPOINTS = os.environ.get('SAGEMAKER_ENDPOINTS')
+# "least_outstanding" or "ewma" (latency average times outstanding requests)
+ROUTING_STRATEGY = os.environ.get('ROUTING_STRATEGY', 'least_outstanding')
+# Seconds after which a request still running is also sent to a second endpoint; 0 disables hedging
+HEDGE_DELAY = float(os.environ.get('HEDGE_DELAY', '0'))
+# Consecutive throttles that take an endpoint out of rotation, and for how many seconds
+EJECT_AFTER_THROTTLES = int(os.environ.get('EJECT_AFTER_THROTTLES', '3'))
+EJECT_COOLDOWN = float(os.environ.get('EJECT_COOLDOWN', '30'))
+DEFAULT_PARAMETERS = {
+    "max_new_tokens": 256,
+    "temperature": 0.1
+}
+# Batch requests: prompts per endpoint call, and the tokens (prompt estimate + max_new_tokens) they may add up to
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '8'))
+BATCH_TOKEN_BUDGET = int(os.environ.get('BATCH_TOKEN_BUDGET', '8192'))
+# Endpoint calls of one batch request that run at the same time
+MAX_CONCURRENT_BATCHES = int(os.environ.get('MAX_CONCURRENT_BATCHES', '4'))
+# Prompt cache: seconds a result is served, and the bounds of the in-container tier
+PROMPT_CACHE_TTL = int(os.environ.get('PROMPT_CACHE_TTL', '3600'))
+PROMPT_CACHE_MAX_ENTRIES = int(os.environ.get('PROMPT_CACHE_MAX_ENTRIES', '256'))
+PROMPT_CACHE_MAX_BYTES = int(os.environ.get('PROMPT_CACHE_MAX_BYTES', str(16 * 1024 * 1024)))
+# SQLite file shared by all containers (e.g. on EFS); unset keeps the cache in-container only
+PROMPT_CACHE_SQLITE = os.environ.get('PROMPT_CACHE_SQLITE')
+# Job mode: S3 bucket (and key prefix) holding job records, SQS queue feeding the worker, and
+# seconds between saves of a running job's partial output
+JOB_BUCKET = os.environ.get('JOB_BUCKET')
+JOB_PREFIX = os.environ.get('JOB_PREFIX', 'jobs/')
+JOB_QUEUE_URL = os.environ.get('JOB_QUEUE_URL')
+JOB_PROGRESS_INTERVAL = float(os.environ.get('JOB_PROGRESS_INTERVAL', '2'))
+# Seconds to open a connection, and to wait for the endpoint. Requests through API Gateway are cut
+# off after 29 s, so the synchronous path gives up before that; the job worker, invoked by SQS,
+# waits as long as InvokeEndpoint itself (60 s) and the function's Timeout must cover it.
+CONNECT_TIMEOUT = float(os.environ.get('SAGEMAKER_CONNECT_TIMEOUT', '2'))
+READ_TIMEOUT = float(os.environ.get('SAGEMAKER_READ_TIMEOUT', '25'))
+JOB_READ_TIMEOUT = float(os.environ.get('SAGEMAKER_JOB_READ_TIMEOUT', '70'))
+MAX_ATTEMPTS = int(os.environ.get('SAGEMAKER_MAX_ATTEMPTS', '3'))
+
+
+def no_retry_on_read_timeout(caught_exception=None, **kwargs):
+    # A generation that timed out may still be running on the endpoint, and a retry would run it
+    # again; throttles and connection errors are still retried
+    if isinstance(caught_exception, ReadTimeoutError):
+        raise caught_exception
+
+
+def create_runtime_client(read_timeout):
+    client = botocore.session.get_session().create_client(
+        'sagemaker-runtime',
+        region_name=os.environ.get('REGION_NAME'),
+        config=Config(
+            connect_timeout=CONNECT_TIMEOUT,
+            read_timeout=read_timeout,
+            retries={'mode': 'standard', 'total_max_attempts': MAX_ATTEMPTS},
+            tcp_keepalive=True,
+            max_pool_connections=max(10, 2 * MAX_CONCURRENT_BATCHES)
+        )
+    )
+    client.meta.events.register_first('needs-retry.sagemaker-runtime', no_retry_on_read_timeout)
+    return client
+
+
+# Initialize SageMaker Runtime client. It is created during init, so the first request does not pay
+# for it; keep-alive connections are pooled for the concurrent calls of batch requests.
+smr_client = create_runtime_client(READ_TIMEOUT)
+# The job worker's client, with the longer read timeout; created on the first job it runs
+job_smr_client = None
+
+
+def job_runtime_client():
+    global job_smr_client
+    if job_smr_client is None:
+        job_smr_client = create_runtime_client(JOB_READ_TIMEOUT)
+    return job_smr_client
+
+
+class LRUCache:
+    """In-container tier: lives as long as the warm container, bounded by entries and bytes."""
+
+    def __init__(self, max_entries=PROMPT_CACHE_MAX_ENTRIES, max_bytes=PROMPT_CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if len(value) > self.max_bytes or self.max_entries <= 0:
+                return
+            self._entries[key] = (time.time() + ttl, value)
+            self.bytes += len(value)
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key):
+        _, value = self._entries.pop(key)
+        self.bytes -= len(value)
+
+
+class SQLiteCache:
+    """Shared tier over a SQLite file. Any object with the same get/set can be plugged in instead."""
+
+    def __init__(self, path):
+        # Imported here, as most deployments have no shared tier
+        import sqlite3
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("CREATE TABLE IF NOT EXISTS prompt_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+        self._db.commit()
+
+    def get(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT value FROM prompt_cache WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO prompt_cache (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + ttl))
+            self._db.execute("DELETE FROM prompt_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+
+
+class PromptCache:
+    """Endpoint results by prompt and parameters, looked up in the local tier, then the shared one."""
+
+    def __init__(self, local, shared=None, ttl=PROMPT_CACHE_TTL):
+        self.local = local
+        self.shared = shared
+        self.ttl = ttl
+        # Counts over the life of the container
+        self.stats = {'hits': 0, 'shared_hits': 0, 'misses': 0, 'bypassed': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(endpoint_name, prompt, params):
+        # Line endings and the order of the parameters do not change what the model is asked
+        prompt = prompt.replace('\r\n', '\n')
+        return hashlib.sha256(json.dumps([endpoint_name, prompt, params], sort_keys=True).encode('utf8')).hexdigest()
+
+    @staticmethod
+    def cacheable(params, opt_in):
+        """Sampled generations differ per call, so they are only cached when the request opts in."""
+        if opt_in is False:
+            return False
+        sampled = float(params.get('temperature') or 0) > 0 or params.get('do_sample')
+        return bool(opt_in) or not sampled
+
+    def lookup(self, endpoint_name, prompt, params, opt_in=None):
+        """(key, cached result or None, status); key is None and status 'bypass' if not cacheable."""
+        if not self.cacheable(params, opt_in):
+            self._count('bypassed')
+            return None, None, 'bypass'
+        key = self.key(endpoint_name, prompt, params)
+        value = self.local.get(key)
+        if value is None and self.shared is not None:
+            value = self.shared.get(key)
+            if value is not None:
+                self._count('shared_hits')
+                self.local.set(key, value, self.ttl)
+        if value is None:
+            self._count('misses')
+            return key, None, 'miss'
+        self._count('hits')
+        return key, json.loads(value), 'hit'
+
+    def store(self, key, result):
+        if key is None or not isinstance(result, (dict, list)) or 'error' in result:
+            return
+        value = json.dumps(result)
+        self.local.set(key, value, self.ttl)
+        if self.shared is not None:
+            self.shared.set(key, value, self.ttl)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+
+# Module level, so warm invocations of the same container share it
+prompt_cache = PromptCache(LRUCache(), SQLiteCache(PROMPT_CACHE_SQLITE) if PROMPT_CACHE_SQLITE else None)
+
+
+THROTTLE_CODES = {'ThrottlingException', 'TooManyRequestsException', 'ServiceUnavailable', 'ModelNotReadyException'}
+
+
+def is_throttle(error):
+    """Whether `error` means the endpoint is overloaded rather than the request being wrong."""
+    code = getattr(error, 'response', {}).get('Error', {}).get('Code', '')
+    return code in THROTTLE_CODES or 'Throttl' in str(error)
+
+
+class Endpoint:
+    def __init__(self, name, weight=1.0, capacity=1):
+        self.name = name
+        self.weight = float(weight)
+        self.capacity = int(capacity)
+        self.outstanding = 0
+        # Exponentially weighted moving average of successful call latency, in seconds
+        self.latency = None
+        self.throttles = 0
+        self.ejected_until = 0.0
+        self.requests = 0
+        self.errors = 0
+        self.ejections = 0
+
+
+class Router:
+    """Spreads calls over endpoints that serve the same model.
+
+    Each call goes to the endpoint with the fewest outstanding requests per unit of capacity and
+    weight ("least_outstanding"), or with the lowest latency EWMA scaled by its outstanding requests
+    ("ewma"). A call still running after hedge_delay seconds is also sent to a second endpoint with
+    spare capacity, and the first answer wins. A throttled call fails over to an endpoint not tried yet, and an endpoint
+    throttled eject_after times in a row is skipped for eject_cooldown seconds.
+    """
+
+    def __init__(self, endpoints, strategy=ROUTING_STRATEGY, hedge_delay=HEDGE_DELAY,
+                 eject_after=EJECT_AFTER_THROTTLES, eject_cooldown=EJECT_COOLDOWN, alpha=0.3):
+        self.endpoints = endpoints
+        self.name = ','.join(str(endpoint.name) for endpoint in endpoints)
+        self.strategy = strategy
+        self.hedge_delay = hedge_delay
+        self.eject_after = eject_after
+        self.eject_cooldown = eject_cooldown
+        self.alpha = alpha
+        self.hedges = 0
+        self.failovers = 0
+        self._lock = threading.Lock()
+        self._executor = None
+
+    @classmethod
+    def from_config(cls, config, default_name, **options):
+        if not config:
+            return cls([Endpoint(default_name)], **options)
+        if config.lstrip().startswith('['):
+            return cls([Endpoint(**spec) for spec in json.loads(config)], **options)
+        return cls([Endpoint(name.strip()) for name in config.split(',') if name.strip()], **options)
+
+    def score(self, endpoint):
+        load = (endpoint.outstanding + 1) / (endpoint.capacity * endpoint.weight)
+        if self.strategy == 'ewma':
+            # Endpoints without a measurement yet get tried first
+            return (endpoint.latency or 0.0) * load
+        return load
+
+    def pick(self, exclude=()):
+        """The best endpoint not in `exclude`, or None if every endpoint is excluded."""
+        now = time.time()
+        with self._lock:
+            candidates = [endpoint for endpoint in self.endpoints if endpoint not in exclude]
+            # When every candidate is ejected, a throttled endpoint still beats no endpoint
+            healthy = [endpoint for endpoint in candidates if endpoint.ejected_until <= now] or candidates
+            if not healthy:
+                return None
+            return min(healthy, key=lambda endpoint: (self.score(endpoint), random.random()))
+
+    def _begin(self, endpoint):
+        with self._lock:
+            endpoint.outstanding += 1
+            endpoint.requests += 1
+        return time.time()
+
+    def _finish(self, endpoint, started, error=None, cancelled=False):
+        with self._lock:
+            endpoint.outstanding -= 1
+            if cancelled:
+                return
+            elapsed = time.time() - started
+            if error is None:
+                self._observe(endpoint, elapsed)
+                endpoint.throttles = 0
+                return
+            endpoint.errors += 1
+            if is_throttle(error):
+                # A throttle counts as a slow answer, so "ewma" also moves load away from it
+                self._observe(endpoint, max(elapsed, 2 * (endpoint.latency or elapsed)))
+                endpoint.throttles += 1
+                if endpoint.throttles >= self.eject_after:
+                    endpoint.ejected_until = time.time() + self.eject_cooldown
+                    endpoint.ejections += 1
+                    endpoint.throttles = 0
+
+    def _observe(self, endpoint, elapsed):
+        endpoint.latency = elapsed if endpoint.latency is None else (
+            self.alpha * elapsed + (1 - self.alpha) * endpoint.latency)
+
+    def _run(self, endpoint, fn):
+        started = self._begin(endpoint)
+        try:
+            result = fn(endpoint.name)
+        except Exception as e:
+            self._finish(endpoint, started, e)
+            raise
+        self._finish(endpoint, started)
+        return result
+
+    def call(self, fn):
+        """fn(endpoint name) on the best endpoint, hedged and failed over as configured."""
+        tried = [self.pick()]
+        if len(self.endpoints) == 1:
+            return self._run(tried[0], fn)
+
+        from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(8, 4 * MAX_CONCURRENT_BATCHES))
+        running = {self._executor.submit(self._run, tried[0], fn)}
+        hedged = False
+        error = None
+        while running:
+            timeout = self.hedge_delay if self.hedge_delay > 0 and not hedged else None
+            done, running = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                # Slow: race a second endpoint with spare capacity; the first answer wins and the
+                # other is left to finish. Without spare capacity a hedge would only add load.
+                hedged = True
+                endpoint = self.pick(exclude=tried)
+                if endpoint is not None and endpoint.outstanding < endpoint.capacity:
+                    tried.append(endpoint)
+                    running.add(self._executor.submit(self._run, endpoint, fn))
+                    with self._lock:
+                        self.hedges += 1
+                continue
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+            if not running and is_throttle(error):
+                endpoint = self.pick(exclude=tried)
+                if endpoint is not None:
+                    tried.append(endpoint)
+                    running.add(self._executor.submit(self._run, endpoint, fn))
+                    with self._lock:
+                        self.failovers += 1
+        raise error
+
+    def stream(self, fn):
+        """Items of the iterator fn(endpoint name), failing over on throttles before the first item."""
+        tried = []
+        while True:
+            endpoint = self.pick(exclude=tried)
+            tried.append(endpoint)
+            started = self._begin(endpoint)
+            relayed = False
+            try:
+                for item in fn(endpoint.name):
+                    relayed = True
+                    yield item
+            except Exception as e:
+                self._finish(endpoint, started, e)
+                if relayed or not is_throttle(e) or len(tried) == len(self.endpoints):
+                    raise
+                with self._lock:
+                    self.failovers += 1
+                continue
+            except BaseException:
+                # The consumer stopped early (GeneratorExit)
+                self._finish(endpoint, started, cancelled=True)
+                raise
+            self._finish(endpoint, started)
+            return
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            return {
+                'hedges': self.hedges,
+                'failovers': self.failovers,
+                'endpoints': {endpoint.name: {
+                    'requests': endpoint.requests, 'errors': endpoint.errors,
+                    'outstanding': endpoint.outstanding, 'ejections': endpoint.ejections,
+                    'ejected': endpoint.ejected_until > now,
+                    'latency_ms': round(endpoint.latency * 1000, 1) if endpoint.latency is not None else None,
+                } for endpoint in self.endpoints},
+            }
+
+
+router = Router.from_config(SAGEMAKER_ENDPOINTS, ENDPOINT_NAME)
+
+
+def generate(inputs, params, client=None):
+    """The endpoint result for `inputs`, from whichever endpoint the router picks."""
+    return router.call(lambda endpoint_name: invoke(endpoint_name, inputs, params, client))
+
+
+def invoke(endpoint_name, inputs, params, client=None):
+    """Call the endpoint with one prompt, or a list of prompts that share `params`."""
+    response = (client or smr_client).invoke_endpoint(
+        EndpointName=endpoint_name,
+        Body=json.dumps({
+            "inputs": inputs,
+            "parameters": params
+        }),
+        ContentType="application/json"
+    )
+    return json.loads(response['Body'].read().decode("utf8"))
+
+
+def generated_text(result):
+    """The completion in an endpoint result: {"generated_text"|"generation": ...}, or a list of them
+    as the Hugging Face LLM container serving Llama-2 returns; '' if there is none."""
+    if isinstance(result, list):
+        result = result[0] if result else {}
+    if not isinstance(result, dict):
+        return ''
+    return result.get('generated_text', result.get('generation')) or ''
+
+
+def token_text(line):
+    """Text of one line of a response stream: {"token": {"text": ...}} JSON, optionally prefixed by "data:"."""
+    line = line.strip()
+    if line.startswith(b'data:'):
+        line = line[len(b'data:'):].strip()
+    if not line:
+        return ''
+    payload = json.loads(line)
+    token = payload.get('token') if isinstance(payload, dict) else None
+    if not token or token.get('special'):
+        return ''
+    return token.get('text', '')
+
+
+def iter_tokens(endpoint_name, prompt, params, client=None):
+    """Text of each generated token, as the endpoint streams it."""
+    response = (client or smr_client).invoke_endpoint_with_response_stream(
+        EndpointName=endpoint_name,
+        Body=json.dumps({
+            "inputs": prompt,
+            "parameters": params
+        }),
+        ContentType="application/json"
+    )
+    # Payload parts are byte chunks; a JSON line can be split across several of them
+    buffer = b''
+    for event in response['Body']:
+        if 'PayloadPart' not in event:
+            error = event.get('ModelStreamError') or event.get('InternalStreamFailure') or event
+            raise RuntimeError(f"Response stream failed: {error}")
+        buffer += event['PayloadPart']['Bytes']
+        *lines, buffer = buffer.split(b'\n')
+        for line in lines:
+            text = token_text(line)
+            if text:
+                yield text
+    text = token_text(buffer)
+    if text:
+        yield text
+
+
+def stream_handler(event, write):
+    """Relay a {"prompt", "parameters"} request token by token through `write(bytes)`.
+
+    For hosts that can stream a response (a Lambda function URL in RESPONSE_STREAM mode behind the
+    Lambda Web Adapter, or any HTTP server using chunked encoding). Writes one JSON line per token,
+    {"token": text}, then {"generated_text": full text}, or {"error": ...} if generation fails.
+    If the endpoint cannot stream, the whole completion is written as the single final line.
+    """
+    # The cache is shared by all endpoints of the model
+    endpoint_name = router.name
+    body = json.loads(event['body'])
+    prompt = body.get('prompt', '')
+    params = body.get('parameters', DEFAULT_PARAMETERS)
+    key, cached, status = prompt_cache.lookup(endpoint_name, prompt, params, body.get('cache'))
+    if cached is not None:
+        write((json.dumps(with_cache_metadata(cached, status)) + '\n').encode('utf8'))
+        return
+    tokens = []
+    try:
+        for text in router.stream(lambda name: iter_tokens(name, prompt, params)):
+            tokens.append(text)
+            write((json.dumps({'token': text}) + '\n').encode('utf8'))
+        result = {'generated_text': ''.join(tokens)}
+        prompt_cache.store(key, result)
+        write((json.dumps(with_cache_metadata(result, status)) + '\n').encode('utf8'))
+    except Exception as e:
+        if tokens:
+            write((json.dumps({'error': str(e)}) + '\n').encode('utf8'))
+            return
+        # Nothing was relayed yet, so the buffered invocation can still answer
+        try:
+            result = generate(prompt, params)
+            prompt_cache.store(key, result)
+        except Exception as e:
+            result = {'error': str(e)}
+        write((json.dumps(with_cache_metadata(result, status)) + '\n').encode('utf8'))
+
+
+def with_cache_metadata(result, status):
+    """Final line of a stream: the completion, whatever the shape of `result`, or its error, with a
+    "cache" entry holding this request's status and the container's counters."""
+    if isinstance(result, dict) and 'error' in result:
+        final = {'error': result['error']}
+    else:
+        final = {'generated_text': generated_text(result)}
+    final['cache'] = dict(prompt_cache.stats, status=status)
+    return final
+
+
+def cache_headers(status):
+    """Response headers with this request's cache status and the container's counters.
+
+    Headers, because endpoint results are passed through as they are, and the Llama-2 container
+    answers with a list that has no room for a "cache" entry.
+    """
+    return {'X-Prompt-Cache': status, 'X-Prompt-Cache-Stats': json.dumps(prompt_cache.stats, separators=(',', ':'))}
+
+
+class S3JobStore:
+    """Job records as JSON objects in S3, readable by every container."""
+
+    def __init__(self, bucket=JOB_BUCKET, prefix=JOB_PREFIX):
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = botocore.session.get_session().create_client('s3', region_name=os.environ.get('REGION_NAME'))
+
+    def put(self, job):
+        self.client.put_object(Bucket=self.bucket, Key=f"{self.prefix}{job['job_id']}.json",
+                               Body=json.dumps(job).encode('utf8'), ContentType='application/json')
+
+    def get(self, job_id):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=f"{self.prefix}{job_id}.json")
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return json.loads(response['Body'].read().decode('utf8'))
+
+
+class SQSJobQueue:
+    """Job IDs sent to an SQS queue whose event source mapping invokes this function as the worker."""
+
+    def __init__(self, queue_url=JOB_QUEUE_URL):
+        self.queue_url = queue_url
+        self.client = botocore.session.get_session().create_client('sqs', region_name=os.environ.get('REGION_NAME'))
+
+    def send(self, job_id):
+        self.client.send_message(QueueUrl=self.queue_url, MessageBody=json.dumps({'job_id': job_id}))
+
+
+# Created on the first job request, so requests that do not use jobs do not pay for the clients.
+# Any objects with the same put/get and send can be assigned instead.
+job_store = None
+job_queue = None
+
+
+def job_backends():
+    global job_store, job_queue
+    if job_store is None and JOB_BUCKET:
+        job_store = S3JobStore()
+    if job_queue is None and JOB_QUEUE_URL:
+        job_queue = SQSJobQueue()
+    return job_store, job_queue
+
+
+def job_status(job):
+    """What a status call returns: the job without its prompt."""
+    return {name: value for name, value in job.items() if name not in ('prompt', 'parameters')}
+
+
+def submit_job(body):
+    """Store a job for the worker and return it at once; a cached result completes it right away."""
+    store, queue = job_backends()
+    params = body.get('parameters', DEFAULT_PARAMETERS)
+    now = time.time()
+    job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'prompt': body.get('prompt', ''), 'parameters': params,
+           'cache': body.get('cache'), 'submitted_at': now, 'updated_at': now, 'generated_text': '', 'tokens': 0}
+    _, cached, _ = prompt_cache.lookup(router.name, job['prompt'], params, body.get('cache'))
+    if cached is not None:
+        job.update(status='completed', generated_text=generated_text(cached))
+        store.put(job)
+        return job
+    store.put(job)
+    queue.send(job['job_id'])
+    return job
+
+
+def run_job(job_id):
+    """Worker side: generate a queued job, saving partial output every JOB_PROGRESS_INTERVAL seconds."""
+    store, _ = job_backends()
+    job = store.get(job_id)
+    # Queues deliver at least once; a finished job is not generated again
+    if job is None or job['status'] in ('completed', 'failed'):
+        return
+    job.update(status='running', updated_at=time.time())
+    store.put(job)
+    prompt, params = job['prompt'], job['parameters']
+    client = job_runtime_client()
+    tokens = []
+    saved_at = time.time()
+    try:
+        try:
+            for text in router.stream(lambda name: iter_tokens(name, prompt, params, client)):
+                tokens.append(text)
+                if time.time() - saved_at >= JOB_PROGRESS_INTERVAL:
+                    job.update(generated_text=''.join(tokens), tokens=len(tokens), updated_at=time.time())
+                    store.put(job)
+                    saved_at = time.time()
+            result = {'generated_text': ''.join(tokens)}
+        except Exception:
+            if tokens:
+                raise
+            # The endpoint cannot stream; the buffered invocation still answers, without partial output
+            result = generate(prompt, params, client)
+        if PromptCache.cacheable(params, job.get('cache')):
+            prompt_cache.store(PromptCache.key(router.name, prompt, params), result)
+        job.update(status='completed', generated_text=generated_text(result), tokens=len(tokens) or job['tokens'])
+    except Exception as e:
+        job.update(status='failed', error=str(e), generated_text=''.join(tokens), tokens=len(tokens))
+    job['updated_at'] = time.time()
+    store.put(job)
+
+
+def handle_job(body):
+    """Response to {"action": "submit", ...} or {"action": "status", "job_id": ...}."""
+    store, queue = job_backends()
+    if store is None or (body['action'] == 'submit' and queue is None):
+        return 400, {'error': 'Job mode needs JOB_BUCKET and JOB_QUEUE_URL'}
+    if body['action'] == 'submit':
+        return 202, job_status(submit_job(body))
+    if body['action'] == 'status':
+        job = store.get(body.get('job_id', ''))
+        if job is None:
+            return 404, {'error': f"Unknown job {body.get('job_id')}"}
+        return 200, job_status(job)
+    return 400, {'error': f"Unknown action {body['action']}"}
+
+
+def estimate_tokens(prompt, params):
+    # About four characters per token for code and English
+    return len(prompt) // 4 + 1 + int(params.get('max_new_tokens', DEFAULT_PARAMETERS['max_new_tokens']))
+
+
+def plan_batches(items):
+    """Group (index, prompt, params) items into batches that share parameters, in request order.
+
+    A batch holds at most MAX_BATCH_SIZE prompts and BATCH_TOKEN_BUDGET estimated tokens; a prompt
+    over the budget on its own still gets a batch of one.
+    """
+    groups = {}
+    for index, prompt, params in items:
+        groups.setdefault(json.dumps(params, sort_keys=True), []).append((index, prompt, params))
+    batches = []
+    for group in groups.values():
+        batch, tokens = [], 0
+        for item in group:
+            cost = estimate_tokens(item[1], item[2])
+            if batch and (len(batch) == MAX_BATCH_SIZE or tokens + cost > BATCH_TOKEN_BUDGET):
+                batches.append(batch)
+                batch, tokens = [], 0
+            batch.append(item)
+            tokens += cost
+        batches.append(batch)
+    return batches
+
+
+def run_batch(batch):
+    """[(index, result)] of one batch.
+
+    If the batched call fails, its halves are retried, so a prompt the model rejects only costs
+    the other prompts a few extra calls and ends up with its own error. Splitting does not help
+    when every endpoint is throttling, so then the whole batch gets the error.
+    """
+    index, prompt, params = batch[0]
+    if len(batch) == 1:
+        try:
+            return [(index, generate(prompt, params))]
+        except Exception as e:
+            return [(index, {'error': str(e)})]
+    try:
+        results = generate([prompt for _, prompt, _ in batch], params)
+        if isinstance(results, list) and len(results) == len(batch):
+            return [(index, result) for (index, _, _), result in zip(batch, results)]
+    except Exception as e:
+        if is_throttle(e):
+            return [(index, {'error': str(e)}) for index, _, _ in batch]
+    middle = len(batch) // 2
+    return run_batch(batch[:middle]) + run_batch(batch[middle:])
+
+
+def handle_batch(endpoint_name, body):
+    """Results of a {"prompts": [...]} request, in the order of the prompts.
+
+    Each prompt is a string or {"prompt": ..., "parameters": {...}}; the request-level "parameters"
+    apply to prompts without their own. A prompt that fails gets {"error": ...} in its place.
+    """
+    default_params = body.get('parameters', DEFAULT_PARAMETERS)
+    results = [None] * len(body['prompts'])
+    items = []
+    keys = {}
+    statuses = {'hit': 0, 'miss': 0, 'bypass': 0}
+    for index, entry in enumerate(body['prompts']):
+        if isinstance(entry, str):
+            entry = {'prompt': entry}
+        if not isinstance(entry, dict) or not isinstance(entry.get('prompt'), str):
+            results[index] = {'error': 'Each prompt must be a string or an object with a "prompt" string'}
+            continue
+        params = entry.get('parameters', default_params)
+        # Checked here, so a malformed item gets its own error instead of failing the whole request
+        if not isinstance(params, dict):
+            results[index] = {'error': '"parameters" must be an object'}
+            continue
+        try:
+            estimate_tokens(entry['prompt'], params)
+        except (TypeError, ValueError):
+            results[index] = {'error': '"max_new_tokens" must be a number'}
+            continue
+        key, cached, status = prompt_cache.lookup(endpoint_name, entry['prompt'], params, entry.get('cache', body.get('cache')))
+        statuses[status] += 1
+        if cached is not None:
+            results[index] = cached
+            continue
+        keys[index] = key
+        items.append((index, entry['prompt'], params))
+
+    # Imported on the first batch request only
+    from concurrent.futures import ThreadPoolExecutor
+    batches = plan_batches(items)
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_BATCHES, len(batches)))) as executor:
+        for outcomes in executor.map(run_batch, batches):
+            for index, result in outcomes:
+                results[index] = result
+                prompt_cache.store(keys[index], result)
+    cache = dict(prompt_cache.stats, request={'hits': statuses['hit'], 'misses': statuses['miss'], 'bypassed': statuses['bypass']})
+    return {'results': results, 'batches': len(batches), 'cache': cache}
+
+
 def lambda_handler(event, context):
-    
-    # Get the endpoint name from environment variable or configuration
-    endpoint_name = os.environ.get('SAGEMAKER_ENDPOINT_NAME')
-    
+
+    # The cache is shared by all endpoints of the model
+    endpoint_name = router.name
+
+    # Job worker: invoked by the SQS event source mapping of JOB_QUEUE_URL
+    if 'Records' in event:
+        for record in event['Records']:
+            run_job(json.loads(record['body'])['job_id'])
+        return {'statusCode': 200, 'body': json.dumps({'jobs': len(event['Records'])})}
+
     # Parse the input from the API Gateway event
     body = json.loads(event['body'])
+
+    # Long generations are submitted as jobs and polled, instead of holding the connection open
+    if 'action' in body:
+        try:
+            status_code, response = handle_job(body)
+        except Exception as e:
+            # S3 or SQS errors, e.g. a missing permission, get the same 500 reply as endpoint errors
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)})
+            }
+        return {
+            'statusCode': status_code,
+            'body': json.dumps(response)
+        }
+
+    # A list of prompts is answered in as few endpoint calls as the batch limits allow
+    if 'prompts' in body:
+        if not isinstance(body['prompts'], list):
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': '"prompts" must be a list'})
+            }
+        try:
+            response = handle_batch(endpoint_name, body)
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)})
+            }
+        return {
+            'statusCode': 200,
+            'body': json.dumps(response)
+        }
+
     prompt = body.get('prompt', '')
-    params = body.get('parameters', {
-        "max_new_tokens": 256,
-        "temperature": 0.1
-    })
-    
+    params = body.get('parameters', DEFAULT_PARAMETERS)
+
+    # Re-runs of the same review are answered from the prompt cache
+    key, cached, status = prompt_cache.lookup(endpoint_name, prompt, params, body.get('cache'))
+    if cached is not None:
+        return {
+            'statusCode': 200,
+            'headers': cache_headers(status),
+            'body': json.dumps(cached)
+        }
+
     try:
-        # Invoke the SageMaker endpoint
-        response = smr_client.invoke_endpoint(
-            EndpointName=endpoint_name,
-            Body=json.dumps({
-                "inputs": prompt,
-                "parameters": params
-            }),
-            ContentType="application/json"
-        )
-        
-        # Parse and return the result
-        result = json.loads(response['Body'].read().decode("utf8"))
-        
+        if body.get('stream'):
+            # API Gateway cannot relay a stream, so the streamed tokens are buffered, see stream_handler
+            result = {'generated_text': ''.join(router.stream(lambda name: iter_tokens(name, prompt, params)))}
+        else:
+            # Invoke the SageMaker endpoint the router picks
+            result = generate(prompt, params)
+        prompt_cache.store(key, result)
+
         return {
             'statusCode': 200,
+            'headers': cache_headers(status),
             'body': json.dumps(result)
         }
     except Exception as e:
@@ -0,0 +1,102 @@
+"""
+Description: Simulates the endpoint router of lambda_function.py against stub endpoints.
+
+Three stub endpoints serve the same model: "fast", "slow" (about four times the latency) and
+"flaky" (fast, but throttles most calls). Every endpoint throttles calls that find all of its
+slots busy and its queue full, and a few calls on each are several times slower than usual.
+--requests review prompts arrive at --rate per second and go through lambda_handler, once bound
+to a single endpoint as before and once per routing strategy. Hedging, which trades extra calls
+for a shorter tail, is compared at the lighter --hedge-rate. The report shows successes, 500s,
+latency percentiles, how calls were spread, and the router's hedges, failovers and ejections.
+
+Usage:
+python sim_router.py [--requests 600] [--rate 100] [--hedge-rate 30] [--hedge-delay 0.1]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+os.environ.setdefault("SAGEMAKER_ENDPOINT_NAME", "fast")
+
+import lambda_function
+import stub_runtime
+from lambda_function import Endpoint, Router
+
+
+def stub_endpoints():
+    common = {"capacity": 4, "max_queue": 4, "slow_rate": 0.03, "slow_factor": 8, "per_prompt": 0}
+    return stub_runtime.MultiEndpointStub({
+        "fast": stub_runtime.StubSageMakerRuntime(overhead=0.04, seed=1, **common),
+        "slow": stub_runtime.StubSageMakerRuntime(overhead=0.15, seed=2, **common),
+        "flaky": stub_runtime.StubSageMakerRuntime(overhead=0.04, throttle_rate=0.7, seed=3, **common),
+    })
+
+
+def percentile(values, share):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(share * len(values)))]
+
+
+def run(router, requests, rate):
+    stub = lambda_function.smr_client = stub_endpoints()
+    lambda_function.router = router
+    event = {"body": json.dumps({"prompt": "Review this diff", "parameters": {"max_new_tokens": 16, "temperature": 0.1}})}
+
+    def call():
+        start = time.perf_counter()
+        response = lambda_function.lambda_handler(event, None)
+        return response["statusCode"], time.perf_counter() - start
+
+    # Arrivals do not wait for earlier requests, like independent review jobs
+    with ThreadPoolExecutor(max_workers=256) as executor:
+        start = time.perf_counter()
+        futures = []
+        for i in range(requests):
+            time.sleep(max(0.0, start + i / rate - time.perf_counter()))
+            futures.append(executor.submit(call))
+        outcomes = [future.result() for future in futures]
+    latencies = [seconds for status, seconds in outcomes if status == 200]
+    stats = router.stats()
+    return {
+        "ok": len(latencies),
+        "errors_500": sum(status == 500 for status, _ in outcomes),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 1) if latencies else None,
+        "calls": {name: endpoint.calls for name, endpoint in stub.endpoints.items() if endpoint.calls},
+        "throttled": sum(endpoint.throttled for endpoint in stub.endpoints.values()),
+        "hedges": stats["hedges"],
+        "failovers": stats["failovers"],
+        "ejections": {name: endpoint["ejections"] for name, endpoint in stats["endpoints"].items() if endpoint["ejections"]},
+    }
+
+
+def main(args):
+    def endpoints():
+        return [Endpoint("fast", capacity=4), Endpoint("slow", capacity=4), Endpoint("flaky", capacity=4)]
+
+    report = {"requests": args.requests, "rate": args.rate}
+    report["single_endpoint"] = run(Router([Endpoint("fast", capacity=4)]), args.requests, args.rate)
+    for strategy in ("least_outstanding", "ewma"):
+        report[strategy] = run(Router(endpoints(), strategy=strategy, eject_cooldown=args.cooldown), args.requests, args.rate)
+
+    report["hedging"] = {"rate": args.hedge_rate}
+    for name, delay in (("off", 0), ("on", args.hedge_delay)):
+        router = Router(endpoints(), strategy="ewma", hedge_delay=delay, eject_cooldown=args.cooldown)
+        report["hedging"][name] = run(router, args.requests, args.hedge_rate)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulate multi-endpoint routing of the inference Lambda")
+    parser.add_argument("--requests", type=int, default=600, help="Requests per setup (default 600)")
+    parser.add_argument("--rate", type=float, default=100, help="Requests per second (default 100)")
+    parser.add_argument("--hedge-rate", type=float, default=30, help="Requests per second of the hedging comparison (default 30)")
+    parser.add_argument("--hedge-delay", type=float, default=0.1, help="Hedge delay of the hedged setup in seconds (default 0.1)")
+    parser.add_argument("--cooldown", type=float, default=2.0, help="Ejection cooldown in seconds (default 2)")
+    main(parser.parse_args())
@@ -0,0 +1,65 @@
+"""
+Description: Local stand-ins for the S3 job store and SQS job queue of lambda_function.py.
+
+DirectoryJobStore keeps each job record as a JSON file, like the objects in JOB_BUCKET.
+ThreadJobQueue delivers job IDs to worker threads that call lambda_handler with the same
+{"Records": [{"body": ...}]} event the SQS event source mapping sends, so the worker path of the
+handler runs unchanged.
+
+Usage:
+import lambda_function, stub_jobs
+lambda_function.job_store = stub_jobs.DirectoryJobStore(directory)
+lambda_function.job_queue = stub_jobs.ThreadJobQueue(lambda_function.lambda_handler)
+"""
+
+import json
+import os
+import queue
+import threading
+
+
+class DirectoryJobStore:
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def put(self, job):
+        path = os.path.join(self.directory, f"{job['job_id']}.json")
+        # Write-then-rename, so a reader never sees half a record, as with S3 objects
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump(job, f)
+        os.replace(path + ".tmp", path)
+
+    def get(self, job_id):
+        path = os.path.join(self.directory, f"{os.path.basename(job_id)}.json")
+        if not os.path.exists(path):
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+
+class ThreadJobQueue:
+    def __init__(self, handler, workers=4):
+        self.handler = handler
+        self.sent = 0
+        self._queue = queue.Queue()
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def send(self, job_id):
+        self.sent += 1
+        self._queue.put(job_id)
+
+    def _work(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            self.handler({"Records": [{"body": json.dumps({"job_id": job_id})}]}, None)
+
+    def close(self):
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
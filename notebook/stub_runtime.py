@@ -0,0 +1,143 @@
+"""
+Description: Stand-in for the SageMaker runtime client, for exercising lambda_function.py without an endpoint.
+
+StubSageMakerRuntime answers invoke_endpoint like an LMI (DJL Serving) endpoint: a string input
+returns {"generated_text": ...} and a list of inputs returns one such object per input. Each call
+costs a fixed overhead plus generation time, and at most `capacity` calls are served at once,
+so batching and concurrency effects show up in wall time. Prompts containing `fail_marker` raise,
+failing the whole call they are part of.
+
+invoke_endpoint_with_response_stream emits the same completion as {"token": {"text": ...}} JSON
+lines, one token every `per_token` seconds, cut into PayloadPart chunks that do not respect line
+boundaries. With streaming=False it raises like an endpoint whose container cannot stream.
+With list_results=True invoke_endpoint answers like the Hugging Face LLM container serving Llama-2:
+[{"generated_text": ...}] for a string input, and one such list per input of a list.
+
+For routing, a stub can throttle a share of calls (throttle_rate), or every call that finds all
+`capacity` slots busy and `max_queue` calls already waiting, with the ThrottlingException botocore
+raises, and make
+a share of calls several times slower (slow_rate, slow_factor). MultiEndpointStub serves several
+named stubs as one client.
+
+Usage:
+import lambda_function, stub_runtime
+lambda_function.smr_client = stub_runtime.StubSageMakerRuntime()
+"""
+
+import io
+import json
+import random
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+
+class StubSageMakerRuntime:
+    def __init__(self, overhead=0.05, per_prompt=0.01, capacity=4, fail_marker="FAIL",
+                 per_token=0.0, streaming=True, throttle_rate=0.0, max_queue=None,
+                 slow_rate=0.0, slow_factor=10, list_results=False, seed=0):
+        self.overhead = overhead
+        self.list_results = list_results
+        self.throttle_rate = throttle_rate
+        self.capacity = capacity
+        self.max_queue = max_queue
+        self._admitted = 0
+        self.slow_rate = slow_rate
+        self.slow_factor = slow_factor
+        self.throttled = 0
+        self._random = random.Random(seed)
+        self.per_prompt = per_prompt
+        self.per_token = per_token
+        self.streaming = streaming
+        self.fail_marker = fail_marker
+        self.calls = 0
+        self.prompts = 0
+        self._slots = threading.Semaphore(capacity)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def tokens(prompt, parameters):
+        count = int(parameters.get("max_new_tokens", 256))
+        return [f"# review of {len(prompt)} characters"] + [f" token{i}" for i in range(1, count)]
+
+    def complete(self, prompt, parameters):
+        return {"generated_text": "".join(self.tokens(prompt, parameters))}
+
+    def invoke_endpoint(self, EndpointName, Body, ContentType="application/json", **kwargs):
+        request = json.loads(Body)
+        inputs, parameters = request["inputs"], request.get("parameters", {})
+        prompts = inputs if isinstance(inputs, list) else [inputs]
+        with self._lock:
+            self.calls += 1
+            self.prompts += len(prompts)
+            slow = self._random.random() < self.slow_rate
+            throttle = self._random.random() < self.throttle_rate or (
+                self.max_queue is not None and self._admitted >= self.capacity + self.max_queue)
+            if throttle:
+                self.throttled += 1
+            else:
+                self._admitted += 1
+        if throttle:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeEndpoint")
+        self._slots.acquire()
+        try:
+            # Prompts of one call are decoded together, so a batch costs little more than one prompt
+            generated = max(len(self.tokens(prompt, parameters)) for prompt in prompts)
+            seconds = self.overhead + self.per_prompt * (1 + 0.1 * (len(prompts) - 1)) + self.per_token * generated
+            time.sleep(seconds * (self.slow_factor if slow else 1))
+        finally:
+            self._slots.release()
+            with self._lock:
+                self._admitted -= 1
+        if any(self.fail_marker in prompt for prompt in prompts):
+            raise RuntimeError("ModelError: An error occurred (ModelError) when calling the InvokeEndpoint operation")
+        results = [self.complete(prompt, parameters) for prompt in prompts]
+        if self.list_results:
+            results = [[result] for result in results]
+        payload = json.dumps(results if isinstance(inputs, list) else results[0]).encode()
+        return {"Body": io.BytesIO(payload), "ContentType": "application/json"}
+
+    def invoke_endpoint_with_response_stream(self, EndpointName, Body, ContentType="application/json", **kwargs):
+        if not self.streaming:
+            raise RuntimeError("ValidationError: Endpoint does not support response streaming")
+        request = json.loads(Body)
+        prompt, parameters = request["inputs"], request.get("parameters", {})
+        with self._lock:
+            self.calls += 1
+            self.prompts += 1
+            throttle = self._random.random() < self.throttle_rate
+            if throttle:
+                self.throttled += 1
+        if throttle:
+            raise ClientError({"Error": {"Code": "ThrottlingException", "Message": "Rate exceeded"}}, "InvokeEndpointWithResponseStream")
+        if self.fail_marker in prompt:
+            raise RuntimeError("ModelError: An error occurred (ModelError) when calling the InvokeEndpointWithResponseStream operation")
+        return {"Body": self._stream(prompt, parameters), "ContentType": "application/jsonlines"}
+
+    def _stream(self, prompt, parameters):
+        with self._slots:
+            time.sleep(self.overhead + self.per_prompt)
+            pending = b""
+            for i, text in enumerate(self.tokens(prompt, parameters)):
+                if i:
+                    time.sleep(self.per_token)
+                pending += json.dumps({"token": {"id": i, "text": text, "special": False}}).encode() + b"\n"
+                # Flush uneven chunks, so JSON lines arrive split across payload parts
+                cut = len(pending) * 2 // 3
+                yield {"PayloadPart": {"Bytes": pending[:cut]}}
+                pending = pending[cut:]
+            yield {"PayloadPart": {"Bytes": pending}}
+
+
+class MultiEndpointStub:
+    """Client for several stub endpoints, each answering the calls made with its EndpointName."""
+
+    def __init__(self, endpoints):
+        self.endpoints = endpoints
+
+    def invoke_endpoint(self, EndpointName, **kwargs):
+        return self.endpoints[EndpointName].invoke_endpoint(EndpointName, **kwargs)
+
+    def invoke_endpoint_with_response_stream(self, EndpointName, **kwargs):
+        return self.endpoints[EndpointName].invoke_endpoint_with_response_stream(EndpointName, **kwargs)
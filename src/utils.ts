@@ -144,6 +144,9 @@ export async function invokeModel(client: BedrockRuntimeClient, modelId: string,
               max_new_tokens: 256,
               temperature: 0.1,
             },
+            // Re-runs of the same review are answered from the Lambda's prompt cache, which skips
+            // sampled (temperature > 0) requests unless they opt in
+            cache: true,
           };
 
           const response = await fetch(`https://${endpoint}`, {
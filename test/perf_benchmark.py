@@ -0,0 +1,278 @@
+"""
+Description: Benchmark corpus built on the performance anti-patterns of erroneous_code_test.py.
+
+erroneous_code_test.py stays the fixture the review action is checked against. This harness times
+its slow functions on size-scaled inputs next to optimized reference implementations, so a fix
+suggested in a review can be scored by how much faster it really is:
+
+- calculate_factorial: recursion vs math.factorial and an iterative loop
+- find_largest_number: a Python loop vs the max() built-in
+- inefficient_sort: O(n^2) bubble sort vs the sorted() built-in (Timsort)
+- process_data: an append loop with if/else vs a list comprehension and NumPy (where, vectorized)
+- generate_random_numbers: randint() in an append loop vs random.choices and NumPy's generator
+- blocking_sleep: the fixed time.sleep of main() vs not waiting at all
+
+Every implementation is timed (best of --repeat runs, inputs built outside the timing) and its peak
+memory measured with tracemalloc in a separate run. Outputs are checked against the fixture, or for
+random numbers against its contract (n integers from 1 to 100). With --candidate, the functions of
+the same name in that file (e.g. the fixture after applying a suggested fix) are measured as well.
+The report then gives each candidate's speedup over the fixture and its time relative to the
+fastest reference. NumPy is optional; without it the NumPy references are skipped.
+
+Usage:
+python test/perf_benchmark.py [--candidate fixed_code.py] [--cases inefficient_sort,process_data] [--full] [--repeat 5] [--json report.json]
+"""
+
+import argparse
+import importlib.util
+import json
+import math
+import os
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import erroneous_code_test as fixture  # noqa: E402
+
+# Recursion depth of calculate_factorial stays below the default limit of 1000
+sys.setrecursionlimit(max(sys.getrecursionlimit(), 2000))
+
+
+def iterative_factorial(n):
+    result = 1
+    for i in range(2, n + 1):
+        result *= i
+    return result
+
+
+def process_data_comprehension(data):
+    return [item * 2 if item % 2 == 0 else item * 3 for item in data]
+
+
+def process_data_numpy(data):
+    values = numpy.asarray(data)
+    return numpy.where(values % 2 == 0, values * 2, values * 3)
+
+
+def random_numbers_choices(n):
+    return random.choices(range(1, 101), k=n)
+
+
+def random_numbers_numpy(n):
+    return numpy.random.default_rng().integers(1, 101, size=n)
+
+
+def no_sleep(seconds):
+    return None
+
+
+def random_ints(n):
+    rng = random.Random(n)
+    return [rng.randint(1, 10 ** 6) for _ in range(n)]
+
+
+def same_as_fixture(size, expected, result):
+    if isinstance(expected, int):
+        return expected == result
+    return list(expected) == list(result)
+
+
+def valid_random_numbers(size, expected, result):
+    # Random output can only be checked against the contract: n integers from 1 to 100
+    values = list(result)
+    return len(values) == size and all(1 <= value <= 100 for value in values)
+
+
+def anything(size, expected, result):
+    return True
+
+
+class Case:
+    """One anti-pattern: the fixture function, its references and how inputs scale."""
+
+    def __init__(self, name, function, references, make_input, sizes, full_sizes, check=same_as_fixture,
+                 copy_input=False, size_label="n"):
+        self.name = name
+        self.function = function
+        # name -> function; None for references whose optional dependency is missing
+        self.references = {label: reference for label, reference in references.items() if reference is not None}
+        self.make_input = make_input
+        self.sizes = sizes
+        self.full_sizes = full_sizes
+        self.check = check
+        # inefficient_sort sorts in place, so every call gets a fresh copy
+        self.copy_input = copy_input
+        self.size_label = size_label
+
+
+CASES = [
+    Case("calculate_factorial", "calculate_factorial",
+         {"math.factorial": math.factorial, "iterative": iterative_factorial},
+         lambda n: n, [20, 200, 900], [20, 200, 500, 900]),
+    Case("find_largest_number", "find_largest_number", {"max": max},
+         random_ints, [10 ** 3, 10 ** 5], [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]),
+    Case("inefficient_sort", "inefficient_sort", {"sorted": sorted},
+         random_ints, [100, 1000], [100, 500, 1000, 3000], copy_input=True),
+    Case("process_data", "process_data",
+         {"comprehension": process_data_comprehension, "numpy": process_data_numpy if numpy else None},
+         random_ints, [10 ** 3, 10 ** 5], [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6]),
+    Case("generate_random_numbers", "generate_random_numbers",
+         {"random.choices": random_numbers_choices, "numpy": random_numbers_numpy if numpy else None},
+         lambda n: n, [10 ** 4, 10 ** 5], [10 ** 4, 10 ** 5, 10 ** 6], check=valid_random_numbers),
+    # main() waits a fixed 5 seconds; the sizes are the seconds waited
+    Case("blocking_sleep", time.sleep, {"no wait": no_sleep},
+         lambda seconds: seconds, [0.05], [0.05, 0.5, 5], check=anything, size_label="seconds"),
+]
+
+
+def resolve(case, module):
+    """The case's function in `module`, or None if the module has no such function."""
+    if callable(case.function):
+        return case.function if module is fixture else None
+    return getattr(module, case.function, None)
+
+
+def call(function, value, copy_input):
+    return function(list(value) if copy_input else value)
+
+
+def time_call(function, value, copy_input, repeat):
+    """Best wall time of `repeat` calls, in seconds; slow calls are repeated less."""
+    times = []
+    deadline = time.perf_counter() + 10
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call(function, value, copy_input)
+        times.append(time.perf_counter() - start)
+        if time.perf_counter() > deadline:
+            break
+    return min(times)
+
+
+def peak_memory(function, value, copy_input):
+    """Peak bytes allocated by one call, as traced by tracemalloc."""
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        call(function, value, copy_input)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def measure(function, value, case, size, expected, repeat):
+    correct = case.check(size, expected, call(function, value, case.copy_input))
+    return {"seconds": time_call(function, value, case.copy_input, repeat),
+            "peak_bytes": peak_memory(function, value, case.copy_input),
+            "correct": bool(correct)}
+
+
+def run_case(case, candidate, full, repeat):
+    rows = []
+    for size in case.full_sizes if full else case.sizes:
+        value = case.make_input(size)
+        baseline = resolve(case, fixture)
+        expected = call(baseline, value, case.copy_input)
+        row = {"size": size, "fixture": measure(baseline, value, case, size, expected, repeat), "references": {}}
+        for label, reference in case.references.items():
+            row["references"][label] = measure(reference, value, case, size, expected, repeat)
+        for result in row["references"].values():
+            result["speedup"] = speedup(row["fixture"], result)
+        best = min(row["references"].values(), key=lambda result: result["seconds"])
+        candidate_function = resolve(case, candidate) if candidate else None
+        if candidate_function is not None:
+            result = measure(candidate_function, value, case, size, expected, repeat)
+            result["speedup"] = speedup(row["fixture"], result)
+            # Below 1 the candidate is slower than the best reference
+            result["vs_best_reference"] = round(best["seconds"] / result["seconds"], 3) if result["seconds"] else None
+            row["candidate"] = result
+        rows.append(row)
+    return rows
+
+
+def speedup(baseline, result):
+    return round(baseline["seconds"] / result["seconds"], 2) if result["seconds"] else None
+
+
+def load_candidate(path):
+    spec = importlib.util.spec_from_file_location("candidate", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def print_report(report):
+    for name, rows in report["cases"].items():
+        print(f"\n{name}")
+        for row in rows:
+            fixture_result = row["fixture"]
+            print(f"  {row['size_label']}={row['size']}: fixture {fixture_result['seconds'] * 1000:.3f} ms, "
+                  f"peak {fixture_result['peak_bytes'] / 1024:.0f} KB")
+            entries = [(label, result) for label, result in row["references"].items()]
+            if "candidate" in row:
+                entries.append(("candidate", row["candidate"]))
+            for label, result in entries:
+                line = (f"    {label}: {result['seconds'] * 1000:.3f} ms, peak {result['peak_bytes'] / 1024:.0f} KB, "
+                        f"{result['speedup']}x")
+                if "vs_best_reference" in result:
+                    line += f", {result['vs_best_reference']}x of the best reference"
+                if not result["correct"]:
+                    line += ", WRONG OUTPUT"
+                print(line)
+    if report.get("candidate_score"):
+        score = report["candidate_score"]
+        print(f"\nCandidate: geometric mean speedup {score['speedup']}x over the fixture, "
+              f"{score['vs_best_reference']}x of the best references, {score['wrong']} wrong outputs")
+
+
+def score(report):
+    """Geometric means of the candidate's speedups over all cases and sizes."""
+    results = [row["candidate"] for rows in report["cases"].values() for row in rows if "candidate" in row]
+    if not results:
+        return None
+    def mean(values):
+        values = [value for value in values if value]
+        return round(statistics.geometric_mean(values), 3) if values else None
+
+    return {"speedup": mean(r["speedup"] for r in results),
+            "vs_best_reference": mean(r["vs_best_reference"] for r in results),
+            "wrong": sum(not r["correct"] for r in results)}
+
+
+def main(args):
+    candidate = load_candidate(args.candidate) if args.candidate else None
+    names = args.cases.split(',') if args.cases else [case.name for case in CASES]
+    report = {"numpy": numpy.__version__ if numpy else None, "repeat": args.repeat, "cases": {}}
+    for case in CASES:
+        if case.name not in names:
+            continue
+        rows = run_case(case, candidate, args.full, args.repeat)
+        for row in rows:
+            row["size_label"] = case.size_label
+        report["cases"][case.name] = rows
+    if candidate:
+        report["candidate"] = args.candidate
+        report["candidate_score"] = score(report)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the anti-patterns of erroneous_code_test.py against optimized references")
+    parser.add_argument("--candidate", help="Python file with fixed versions of the fixture functions to score")
+    parser.add_argument("--cases", help=f"Comma-separated cases (default all: {','.join(case.name for case in CASES)})")
+    parser.add_argument("--full", action="store_true", help="Use the full size ladder, up to 10^6 items and the 5 second sleep")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed calls per implementation and size; the best counts (default 5)")
+    parser.add_argument("--json", help="Also write the report as JSON to this file")
+    main(parser.parse_args())
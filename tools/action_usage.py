@@ -1,151 +1,356 @@
-import requests
 import base64
-import time
 from datetime import datetime
 import csv
 from collections import Counter
 import json
 import os
+import glob
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
+import argparse
+from rate_limiter import limiter_for_url, is_rate_limited, get_limiter, token_stats, token_report
+import http_cache
+from http_cache import cached_get
+import blob_cache
+import github_client
+from github_client import get_client, auth_headers, MAX_RETRIES
+from search_shards import ShardedSearch
+import workflow_analyzer
+import telemetry
+import cassette
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Get the GitHub token from environment variable
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+# Get the GitHub token(s) from GITHUB_TOKENS (comma-separated) or GITHUB_TOKEN
+if not github_client.tokens():
+    raise ValueError("GITHUB_TOKEN (or GITHUB_TOKENS) is not set in the environment variables")
 
-if not GITHUB_TOKEN:
-    raise ValueError("GITHUB_TOKEN is not set in the environment variables")
+GITHUB_API_URL = os.getenv('GITHUB_API_URL', 'https://api.github.com').rstrip('/')
 
-HEADERS = {
-    'Authorization': f'token {GITHUB_TOKEN}',
-    'Accept': 'application/vnd.github.v3+json',
-}
+def github_get(url, max_retries=MAX_RETRIES, use_cache=True):
+    # Search and core requests are paced by separate shared buckets, see rate_limiter.py
+    limiter = limiter_for_url(url)
+    for attempt in range(max_retries):
+        # The token with the most headroom sends the request; pooled connections come from the
+        # shared client, see github_client.py.
+        # File contents and repo info are revalidated against the response cache, see http_cache.py
+        token = limiter.acquire()
+        client = get_client()
+        headers = auth_headers(token)
+        response = cached_get(url, headers=headers, send=client.get) if use_cache else client.get(url, headers=headers)
+        limiter.update(response.headers, token)
+        if not is_rate_limited(response):
+            break
+        sleep_time = limiter.backoff(response.headers, 2 ** attempt, token)
+        print(f"Rate limited ({response.status_code}). Retrying in {sleep_time:.2f} seconds.")
+    return response
 
 def search_repos(query, page=1):
-    url = f'https://api.github.com/search/code?q={query}&page={page}&per_page=100'
-    response = requests.get(url, headers=HEADERS)
+    url = f'{GITHUB_API_URL}/search/code?q={query}&page={page}&per_page=100'
+    response = github_get(url, use_cache=False)
     if response.status_code == 200:
-        return response.json()
+        return telemetry.decode(response)
     else:
         print(f"Error: {response.status_code}, {response.text}")
         return None
 
 def get_file_content(url):
-    response = requests.get(url, headers=HEADERS)
+    response = github_get(url)
     if response.status_code == 200:
-        content = base64.b64decode(response.json()['content']).decode('utf-8')
+        content = base64.b64decode(telemetry.decode(response)['content']).decode('utf-8')
         return content
     else:
         print(f"Error fetching file content: {response.status_code}, {response.text}")
         return None
 
+class RepoInfoMemo:
+    """One get_repo_info request per repository per run, shared by all of its workflow files."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.futures = {}
+        self.hits = 0
+        self.lock = threading.Lock()
+
+    def get(self, repo_name):
+        """Future of the repository's info; the lookup is started on first use."""
+        with self.lock:
+            future = self.futures.get(repo_name)
+            if future is None:
+                future = self.futures[repo_name] = self.executor.submit(get_repo_info, repo_name)
+            else:
+                self.hits += 1
+            return future
+
+class WorkflowMemo:
+    """One analysis per distinct workflow blob per run; the blob cache also spans runs, see blob_cache.py."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.futures = {}
+        self.lock = threading.Lock()
+
+    def get(self, item):
+        """(future of the file's analysis, whether an identical file was already seen in this run)."""
+        sha = item.get('sha')
+        if not sha:
+            return self.executor.submit(load_workflow, item['url'], None), False
+        with self.lock:
+            future = self.futures.get(sha)
+            if future is not None:
+                return future, True
+            future = self.futures[sha] = self.executor.submit(load_workflow, item['url'], sha)
+            return future, False
+
+def analyze_content(content):
+    workflow = workflow_analyzer.analyze(content)
+    workflow['uses_count'] = content.count('yike5460/intelli-ops@stable')
+    return workflow
+
+def load_workflow(url, sha):
+    """(analysis, 'cached' or 'fetched') of the workflow file at `url`, or (None, 'fetched') on failure."""
+    cache = blob_cache.get_cache()
+    if cache and sha:
+        cached = cache.lookup(sha, workflow_analyzer.VERSION)
+        if cached:
+            content, workflow = cached
+            if workflow is None:
+                workflow = analyze_content(content)
+                cache.store(sha, content, workflow, workflow_analyzer.VERSION)
+            return workflow, 'cached'
+    content = get_file_content(url)
+    if not content:
+        return None, 'fetched'
+    workflow = analyze_content(content)
+    if cache:
+        # Keyed by the SHA of what was fetched, in case the file changed since it was indexed
+        cache.store(blob_cache.blob_sha(content.encode('utf-8')), content, workflow, workflow_analyzer.VERSION)
+    return workflow, 'fetched'
+
 def get_repo_info(repo_name):
-    url = f'https://api.github.com/repos/{repo_name}'
-    response = requests.get(url, headers=HEADERS)
+    url = f'{GITHUB_API_URL}/repos/{repo_name}'
+    response = github_get(url)
     if response.status_code == 200:
-        return response.json()
+        return telemetry.decode(response)
     else:
         print(f"Error fetching repo info: {response.status_code}, {response.text}")
         return None
 
 def analyze_workflow(content):
-    lines = content.split('\n')
-    job_names = []
-    steps_with_action = []
-    for i, line in enumerate(lines):
-        if line.strip().startswith('jobs:'):
-            for j in range(i+1, len(lines)):
-                if lines[j].strip() and not lines[j].startswith(' '):
-                    break
-                if not lines[j].startswith('  '):
-                    job_names.append(lines[j].strip().rstrip(':'))
-        if 'yike5460/intelli-ops@stable' in line:
-            step_name = "Unknown"
-            for k in range(i-1, -1, -1):
-                if lines[k].strip().startswith('- name:'):
-                    step_name = lines[k].split('name:')[1].strip()
-                    break
-            steps_with_action.append(step_name)
-    return job_names, steps_with_action
+    """Job ids of a workflow and the names of the steps that use the action, see workflow_analyzer.py."""
+    analysis = workflow_analyzer.analyze(content)
+    return analysis['jobs'], [use['step'] or "Unknown" for use in analysis['uses']]
+
+CSV_FIELDS = ['repo_name', 'file_path', 'file_url', 'uses_count', 'repo_type', 'jobs', 'steps', 'versions']
+
+def find_unfinished_run():
+    """Timestamp of the most recent run that left a checkpoint behind, or None."""
+    checkpoints = sorted(glob.glob('action_usage_checkpoint_*.json'), reverse=True)
+    return checkpoints[0][len('action_usage_checkpoint_'):-len('.json')] if checkpoints else None
 
-def main():
+def save_checkpoint(path, checkpoint):
+    # Write-then-rename, so a crash leaves either the old or the new checkpoint
+    with open(path + '.tmp', 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f)
+    os.replace(path + '.tmp', path)
+
+def main(resume=None, workers=8):
     query = 'yike5460/intelli-ops@stable+in:file+path:.github/workflows'
-    page = 1
-    results = []
-    repo_types = Counter()
-    job_names = Counter()
-    step_names = Counter()
-
-    while True:
-        print(f"Fetching page {page}...")
-        data = search_repos(query, page)
-        
-        if not data or 'items' not in data:
-            break
 
-        for item in data['items']:
-            repo_name = item['repository']['full_name']
-            file_path = item['path']
-            file_url = item['html_url']
-            raw_url = item['url']
-
-            content = get_file_content(raw_url)
-            if content:
-                uses_count = content.count('yike5460/intelli-ops@stable')
-                jobs, steps = analyze_workflow(content)
-                
-                repo_info = get_repo_info(repo_name)
-                if repo_info:
-                    repo_type = repo_info['language'] or 'Unknown'
-                    repo_types[repo_type] += 1
-                    
-                job_names.update(jobs)
-                step_names.update(steps)
-                
-                results.append({
-                    'repo_name': repo_name,
-                    'file_path': file_path,
-                    'file_url': file_url,
-                    'uses_count': uses_count,
-                    'repo_type': repo_type,
-                    'jobs': ', '.join(jobs),
-                    'steps': ', '.join(steps)
-                })
-
-        if len(data['items']) < 100:  # Last page
-            break
+    # Rows are written as soon as a file is analyzed. The checkpoint records the position in the
+    # search (page sequence number, item within the page), the CSV length and the counters after
+    # the last written row. The search planner state before each page, which includes every hit
+    # seen so far, is saved once per page in a separate file.
+    if resume:
+        timestamp = find_unfinished_run() if resume == 'latest' else resume
+        checkpoint_filename = f'action_usage_checkpoint_{timestamp}.json'
+        search_filename = f'action_usage_search_{timestamp}.json'
+        if not timestamp or not os.path.exists(checkpoint_filename):
+            print("No interrupted run to resume.")
+            return
+        with open(checkpoint_filename, encoding='utf-8') as f:
+            checkpoint = json.load(f)
+        search_state = None
+        if os.path.exists(search_filename):
+            with open(search_filename, encoding='utf-8') as f:
+                search_state = json.load(f)
+        if search_state is None or search_state['seq'] != checkpoint['seq']:
+            # The last page was finished before the next one was started
+            checkpoint['item'] = 0
+        print(f"Resuming run {timestamp} at page {search_state['seq'] if search_state else 1}, item {checkpoint['item']}...")
+    else:
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        checkpoint_filename = f'action_usage_checkpoint_{timestamp}.json'
+        search_filename = f'action_usage_search_{timestamp}.json'
+        checkpoint = {'seq': 0, 'item': 0, 'csv_offset': None, 'total': 0,
+                      'repo_types': {}, 'job_names': {}, 'step_names': {}, 'workflow_sources': {}}
+        search_state = None
+    seq, skip, total = checkpoint['seq'], checkpoint['item'], checkpoint['total']
+    repo_types = Counter(checkpoint['repo_types'])
+    job_names = Counter(checkpoint['job_names'])
+    step_names = Counter(checkpoint['step_names'])
+    action_versions = Counter(checkpoint.get('action_versions', {}))
+    step_inputs = Counter(checkpoint.get('step_inputs', {}))
+    # How each workflow file was obtained: fetched, duplicate (of a file earlier in this run) or cached
+    workflow_sources = Counter(checkpoint.get('workflow_sources', {}))
 
-        page += 1
-        time.sleep(10)  # Respect GitHub API rate limits
+    # Hits beyond the 1000-result cap are reached by splitting the query, see search_shards.py
+    search = ShardedSearch(query, search_repos, search_state['state'] if search_state else None)
+    if search_state:
+        seq = search_state['seq'] - 1
 
-    # Save detailed results to CSV
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f'action_usage_detailed_{timestamp}.csv'
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = ['repo_name', 'file_path', 'file_url', 'uses_count', 'repo_type', 'jobs', 'steps']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
+    csvfile = open(filename, 'r+' if resume else 'w', newline='', encoding='utf-8')
+    writer = csv.DictWriter(csvfile, fieldnames=CSV_FIELDS)
+    if resume:
+        # Drop any row written after the checkpoint
+        csvfile.seek(checkpoint['csv_offset'])
+        csvfile.truncate()
+    else:
         writer.writeheader()
-        for result in results:
-            writer.writerow(result)
+        csvfile.flush()
+        checkpoint['csv_offset'] = csvfile.tell()
+        save_checkpoint(checkpoint_filename, checkpoint)
+
+    # File contents and repo info are fetched by a bounded pool, and the next search page is
+    # requested while the current one is processed. Rows are still written in search order.
+    # Files whose blob SHA was seen before are neither fetched nor parsed again.
+    executor = ThreadPoolExecutor(max_workers=workers)
+    searcher = ThreadPoolExecutor(max_workers=1)
+    repo_infos = RepoInfoMemo(executor)
+    workflows = WorkflowMemo(executor)
+
+    try:
+        with csvfile:
+            next_page = searcher.submit(search.next_page)
+            while True:
+                state, items = next_page.result()
+
+                if items is None:
+                    break
+
+                next_page = searcher.submit(search.next_page)
+                seq += 1
+                save_checkpoint(search_filename, {'seq': seq, 'state': state})
+                print(f"Processing search page {seq} ({len(items)} new hits)...")
+
+                pending = [(index, item, *workflows.get(item),
+                            repo_infos.get(item['repository']['full_name']))
+                           for index, item in enumerate(items[skip:], start=skip)]
+
+                for index, item, workflow_future, duplicate, repo_info_future in pending:
+                    repo_name = item['repository']['full_name']
+                    file_path = item['path']
+                    file_url = item['html_url']
+
+                    workflow, source = workflow_future.result()
+                    if workflow:
+                        workflow_sources['duplicate' if duplicate else source] += 1
+                        uses_count = workflow['uses_count']
+                        jobs = workflow['jobs']
+                        steps = [use['step'] or "Unknown" for use in workflow['uses']]
+                        versions = [use['ref'] or "unpinned" for use in workflow['uses']]
+
+                        repo_info = repo_info_future.result()
+                        repo_type = 'Unknown'
+                        if repo_info:
+                            repo_type = repo_info['language'] or 'Unknown'
+                            repo_types[repo_type] += 1
+
+                        job_names.update(jobs)
+                        step_names.update(steps)
+                        action_versions.update(versions)
+                        step_inputs.update(key for use in workflow['uses'] for key in use['with'])
+
+                        writer.writerow({
+                            'repo_name': repo_name,
+                            'file_path': file_path,
+                            'file_url': file_url,
+                            'uses_count': uses_count,
+                            'repo_type': repo_type,
+                            'jobs': ', '.join(jobs),
+                            'steps': ', '.join(steps),
+                            'versions': ', '.join(versions)
+                        })
+                        total += 1
+
+                    csvfile.flush()
+                    save_checkpoint(checkpoint_filename, {
+                        'seq': seq, 'item': index + 1, 'csv_offset': csvfile.tell(), 'total': total,
+                        'repo_types': repo_types, 'job_names': job_names, 'step_names': step_names,
+                        'action_versions': action_versions, 'step_inputs': step_inputs,
+                        'workflow_sources': workflow_sources,
+                    })
+                skip = 0
+    finally:
+        searcher.shutdown(cancel_futures=True)
+        executor.shutdown(cancel_futures=True)
 
     # Save analysis results to JSON
     analysis_filename = f'action_usage_analysis_{timestamp}.json'
+    coverage = search.report()
+    coverage['requests'] = {resource: get_limiter(resource).requests for resource in ('search', 'core')}
     analysis = {
-        'total_repos': len(results),
+        'total_repos': total,
+        'search': coverage,
+        'tokens': token_stats(),
+        'workflow_files': {source: workflow_sources[source] for source in ('fetched', 'duplicate', 'cached')},
         'repo_types': dict(repo_types),
         'top_10_job_names': dict(job_names.most_common(10)),
-        'top_10_step_names': dict(step_names.most_common(10))
+        'top_10_step_names': dict(step_names.most_common(10)),
+        'action_versions': dict(action_versions.most_common()),
+        'top_10_step_inputs': dict(step_inputs.most_common(10))
     }
     with open(analysis_filename, 'w', encoding='utf-8') as jsonfile:
         json.dump(analysis, jsonfile, indent=2)
+    for run_file in (checkpoint_filename, search_filename):
+        if os.path.exists(run_file):
+            os.remove(run_file)
 
     print(f"Detailed results saved to {filename}")
     print(f"Analysis results saved to {analysis_filename}")
-    print(f"Total repositories using the action: {len(results)}")
+    print(f"Total repositories using the action: {total}")
+    print(f"Repository lookups shared between workflow files: {repo_infos.hits}")
+    print(f"Workflow files fetched: {workflow_sources['fetched']}, identical to an earlier file in this run: "
+          f"{workflow_sources['duplicate']}, served from the blob cache: {workflow_sources['cached']}")
+    print(f"Search coverage: {coverage['unique_hits']} unique hits of {coverage['total_count']} reported "
+          f"({coverage['coverage']:.1%}) in {coverage['shards']} shards, {len(coverage['truncated_shards'])} truncated")
+    print(f"Requests spent: {coverage['requests']['search']} search, {coverage['requests']['core']} core")
     print(f"Top 5 repository types:")
     for repo_type, count in repo_types.most_common(5):
         print(f"  {repo_type}: {count}")
+    cache = http_cache.get_cache()
+    if cache:
+        print(f"Cached responses revalidated (304): {cache.hits}, fetched: {cache.misses}")
+    print(token_report())
+    print(telemetry.get_telemetry().report())
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Usage of the intelli-ops action across GitHub")
+    parser.add_argument("--cache-dir", default=http_cache.DEFAULT_CACHE_DIR, help=f"Directory of the HTTP response cache (default {http_cache.DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not cache or revalidate responses, nor reuse workflow files seen before")
+    parser.add_argument("--pool-size", type=int, default=github_client.DEFAULT_POOL_SIZE, help=f"Keep-alive connections kept open (default {github_client.DEFAULT_POOL_SIZE})")
+    parser.add_argument("--http2", action="store_true", help="Multiplex requests over HTTP/2 (needs httpx[http2])")
+    parser.add_argument("--workers", type=int, default=8, help="Concurrent file and repository requests (default 8)")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="TIMESTAMP",
+                        help="Continue an interrupted run (default the latest one that left a checkpoint)")
+    parser.add_argument("--metrics", help="Write request telemetry as a JSON summary to this file, see telemetry.py")
+    parser.add_argument("--prometheus", help="Write request telemetry in the Prometheus text format to this file")
+    parser.add_argument("--trace", help="Write a Chrome trace of every request, decode and limiter sleep to this file")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record the API traffic for replay_github.py (gzipped JSON Lines, see cassette.py)")
+    args = parser.parse_args()
+
+    http_cache.configure(None if args.no_cache else args.cache_dir)
+    blob_cache.configure(None if args.no_cache else args.cache_dir)
+    github_client.configure(pool_size=args.pool_size, http2=args.http2)
+
+    telemetry.configure(trace=bool(args.trace))
+
+    cassette.configure(args.record, GITHUB_API_URL)
+    try:
+        main(args.resume, args.workers)
+    finally:
+        cassette.close()
+    telemetry.get_telemetry().write(args.metrics, args.prometheus, args.trace)
@@ -0,0 +1,221 @@
+"""
+Description: Compares full JSON decoding with the field projections of github_stats.py on large list pages.
+
+Pages of --items PRs, issues, PR commits and issue comments are built in the shape api.github.com
+returns them: user objects, labels, links and, for PRs, the full head and base repositories. The
+fake server's pages are much slimmer than that. Each page is decoded with response.json()'s
+json.loads and with the projection github_stats.py uses (json_projection.py). The report gives the
+CPU time per page, the peak memory while decoding, and the memory still held by the decoded page,
+which github_stats.py keeps alive until its commit or comment requests have run. It also gives the
+time per page when --held decoded pages are kept alive, as they are in the worker queue of a large
+repository. Every full page adds thousands of dicts for the cyclic garbage collector to traverse.
+Pages recorded from the real API can be measured instead with --recorded DIR. That directory holds
+JSON list pages named pulls*.json, issues*.json, commits*.json or comments*.json.
+
+Usage:
+python bench_decode.py [--items 100] [--repeat 20] [--held 200] [--recorded <dir>]
+"""
+
+import argparse
+import gc
+import glob
+import json
+import os
+import time
+import tracemalloc
+
+import github_stats
+
+PROJECTIONS = {"pulls": github_stats.PULL, "issues": github_stats.ISSUE,
+               "commits": github_stats.COMMIT, "comments": github_stats.COMMENT}
+
+BODY = ("Fixes a race in the file watcher. The initialization order changed so that the watcher is "
+        "registered before the first scan, and the debounce timer is reset on every event.\n\n") * 6
+
+
+def user(i):
+    login = f"user{i % 37}"
+    base = f"https://api.github.com/users/{login}"
+    return {"login": login, "id": 1000 + i, "node_id": f"MDQ6VXNlcj{i:08d}",
+            "avatar_url": f"https://avatars.githubusercontent.com/u/{1000 + i}?v=4", "gravatar_id": "",
+            "url": base, "html_url": f"https://github.com/{login}", "followers_url": f"{base}/followers",
+            "following_url": f"{base}/following{{/other_user}}", "gists_url": f"{base}/gists{{/gist_id}}",
+            "starred_url": f"{base}/starred{{/owner}}{{/repo}}", "subscriptions_url": f"{base}/subscriptions",
+            "organizations_url": f"{base}/orgs", "repos_url": f"{base}/repos", "events_url": f"{base}/events{{/privacy}}",
+            "received_events_url": f"{base}/received_events", "type": "User", "site_admin": False}
+
+
+def repository(i):
+    name = "aws-cdk" if i % 2 else f"aws-cdk-fork{i}"
+    base = f"https://api.github.com/repos/owner{i}/{name}"
+    repo = {"id": 50000 + i, "node_id": f"MDEwOlJlcG9zaXRvcnk{i:08d}", "name": name, "full_name": f"owner{i}/{name}",
+            "private": False, "owner": user(i), "html_url": f"https://github.com/owner{i}/{name}",
+            "description": "The AWS Cloud Development Kit is a framework for defining cloud infrastructure in code",
+            "fork": bool(i % 2), "url": base, "created_at": "2018-05-24T19:31:48Z", "updated_at": "2024-06-01T10:00:00Z",
+            "pushed_at": "2024-06-01T09:58:00Z", "git_url": f"git://github.com/owner{i}/{name}.git",
+            "ssh_url": f"git@github.com:owner{i}/{name}.git", "clone_url": f"https://github.com/owner{i}/{name}.git",
+            "svn_url": f"https://github.com/owner{i}/{name}", "homepage": "https://aws.amazon.com/cdk", "size": 812345,
+            "stargazers_count": 11000, "watchers_count": 11000, "language": "TypeScript", "has_issues": True,
+            "has_projects": True, "has_downloads": True, "has_wiki": False, "has_pages": False, "has_discussions": True,
+            "forks_count": 3900, "mirror_url": None, "archived": False, "disabled": False, "open_issues_count": 2100,
+            "license": {"key": "apache-2.0", "name": "Apache License 2.0", "spdx_id": "Apache-2.0",
+                        "url": "https://api.github.com/licenses/apache-2.0", "node_id": "MDc6TGljZW5zZTI="},
+            "allow_forking": True, "is_template": False, "web_commit_signoff_required": False,
+            "topics": ["aws", "cloud", "infrastructure-as-code", "typescript"], "visibility": "public",
+            "forks": 3900, "open_issues": 2100, "watchers": 11000, "default_branch": "main"}
+    for name in ("forks", "keys", "collaborators", "teams", "hooks", "issue_events", "events", "assignees",
+                 "branches", "tags", "blobs", "git_tags", "git_refs", "trees", "statuses", "languages",
+                 "stargazers", "contributors", "subscribers", "subscription", "commits", "git_commits",
+                 "comments", "issue_comment", "contents", "compare", "merges", "archive", "downloads",
+                 "issues", "pulls", "milestones", "notifications", "labels", "releases", "deployments"):
+        repo[f"{name}_url"] = f"{base}/{name}{{/number}}"
+    return repo
+
+
+def timestamp(i, offset=0):
+    return f"2024-0{1 + (i + offset) % 9}-{1 + i % 28:02d}T{i % 24:02d}:{i % 60:02d}:00Z"
+
+
+def labels(i):
+    return [{"id": 700 + j, "node_id": f"LA_kwDO{j:06d}", "url": f"https://api.github.com/repos/aws/aws-cdk/labels/l{j}",
+             "name": f"label-{j}", "color": "ededed", "default": False, "description": "Label description"}
+            for j in range(i % 4)]
+
+
+def pull(i):
+    base = f"https://api.github.com/repos/aws/aws-cdk/pulls/{i}"
+    item = {"url": base, "id": 90000 + i, "node_id": f"PR_kwDO{i:08d}", "html_url": f"https://github.com/aws/aws-cdk/pull/{i}",
+            "diff_url": f"https://github.com/aws/aws-cdk/pull/{i}.diff", "patch_url": f"https://github.com/aws/aws-cdk/pull/{i}.patch",
+            "issue_url": f"https://api.github.com/repos/aws/aws-cdk/issues/{i}", "number": i, "state": "closed",
+            "locked": False, "title": f"fix(core): change number {i}", "user": user(i), "body": BODY, "labels": labels(i),
+            "milestone": None, "active_lock_reason": None, "created_at": timestamp(i), "updated_at": timestamp(i, 1),
+            "closed_at": timestamp(i, 1) if i % 3 else None, "merged_at": timestamp(i, 1) if i % 3 else None,
+            "merge_commit_sha": f"{i:040x}", "assignee": None, "assignees": [user(i + 1)],
+            "requested_reviewers": [user(i + 2)], "requested_teams": [], "draft": False,
+            "commits_url": f"{base}/commits", "review_comments_url": f"{base}/comments",
+            "review_comment_url": "https://api.github.com/repos/aws/aws-cdk/pulls/comments{/number}",
+            "comments_url": f"https://api.github.com/repos/aws/aws-cdk/issues/{i}/comments",
+            "statuses_url": f"https://api.github.com/repos/aws/aws-cdk/statuses/{i:040x}",
+            "author_association": "CONTRIBUTOR", "auto_merge": None}
+    for side, offset in (("head", 1), ("base", 0)):
+        item[side] = {"label": f"owner{i + offset}:branch-{i}", "ref": f"branch-{i}", "sha": f"{i + offset:040x}",
+                      "user": user(i + offset), "repo": repository(i + offset)}
+    item["_links"] = {name: {"href": f"{base}/{name}"} for name in
+                      ("self", "html", "issue", "comments", "review_comments", "review_comment", "commits", "statuses")}
+    return item
+
+
+def issue(i):
+    item = pull(i)
+    for key in ("diff_url", "patch_url", "issue_url", "merge_commit_sha", "requested_reviewers", "requested_teams",
+                "head", "base", "_links", "commits_url", "review_comments_url", "review_comment_url", "statuses_url",
+                "merged_at", "auto_merge", "draft"):
+        del item[key]
+    item["reactions"] = {"url": f"https://api.github.com/repos/aws/aws-cdk/issues/{i}/reactions", "total_count": 3,
+                         "+1": 2, "-1": 0, "laugh": 0, "hooray": 1, "confused": 0, "heart": 0, "rocket": 0, "eyes": 0}
+    item["timeline_url"] = f"https://api.github.com/repos/aws/aws-cdk/issues/{i}/timeline"
+    if i % 2:
+        item["pull_request"] = {"url": f"https://api.github.com/repos/aws/aws-cdk/pulls/{i}", "merged_at": None}
+    return item
+
+
+def commit(i):
+    sha = f"{i:040x}"
+    person = {"name": f"Dev {i % 37}", "email": f"dev{i % 37}@example.com", "date": timestamp(i)}
+    return {"sha": sha, "node_id": f"C_kwDO{i:08d}",
+            "commit": {"author": person, "committer": dict(person), "message": BODY[:300],
+                       "tree": {"sha": f"{i + 1:040x}", "url": f"https://api.github.com/repos/aws/aws-cdk/git/trees/{i + 1:040x}"},
+                       "url": f"https://api.github.com/repos/aws/aws-cdk/git/commits/{sha}", "comment_count": 0,
+                       "verification": {"verified": False, "reason": "unsigned", "signature": None, "payload": None}},
+            "url": f"https://api.github.com/repos/aws/aws-cdk/commits/{sha}", "html_url": f"https://github.com/aws/aws-cdk/commit/{sha}",
+            "comments_url": f"https://api.github.com/repos/aws/aws-cdk/commits/{sha}/comments",
+            "author": user(i), "committer": user(i + 1),
+            "parents": [{"sha": f"{i - 1:040x}", "url": f"https://api.github.com/repos/aws/aws-cdk/commits/{i - 1:040x}",
+                         "html_url": f"https://github.com/aws/aws-cdk/commit/{i - 1:040x}"}]}
+
+
+def comment(i):
+    return {"url": f"https://api.github.com/repos/aws/aws-cdk/issues/comments/{i}", "html_url": f"https://github.com/aws/aws-cdk/issues/1#issuecomment-{i}",
+            "issue_url": "https://api.github.com/repos/aws/aws-cdk/issues/1", "id": 4000000 + i, "node_id": f"IC_kwDO{i:08d}",
+            "user": user(i), "created_at": timestamp(i), "updated_at": timestamp(i, 1), "author_association": "MEMBER",
+            "body": BODY[:600], "reactions": {"url": f"https://api.github.com/repos/aws/aws-cdk/issues/comments/{i}/reactions",
+                                               "total_count": 0}, "performed_via_github_app": None}
+
+
+BUILDERS = {"pulls": pull, "issues": issue, "commits": commit, "comments": comment}
+
+
+def full_decode(body):
+    return json.loads(body)
+
+
+def measure(decode, body, repeat):
+    """(ms per page, peak KB while decoding, KB held by the result)."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode(body)
+    seconds = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    result = decode(body)
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return round(seconds * 1000, 2), round(peak / 1024), round(held / 1024)
+
+
+def measure_held(decode, body, held):
+    """ms per page while every decoded page stays alive."""
+    pages = []
+    start = time.perf_counter()
+    for _ in range(held):
+        pages.append(decode(body))
+    seconds = (time.perf_counter() - start) / held
+    del pages
+    gc.collect()
+    return round(seconds * 1000, 2)
+
+
+def check(projection, body):
+    """The projected fields match those read from the fully decoded page."""
+    for item, record in zip(json.loads(body), projection.decode(body)):
+        assert record == projection.project(item), (item, record)
+
+
+def main(args):
+    pages = {}
+    if args.recorded:
+        for path in sorted(glob.glob(os.path.join(args.recorded, "*.json"))):
+            kind = next((kind for kind in PROJECTIONS if os.path.basename(path).startswith(kind)), None)
+            if kind:
+                with open(path, "rb") as f:
+                    pages[os.path.basename(path)] = (kind, f.read())
+    else:
+        for kind, build in BUILDERS.items():
+            pages[kind] = (kind, json.dumps([build(i) for i in range(1, args.items + 1)]).encode())
+
+    report = {}
+    for name, (kind, body) in pages.items():
+        projection = PROJECTIONS[kind]
+        check(projection, body)
+        full = measure(full_decode, body, args.repeat)
+        projected = measure(projection.decode, body, args.repeat)
+        report[name] = {
+            "page_kb": round(len(body) / 1024),
+            "json_loads": {"ms": full[0], "peak_kb": full[1], "held_kb": full[2]},
+            "projection": {"ms": projected[0], "peak_kb": projected[1], "held_kb": projected[2]},
+            "cpu_speedup": round(full[0] / projected[0], 2),
+            f"ms_per_page_with_{args.held}_held": {"json_loads": measure_held(full_decode, body, args.held),
+                                                    "projection": measure_held(projection.decode, body, args.held)},
+            "peak_reduction": round(full[1] / max(projected[1], 1), 1),
+            "held_reduction": round(full[2] / max(projected[2], 1), 1),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark field-projecting decoding of GitHub list pages")
+    parser.add_argument("--items", type=int, default=100, help="Items per synthetic page (default 100)")
+    parser.add_argument("--repeat", type=int, default=20, help="Timed decodes per page (default 20)")
+    parser.add_argument("--held", type=int, default=200, help="Decoded pages kept alive in the queued-work measurement (default 200)")
+    parser.add_argument("--recorded", help="Directory of recorded pages (pulls*.json, issues*.json, commits*.json, comments*.json)")
+    main(parser.parse_args())
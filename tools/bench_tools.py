@@ -0,0 +1,140 @@
+"""
+Description: End-to-end benchmark of the GitHub tools against recorded traffic, reproducible offline.
+
+Each tool run is replayed from a cassette (see cassette.py) by replay_github.py, under the same
+latency, jitter, rate limits and injected 403 replies every time, so changes to fetch_data,
+get_github_stats, action_usage.main and the limiters can be compared without spending quota or
+measuring network noise. The tools run as subprocesses with their real command lines. For every
+run the report has the requests sent, the wall time, the time the limiters slept (pacing and
+backoff, summed over threads, from --metrics) and the replay server's counters (served, 304s,
+misses, rate-limited and injected replies).
+
+Cassettes are read from --cassettes <dir> as <tool>.jsonl.gz. Missing ones are recorded first
+against fake_github.py. To benchmark real traffic instead, record it once with the tool's
+--record option under the same name, e.g.
+GITHUB_API_URL=https://api.github.com python github_stats.py aws/aws-cdk --days 30 --no-cache --record bench/github_stats.jsonl.gz
+and pass the same --repos and --days here.
+
+Usage:
+python bench_tools.py [--cassettes <dir>] [--tools github_stats,github_stats_graphql,action_usage] [--repeat 3]
+    [--repos fake/repo] [--days 90] [--tokens 1] [--latency 0.02] [--jitter 0.01] [--core-limit 5000] [--window 3600]
+    [--search-limit 30] [--rate-limit-errors 0.01] [--abuse-errors 0.01] [--retry-after 1] [--seed 0]
+
+Sample:
+python bench_tools.py --cassettes bench --latency 0.03 --jitter 0.02 --abuse-errors 0.01 --repeat 3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from fake_github import FakeGitHub, FakeRepo, start_server
+from replay_github import add_condition_arguments, replay_from_args, start_replay
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Command line of each tool; every run also gets --metrics
+TOOLS = {
+    "github_stats": lambda args: ["github_stats.py", args.repos, "--days", str(args.days), "--no-cache"],
+    "github_stats_graphql": lambda args: ["github_stats.py", args.repos, "--days", str(args.days), "--no-cache",
+                                          "--backend", "graphql"],
+    "action_usage": lambda args: ["action_usage.py", "--no-cache"],
+}
+
+
+def run_tool(tool, args, base_url, extra=()):
+    """Run `tool` against base_url in a scratch directory; returns (exit code, wall seconds, telemetry summary)."""
+    with tempfile.TemporaryDirectory() as workdir:
+        metrics = os.path.join(workdir, "metrics.json")
+        script, *options = TOOLS[tool](args)
+        command = [sys.executable, os.path.join(TOOLS_DIR, script), *options, "--metrics", metrics, *extra]
+        env = dict(os.environ, GITHUB_API_URL=base_url, GITHUB_TOKEN="bench-token")
+        env.pop("GITHUB_GRAPHQL_URL", None)
+        if args.tokens > 1:
+            env["GITHUB_TOKENS"] = ",".join(f"bench-token-{i + 1}" for i in range(args.tokens))
+        else:
+            env.pop("GITHUB_TOKENS", None)
+        start = time.perf_counter()
+        result = subprocess.run(command, cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        wall = time.perf_counter() - start
+        if result.returncode != 0:
+            print(f"{tool} exited with {result.returncode}:\n{result.stderr[-2000:]}", file=sys.stderr)
+        summary = {}
+        if os.path.exists(metrics):
+            with open(metrics, encoding="utf-8") as f:
+                summary = json.load(f)
+        return result.returncode, wall, summary
+
+
+def record_fake(tool, path, args):
+    """Record a cassette of `tool` against fake_github.py, without rate limits."""
+    fake = FakeGitHub([FakeRepo(name, prs=args.prs, issues=args.issues, seed=i)
+                       for i, name in enumerate(args.repos.split(','))],
+                      core_limit=10 ** 9, search_limit=10 ** 9, search_hits=args.search_hits)
+    server, base_url = start_server(fake)
+    try:
+        code, wall, _ = run_tool(tool, args, base_url, ["--record", os.path.abspath(path)])
+    finally:
+        server.shutdown()
+    if code != 0:
+        raise RuntimeError(f"Recording {tool} failed")
+    print(f"Recorded {fake.stats()['requests']} requests of {tool} to {path} in {wall:.1f}s", file=sys.stderr)
+
+
+def replay_run(tool, path, args):
+    replay = replay_from_args(path, args)
+    server, base_url = start_replay(replay)
+    try:
+        code, wall, summary = run_tool(tool, args, base_url)
+    finally:
+        server.shutdown()
+    return {
+        "exit_code": code,
+        "wall_seconds": round(wall, 3),
+        "requests": summary.get("requests"),
+        "sleep_seconds": summary.get("sleep_seconds"),
+        "sleeps": summary.get("sleeps"),
+        "network_seconds": summary.get("network_seconds"),
+        "decode_seconds": summary.get("decode_seconds"),
+        "server": replay.stats(),
+    }
+
+
+def main(args):
+    os.makedirs(args.cassettes, exist_ok=True)
+    report = {"conditions": {name: getattr(args, name) for name in (
+        "latency", "jitter", "recorded_latency", "core_limit", "window", "search_limit", "search_window",
+        "rate_limit_errors", "abuse_errors", "retry_after", "seed", "tokens")}, "tools": {}}
+    for tool in args.tools.split(','):
+        path = os.path.join(args.cassettes, f"{tool}.jsonl.gz")
+        if args.record or not os.path.exists(path):
+            record_fake(tool, path, args)
+        runs = [replay_run(tool, path, args) for _ in range(args.repeat)]
+        report["tools"][tool] = {
+            "median_wall_seconds": round(statistics.median(run["wall_seconds"] for run in runs), 3),
+            "median_sleep_seconds": round(statistics.median(run["sleep_seconds"] or 0 for run in runs), 3),
+            "requests": runs[0]["requests"],
+            "runs": runs,
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Requests, wall time and sleep time per tool, replayed from cassettes")
+    parser.add_argument("--cassettes", default="bench_cassettes", help="Directory of <tool>.jsonl.gz cassettes (default bench_cassettes)")
+    parser.add_argument("--record", action="store_true", help="Re-record the cassettes against fake_github.py")
+    parser.add_argument("--tools", default=",".join(TOOLS), help=f"Comma-separated tools to run (default {','.join(TOOLS)})")
+    parser.add_argument("--repeat", type=int, default=3, help="Replayed runs per tool (default 3)")
+    parser.add_argument("--repos", default="fake/repo", help="Repositories passed to github_stats (default fake/repo)")
+    parser.add_argument("--days", type=int, default=90, help="--days passed to github_stats (default 90)")
+    parser.add_argument("--tokens", type=int, default=1, help="Tokens in GITHUB_TOKENS of the tools (default 1)")
+    parser.add_argument("--prs", type=int, default=200, help="Pull requests per fake repository when recording (default 200)")
+    parser.add_argument("--issues", type=int, default=200, help="Issues per fake repository when recording (default 200)")
+    parser.add_argument("--search-hits", type=int, default=150, help="Code search matches of the fake API when recording (default 150)")
+    add_condition_arguments(parser)
+    main(parser.parse_args())
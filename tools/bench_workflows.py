@@ -0,0 +1,151 @@
+"""
+Description: Benchmarks workflow_analyzer.analyze against the previous analyze_workflow on a synthetic workflow corpus.
+
+Generates thousands of workflows (a few of them monorepo-sized, with hundreds of jobs), some with
+run: | scripts that contain YAML-looking text, unnamed steps, names after uses:, comments and
+different pinned versions of the action. Reports the time of each analyzer, how often its jobs and
+action steps agree with a full YAML parse (when PyYAML is installed), and how the time grows with
+the size of a single workflow.
+
+Usage:
+python bench_workflows.py [--workflows 3000] [--seed 0]
+"""
+
+import argparse
+import json
+import random
+import time
+
+import workflow_analyzer
+
+try:
+    import yaml
+    YamlLoader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+except ImportError:
+    yaml = None
+
+ACTION = workflow_analyzer.ACTION
+REFS = ["stable", "stable", "stable", "v1.2.0", "main", "0f3c2a9d8e7b6a5f4e3d2c1b0a9f8e7d6c5b4a39"]
+
+
+def legacy_analyze_workflow(content):
+    """analyze_workflow as it was before workflow_analyzer.py, for comparison."""
+    lines = content.split('\n')
+    job_names = []
+    steps_with_action = []
+    for i, line in enumerate(lines):
+        if line.strip().startswith('jobs:'):
+            for j in range(i+1, len(lines)):
+                if lines[j].strip() and not lines[j].startswith(' '):
+                    break
+                if not lines[j].startswith('  '):
+                    job_names.append(lines[j].strip().rstrip(':'))
+        if 'yike5460/intelli-ops@stable' in line:
+            step_name = "Unknown"
+            for k in range(i-1, -1, -1):
+                if lines[k].strip().startswith('- name:'):
+                    step_name = lines[k].split('name:')[1].strip()
+                    break
+            steps_with_action.append(step_name)
+    return job_names, steps_with_action
+
+
+def make_step(rng, number, uses_action):
+    lines = []
+    named = rng.random() < 0.7
+    name = f"Step {number}"
+    if uses_action:
+        ref = rng.choice(REFS)
+        head = f"uses: {ACTION}@{ref}"
+        body = ["with:", "  github-token: ${{ secrets.GITHUB_TOKEN }}", f"  aws-region: us-east-{rng.randint(1, 2)}"]
+        if rng.random() < 0.5:
+            body += ["  code-review: true  # enable review", "  prompt: |", "    Review this change.", "    - name: not a step"]
+    elif rng.random() < 0.5:
+        head = rng.choice(["uses: actions/checkout@v4", "uses: actions/setup-node@v4"])
+        body = []
+    else:
+        head = "run: |"
+        body = ["  echo building", "  cat <<EOF > ci.yml", "  jobs:", "    fake:", "  - name: nope",
+                f"    uses: {ACTION}@stable", "  EOF"]
+    if named and rng.random() < 0.8:
+        lines.append(f"- name: {name}")
+        lines.append(f"  {head}")
+    elif named:
+        # Name given after uses:, which the old analyzer attributes to the previous step
+        lines.append(f"- {head}")
+        body = body + [f"name: {name}"]
+    else:
+        lines.append(f"- {head}")
+    lines += [f"  {line}" for line in body]
+    return lines
+
+
+def make_workflow(rng, jobs, steps_per_job, action_ratio=0.1):
+    lines = ["name: CI", "on:", "  pull_request:", "    types: [opened, synchronize]", "", "jobs:"]
+    for job in range(jobs):
+        lines += [f"  job-{job}:", "    runs-on: ubuntu-latest", "    steps:"]
+        for number in range(steps_per_job):
+            lines += [f"      {line}" for line in make_step(rng, number, rng.random() < action_ratio)]
+    return "\n".join(lines) + "\n"
+
+
+def yaml_truth(content):
+    """Jobs and (job, step name, ref) of action steps from a full YAML parse."""
+    document = yaml.load(content, Loader=YamlLoader)
+    jobs = list(document.get("jobs") or {})
+    uses = []
+    for job, spec in (document.get("jobs") or {}).items():
+        for step in spec.get("steps") or []:
+            ref = str(step.get("uses", ""))
+            if ref == ACTION or ref.startswith(ACTION + "@"):
+                uses.append((job, step.get("name"), ref.partition("@")[2] or None, sorted(step.get("with") or {})))
+    return jobs, uses
+
+
+def timed(function, corpus):
+    start = time.perf_counter()
+    results = [function(content) for content in corpus]
+    return time.perf_counter() - start, results
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    corpus = [make_workflow(rng, rng.randint(1, 6), rng.randint(2, 12)) for _ in range(args.workflows)]
+    # A few monorepo-sized workflows
+    corpus += [make_workflow(rng, 300, 8) for _ in range(max(1, args.workflows // 1000))]
+    size_mb = sum(len(content) for content in corpus) / 1e6
+
+    report = {"workflows": len(corpus), "megabytes": round(size_mb, 2)}
+    legacy_time, legacy = timed(legacy_analyze_workflow, corpus)
+    new_time, new = timed(workflow_analyzer.analyze, corpus)
+    report["legacy_seconds"] = round(legacy_time, 3)
+    report["single_pass_seconds"] = round(new_time, 3)
+    report["speedup"] = round(legacy_time / new_time, 2)
+
+    if yaml is not None:
+        yaml_time, truth = timed(yaml_truth, corpus)
+        report["pyyaml_seconds"] = round(yaml_time, 3)
+        new_ok = legacy_ok = 0
+        for (jobs, uses), result, (legacy_jobs, legacy_steps) in zip(truth, new, legacy):
+            single = [(use["job"], use["step"], use["ref"], sorted(use["with"])) for use in result["uses"]]
+            new_ok += result["jobs"] == jobs and single == uses
+            legacy_ok += legacy_jobs == jobs and legacy_steps == [name or "Unknown" for _, name, ref, _ in uses if ref == "stable"]
+        report["single_pass_agrees_with_yaml"] = f"{new_ok}/{len(corpus)}"
+        report["legacy_agrees_with_yaml"] = f"{legacy_ok}/{len(corpus)}"
+
+    # Growth with the size of one workflow: unnamed action steps make the old backward scan long
+    growth = []
+    for steps in (250, 500, 1000, 2000):
+        content = make_workflow(random.Random(steps), 1, steps, action_ratio=0.5)
+        legacy_time, _ = timed(legacy_analyze_workflow, [content])
+        new_time, _ = timed(workflow_analyzer.analyze, [content])
+        growth.append({"steps": steps, "legacy_ms": round(legacy_time * 1000, 2), "single_pass_ms": round(new_time * 1000, 2)})
+    report["growth"] = growth
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the workflow analyzers on a synthetic corpus")
+    parser.add_argument("--workflows", type=int, default=3000, help="Number of generated workflows (default 3000)")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed of the corpus (default 0)")
+    main(parser.parse_args())
@@ -0,0 +1,112 @@
+"""
+Description: Content-addressed cache of workflow files and their analysis, used by action_usage.py.
+
+Every code search hit carries the git blob SHA of the file. Many repositories contain byte-identical
+copies of the README example workflow, so the decoded content and the analysis result are stored
+in SQLite keyed by that SHA. A blob seen before, in this run or an earlier one, costs no contents
+request and no parsing. A blob SHA names its content exactly, so entries never go stale; only the
+analysis is recomputed (from the stored content) when workflow_analyzer.VERSION changes. The least
+recently used entries beyond max_bytes are evicted.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+from http_cache import DEFAULT_CACHE_DIR
+
+DEFAULT_MAX_BYTES = 128 * 1024 * 1024
+
+
+def blob_sha(data):
+    """Git blob SHA of `data` (bytes), the sha GitHub reports for a file."""
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+
+class BlobCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "blobs.sqlite3")
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._stores = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                sha TEXT PRIMARY KEY,
+                content TEXT NOT NULL,
+                analysis TEXT,
+                version INTEGER,
+                size INTEGER NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed_at)")
+        self._db.commit()
+        self.evict()
+
+    def lookup(self, sha, version):
+        """(content, analysis) of blob `sha`; analysis is None if it was made by another analyzer version."""
+        with self._lock:
+            row = self._db.execute("SELECT content, analysis, version FROM blobs WHERE sha = ?", (sha,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE blobs SET accessed_at = ? WHERE sha = ?", (time.time(), sha))
+            self._db.commit()
+        content, analysis, stored_version = row
+        return content, json.loads(analysis) if analysis and stored_version == version else None
+
+    def store(self, sha, content, analysis, version):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO blobs (sha, content, analysis, version, size, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (sha, content, json.dumps(analysis), version, len(content), time.time()))
+            self._db.commit()
+            self._stores += 1
+            evict = self._stores % 500 == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until under max_bytes."""
+        with self._lock:
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._db.execute("SELECT sha, size FROM blobs ORDER BY accessed_at").fetchall()
+                doomed = []
+                for sha, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((sha,))
+                    total -= size
+                self._db.executemany("DELETE FROM blobs WHERE sha = ?", doomed)
+            self._db.commit()
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+
+
+def configure(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """Enable the shared cache in `cache_dir`, or disable it when cache_dir is None."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = BlobCache(cache_dir, max_bytes) if cache_dir else None
+    if _cache is not None:
+        logging.info(f"Using workflow blob cache at {_cache.path}")
+    return _cache
+
+
+def get_cache():
+    return _cache
@@ -0,0 +1,144 @@
+"""
+Description: Records the GitHub API traffic of a run into a cassette, for replay_github.py to serve offline.
+
+With --record <file> (github_stats.py, action_usage.py) every request of the shared client
+(github_client.py) is written to a gzipped JSON Lines cassette as it completes: method, path and
+query, the request headers that change the reply (conditional and Accept headers), the request body
+of POSTs, the status, the response headers the tools read (ETag, Link, Retry-After, X-RateLimit-*),
+the body and the time the request took. The Authorization header is never recorded. Identical
+bodies, such as workflow files seen in many repositories, are stored once.
+
+Line 1 is the header, {"cassette": 1, "base_url": ..., "recorded_at": ...}. Each body is a line
+{"body": <digest>, "text": ...} that comes before the first interaction using it, and each
+interaction is a line {"method", "path", "request", "headers", "status", "response_headers", "body", "elapsed"}.
+
+Requests are matched on replay by key(): method, path, the sorted query and a digest of the JSON body.
+Parameters that depend on the time of the run (VOLATILE_PARAMS, e.g. the `since` of the issue
+list) are left out, so a replay on another day still finds its pages.
+"""
+
+import gzip
+import hashlib
+import json
+import threading
+import time
+from datetime import datetime
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+VERSION = 1
+
+# Request headers that select or condition a reply
+REQUEST_HEADERS = ("Accept", "If-None-Match", "If-Modified-Since")
+# Response headers the tools and the limiters read
+RESPONSE_HEADERS = ("Content-Type", "ETag", "Last-Modified", "Link", "Retry-After", "X-RateLimit-Limit",
+                    "X-RateLimit-Remaining", "X-RateLimit-Used", "X-RateLimit-Reset", "X-RateLimit-Resource")
+# Query parameters and GraphQL variables derived from the current time
+VOLATILE_PARAMS = ("since",)
+
+
+def digest(text):
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:20]
+
+
+def request_digest(payload):
+    """Digest of a JSON request body without its volatile variables; None without a body."""
+    if payload is None:
+        return None
+    if isinstance(payload, dict) and isinstance(payload.get("variables"), dict):
+        variables = {name: value for name, value in payload["variables"].items() if name not in VOLATILE_PARAMS}
+        payload = dict(payload, variables=variables)
+    return digest(json.dumps(payload, sort_keys=True))
+
+
+def key(method, path, request=None):
+    """Replay key of a request; `path` may carry a query string."""
+    parts = urlsplit(path)
+    query = urlencode(sorted((name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                             if name not in VOLATILE_PARAMS))
+    return f"{method} {parts.path}?{query} {request or ''}"
+
+
+class Recorder:
+    def __init__(self, path, base_url):
+        self.path = path
+        self.base_url = base_url.rstrip('/')
+        self.interactions = 0
+        self._bodies = set()
+        self._lock = threading.Lock()
+        self._file = gzip.open(path, "wt", encoding="utf-8")
+        self._write({"cassette": VERSION, "base_url": self.base_url,
+                     "recorded_at": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")})
+
+    def _write(self, line):
+        self._file.write(json.dumps(line, separators=(",", ":")) + "\n")
+
+    def record(self, method, url, kwargs, response, start):
+        parts = urlsplit(response.url or url)
+        path = parts.path + (f"?{parts.query}" if parts.query else "")
+        sent = kwargs.get("headers") or {}
+        text = response.content.decode("utf-8", "replace") if response.content else None
+        interaction = {
+            "method": method,
+            "path": path,
+            "request": request_digest(kwargs.get("json")),
+            "headers": {name: sent[name] for name in REQUEST_HEADERS if name in sent},
+            "status": response.status_code,
+            "response_headers": {name: response.headers[name] for name in RESPONSE_HEADERS if name in response.headers},
+            "body": digest(text) if text is not None else None,
+            "elapsed": round(time.perf_counter() - start, 4),
+        }
+        with self._lock:
+            if text is not None and interaction["body"] not in self._bodies:
+                self._bodies.add(interaction["body"])
+                self._write({"body": interaction["body"], "text": text})
+            self._write(interaction)
+            self.interactions += 1
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def load(path):
+    """(header, interactions) of a cassette, with each interaction's body text in place of its digest."""
+    bodies = {}
+    interactions = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("cassette") != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} cassette")
+        for line in f:
+            entry = json.loads(line)
+            if "text" in entry:
+                bodies[entry["body"]] = entry["text"]
+            else:
+                entry["body"] = bodies.get(entry["body"])
+                interactions.append(entry)
+    return header, interactions
+
+
+_recorder = None
+
+
+def configure(path=None, base_url=""):
+    """Record every request of the shared client to `path` from now on; None stops recording."""
+    global _recorder
+    if _recorder is not None:
+        _recorder.close()
+    _recorder = Recorder(path, base_url) if path else None
+    return _recorder
+
+
+def record(method, url, kwargs, response, start):
+    if _recorder is not None:
+        _recorder.record(method, url, kwargs, response, start)
+
+
+def close():
+    """Finish the cassette; returns the number of interactions recorded."""
+    global _recorder
+    if _recorder is None:
+        return 0
+    _recorder.close()
+    count, _recorder = _recorder.interactions, None
+    return count
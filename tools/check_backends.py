@@ -0,0 +1,135 @@
+"""
+Description: Checks offline that the REST and GraphQL backends of github_stats.py produce the same numbers.
+
+A fixture holds every REST page (fetch_data) and GraphQL response (graphql_query) both backends
+needed for one repository, together with the end date of the recorded window. Replaying it runs
+both backends without network access and compares their stats dicts.
+
+Usage:
+python check_backends.py <fixture.json>                                        # replay and compare
+python check_backends.py <fixture.json> --record <owner/repo> --days 30        # record from GITHUB_API_URL
+python check_backends.py <fixture.json> --record fake/repo --fake              # record from fake_github.py
+
+Sample:
+python check_backends.py fixtures/fake_repo_backends.json
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime
+from urllib.parse import urlencode, urlparse
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+
+def rest_key(url, params):
+    # The host differs between recording and replay, so only path and query identify a page
+    query = urlencode(sorted((params or {}).items()))
+    return f"{urlparse(url).path}?{query}"
+
+
+def graphql_key(query, variables):
+    operation = query.split('(')[0].split()[-1]
+    return f"{operation} {json.dumps(variables, sort_keys=True)}"
+
+
+def record(fixture_path, repo, days):
+    import github_graphql
+    import github_stats
+
+    fixture = {"repo": repo, "days": days, "end_date": datetime.utcnow().strftime(DATE_FORMAT),
+               "rest": {}, "graphql": {}}
+    end_date = datetime.strptime(fixture["end_date"], DATE_FORMAT)
+    fetch_data = github_stats.fetch_data
+    graphql_query = github_graphql.graphql_query
+
+    def recording_fetch_data(url, headers=None, params=None, max_retries=5, projection=None):
+        # Whole pages are recorded; the projection is applied on replay
+        data, response_headers = fetch_data(url, headers=headers, params=params, max_retries=max_retries)
+        link = response_headers.get('Link', '') if response_headers is not None else None
+        fixture["rest"][rest_key(url, params)] = {"body": data, "link": link}
+        return (projection.project_all(data) if projection else data), response_headers
+
+    def recording_graphql_query(query, variables, max_retries=5):
+        data = graphql_query(query, variables, max_retries=max_retries)
+        fixture["graphql"][graphql_key(query, variables)] = data
+        return data
+
+    github_stats.fetch_data = recording_fetch_data
+    github_graphql.graphql_query = recording_graphql_query
+    # Sequential so the recording order is deterministic
+    rest = github_stats.get_github_stats(repo, days, concurrency=1, end_date=end_date)
+    graphql = github_graphql.get_github_stats_graphql(repo, days, end_date=end_date)
+    fixture["expected"] = rest
+
+    os.makedirs(os.path.dirname(os.path.abspath(fixture_path)), exist_ok=True)
+    with open(fixture_path, 'w') as f:
+        json.dump(fixture, f, separators=(',', ':'))
+    print(f"Recorded {len(fixture['rest'])} REST pages and {len(fixture['graphql'])} GraphQL responses to {fixture_path}")
+    return rest, graphql
+
+
+def replay(fixture_path):
+    with open(fixture_path) as f:
+        fixture = json.load(f)
+
+    import github_graphql
+    import github_stats
+
+    def replay_fetch_data(url, headers=None, params=None, max_retries=5, projection=None):
+        key = rest_key(url, params)
+        if key not in fixture["rest"]:
+            raise KeyError(f"REST request not in fixture: {key}")
+        page = fixture["rest"][key]
+        body = projection.project_all(page["body"]) if projection else page["body"]
+        return body, (None if page["link"] is None else {"Link": page["link"]})
+
+    def replay_graphql_query(query, variables, max_retries=5):
+        key = graphql_key(query, variables)
+        if key not in fixture["graphql"]:
+            raise KeyError(f"GraphQL request not in fixture: {key}")
+        return fixture["graphql"][key]
+
+    github_stats.fetch_data = replay_fetch_data
+    github_graphql.graphql_query = replay_graphql_query
+    end_date = datetime.strptime(fixture["end_date"], DATE_FORMAT)
+    rest = github_stats.get_github_stats(fixture["repo"], fixture["days"], end_date=end_date)
+    graphql = github_graphql.get_github_stats_graphql(fixture["repo"], fixture["days"], end_date=end_date)
+    return rest, graphql, fixture.get("expected")
+
+
+def compare(rest, graphql, expected=None):
+    ok = True
+    print(f"{'metric':<30}{'rest':>10}{'graphql':>10}")
+    for key in rest:
+        marker = "" if rest[key] == graphql.get(key) else "  <-- mismatch"
+        if expected is not None and expected.get(key) != rest[key]:
+            marker += f"  <-- expected {expected.get(key)}"
+        ok = ok and not marker
+        print(f"{key:<30}{rest[key]:>10}{graphql.get(key, '-'):>10}{marker}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the REST and GraphQL github_stats backends")
+    parser.add_argument("fixture", help="Path of the fixture to replay or record")
+    parser.add_argument("--record", metavar="REPO", help="Record a new fixture for REPO instead of replaying")
+    parser.add_argument("--days", type=int, default=30, help="Number of days to record (default 30)")
+    parser.add_argument("--fake", action="store_true", help="Record from an in-process fake_github.py server")
+    args = parser.parse_args()
+
+    os.environ.setdefault("GITHUB_TOKEN", "fixture-token")
+    if args.record:
+        if args.fake:
+            from fake_github import FakeGitHub, FakeRepo, start_server
+            server, base_url = start_server(FakeGitHub([FakeRepo(args.record, prs=80, issues=80, history_days=90)]))
+            os.environ["GITHUB_API_URL"] = base_url
+            os.environ.pop("GITHUB_GRAPHQL_URL", None)
+        rest, graphql = record(args.fixture, args.record, args.days)
+        expected = None
+    else:
+        rest, graphql, expected = replay(args.fixture)
+
+    sys.exit(0 if compare(rest, graphql, expected) else 1)
@@ -0,0 +1,158 @@
+"""
+Description: Columnar event timestamps and multi-window aggregation for github_stats.py.
+
+Once a repository is synced, the timestamps of each event type (PR created/updated/closed, PR commits,
+issues opened/closed, issue comments) are read from the event store in one go, as sorted arrays of
+epoch seconds. The counts of every --days window then take two binary searches per event type, and
+the per-day histogram of the longest window takes one bincount. A single crawl of the longest window
+answers 7-, 30- and 90-day questions together, instead of one crawl and one set of COUNT queries per
+window. NumPy is used when installed (int64 arrays, vectorized searchsorted and bincount); otherwise
+the same is done with array('q') and bisect. The daily histograms can be exported as Parquet or
+Arrow IPC files for dashboards (pip install pyarrow).
+"""
+
+import bisect
+import calendar
+from array import array
+from datetime import datetime, timedelta
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+try:
+    import pyarrow
+except ImportError:
+    pyarrow = None
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+DAY = 24 * 3600
+
+# Stats key -> (table, timestamp column) of event_store.py
+EVENTS = {
+    "pr_created": ("pulls", "created_at"),
+    "pr_updated": ("pulls", "updated_at"),
+    "pr_closed": ("pulls", "closed_at"),
+    "issues_opened": ("issues", "created_at"),
+    "issues_closed": ("issues", "closed_at"),
+    "issue_comments": ("issue_comments", "created_at"),
+    "pr_commits": ("pr_commits", "committed_at"),
+}
+
+
+def epoch(moment):
+    """Whole epoch seconds of a naive UTC datetime, the precision of the stored timestamps."""
+    return calendar.timegm(moment.utctimetuple())
+
+
+def longest(days):
+    """The longest of `days`, an int or a list of ints; the window a sync has to cover."""
+    return max(days) if isinstance(days, (list, tuple)) else days
+
+
+class EventColumns:
+    """Sorted epoch-second arrays per event type of one repository."""
+
+    def __init__(self, columns):
+        self.columns = columns
+
+    @classmethod
+    def load(cls, store, repo, start_date, end_date):
+        start, end = start_date.strftime(DATE_FORMAT), end_date.strftime(DATE_FORMAT)
+        columns = {}
+        for name, (table, column) in EVENTS.items():
+            times = store.event_times(repo, table, column, start, end)
+            if numpy is not None:
+                columns[name] = numpy.fromiter(times, dtype=numpy.int64, count=len(times))
+            else:
+                columns[name] = array('q', times)
+        return cls(columns)
+
+    def window_counts(self, end_date, days):
+        """{d: stats} for each window of d days ending at end_date, both ends inclusive."""
+        end = epoch(end_date)
+        starts = [epoch(end_date - timedelta(days=d)) for d in days]
+        counts = {}
+        for name, times in self.columns.items():
+            if numpy is not None:
+                upper = numpy.searchsorted(times, end, side='right')
+                counts[name] = (upper - numpy.searchsorted(times, starts, side='left')).tolist()
+            else:
+                upper = bisect.bisect_right(times, end)
+                counts[name] = [upper - bisect.bisect_left(times, start) for start in starts]
+        windows = {}
+        for i, d in enumerate(days):
+            stats = {name: counts[name][i] for name in EVENTS}
+            stats["prCommit_and_issueReply_all"] = stats["pr_commits"] + stats["issue_comments"]
+            windows[d] = stats
+        return windows
+
+    def daily(self, start_date, end_date):
+        """Events per UTC calendar day from start_date to end_date, both partial days included."""
+        start, end = epoch(start_date), epoch(end_date)
+        first_day = start // DAY
+        bins = end // DAY - first_day + 1
+        histogram = {"start": start_date.strftime("%Y-%m-%d")}
+        for name, times in self.columns.items():
+            if numpy is not None:
+                low, high = numpy.searchsorted(times, start, side='left'), numpy.searchsorted(times, end, side='right')
+                histogram[name] = numpy.bincount(times[low:high] // DAY - first_day, minlength=bins).tolist()
+            else:
+                low, high = bisect.bisect_left(times, start), bisect.bisect_right(times, end)
+                counts = [0] * bins
+                for moment in times[low:high]:
+                    counts[moment // DAY - first_day] += 1
+                histogram[name] = counts
+        return histogram
+
+
+def repo_stats(store, repo, end_date, days):
+    """Stats of `repo` for the longest of `days` (an int or a list of ints), ending at end_date.
+
+    For a list the stats also hold "windows", the stats of every window, and "daily", the per-day
+    counts of the longest one.
+    """
+    windows = sorted(set(days)) if isinstance(days, (list, tuple)) else [days]
+    start_date = end_date - timedelta(days=windows[-1])
+    columns = EventColumns.load(store, repo, start_date, end_date)
+    counts = columns.window_counts(end_date, windows)
+    stats = dict(counts[windows[-1]])
+    if isinstance(days, (list, tuple)):
+        stats["windows"] = {str(d): counts[d] for d in windows}
+        stats["daily"] = columns.daily(start_date, end_date)
+    return stats
+
+
+def daily_table(details):
+    """Arrow table with one row per repository and day, and one count column per event type."""
+    if pyarrow is None:
+        raise ImportError("Parquet/Arrow export needs pyarrow (pip install pyarrow)")
+    repos, dates = [], []
+    counts = {name: [] for name in EVENTS}
+    for repo, stats in details.items():
+        daily = stats.get("daily")
+        if not daily:
+            continue
+        first = datetime.strptime(daily["start"], "%Y-%m-%d").date()
+        for offset in range(len(daily["pr_created"])):
+            repos.append(repo)
+            dates.append(first + timedelta(days=offset))
+        for name in EVENTS:
+            counts[name].extend(daily[name])
+    columns = {"repo": pyarrow.array(repos, pyarrow.string()), "date": pyarrow.array(dates, pyarrow.date32())}
+    columns.update((name, pyarrow.array(values, pyarrow.int64())) for name, values in counts.items())
+    return pyarrow.table(columns)
+
+
+def export_daily(path, details):
+    """Write the daily histograms of `details` (repo -> stats) as Parquet (.parquet) or Arrow IPC (anything else)."""
+    table = daily_table(details)
+    if path.endswith(".parquet"):
+        import pyarrow.parquet
+        pyarrow.parquet.write_table(table, path)
+    else:
+        import pyarrow.ipc
+        with pyarrow.OSFile(path, "wb") as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    return table.num_rows
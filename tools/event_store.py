@@ -0,0 +1,141 @@
+"""
+Description: Per-repository event store behind github_stats.py.
+
+The fetch phase records PR created/updated/closed timestamps, the commit timestamps of every PR, and
+issue and issue-comment timestamps here; the stats for any window are then counted from the store.
+With a persistent store (github_stats.py --store <path>) each repo keeps a checkpoint: the time of
+its last sync (high-water mark) and the earliest date from which the store is complete. Later runs
+only fetch PRs and issues updated since the high-water mark, and any --days window the store already
+covers is answered locally.
+
+While a repo is being synced, the store also keeps its progress: the last page (and GraphQL cursor)
+of pull requests or issues whose events are all stored. github_stats.py --resume continues an
+interrupted sync from there instead of starting the repo over.
+"""
+
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+
+# unixepoch() (SQLite 3.38+) converts about twice as fast as strftime('%s')
+EPOCH = "unixepoch({})" if sqlite3.sqlite_version_info >= (3, 38) else "CAST(strftime('%s', {}) AS INTEGER)"
+
+# Re-fetch a little before the high-water mark to absorb clock skew and late index updates
+SYNC_OVERLAP = timedelta(hours=1)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS pulls (
+    repo TEXT NOT NULL, number INTEGER NOT NULL,
+    created_at TEXT NOT NULL, updated_at TEXT NOT NULL, closed_at TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS pr_commits (
+    repo TEXT NOT NULL, number INTEGER NOT NULL, sha TEXT NOT NULL, committed_at TEXT NOT NULL,
+    PRIMARY KEY (repo, number, sha)
+);
+CREATE TABLE IF NOT EXISTS issues (
+    repo TEXT NOT NULL, number INTEGER NOT NULL,
+    created_at TEXT NOT NULL, updated_at TEXT NOT NULL, closed_at TEXT,
+    PRIMARY KEY (repo, number)
+);
+CREATE TABLE IF NOT EXISTS issue_comments (
+    repo TEXT NOT NULL, number INTEGER NOT NULL, comment_id TEXT NOT NULL, created_at TEXT NOT NULL,
+    PRIMARY KEY (repo, comment_id)
+);
+CREATE INDEX IF NOT EXISTS pr_commits_date ON pr_commits (repo, committed_at);
+CREATE INDEX IF NOT EXISTS issue_comments_date ON issue_comments (repo, created_at);
+CREATE INDEX IF NOT EXISTS issue_comments_issue ON issue_comments (repo, number);
+CREATE TABLE IF NOT EXISTS checkpoints (
+    repo TEXT PRIMARY KEY, covered_from TEXT NOT NULL, high_water TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS progress (
+    repo TEXT PRIMARY KEY, since TEXT NOT NULL, synced_at TEXT NOT NULL,
+    phase TEXT NOT NULL, page INTEGER NOT NULL, cursor TEXT
+);
+"""
+
+
+class EventStore:
+    """SQLite event store; the default ":memory:" store lives for a single run."""
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db.commit()
+
+    def sync_start(self, repo, start_date):
+        """Lower bound for fetching `repo` so that the store covers start_date onwards."""
+        with self._lock:
+            row = self._db.execute("SELECT covered_from, high_water FROM checkpoints WHERE repo = ?", (repo,)).fetchone()
+        if row is None or start_date.strftime(DATE_FORMAT) < row[0]:
+            return start_date
+        return datetime.strptime(row[1], DATE_FORMAT) - SYNC_OVERLAP
+
+    def checkpoint(self, repo, since, synced_at):
+        """Record that everything updated between `since` and `synced_at` has been stored."""
+        since, synced_at = since.strftime(DATE_FORMAT), synced_at.strftime(DATE_FORMAT)
+        with self._lock:
+            row = self._db.execute("SELECT covered_from FROM checkpoints WHERE repo = ?", (repo,)).fetchone()
+            covered_from = min(row[0], since) if row else since
+            self._db.execute("INSERT OR REPLACE INTO checkpoints (repo, covered_from, high_water) VALUES (?, ?, ?)",
+                             (repo, covered_from, synced_at))
+            self._db.execute("DELETE FROM progress WHERE repo = ?", (repo,))
+            self._db.commit()
+
+    def save_progress(self, repo, since, synced_at, phase, page, cursor=None):
+        """Record that every event of `phase` ("pulls" or "issues") up to `page` is stored, and commit."""
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO progress VALUES (?, ?, ?, ?, ?, ?)",
+                             (repo, since.strftime(DATE_FORMAT), synced_at.strftime(DATE_FORMAT), phase, page, cursor))
+            self._db.commit()
+
+    def load_progress(self, repo):
+        """Progress of an interrupted sync of `repo`, or None."""
+        with self._lock:
+            row = self._db.execute("SELECT since, synced_at, phase, page, cursor FROM progress WHERE repo = ?",
+                                   (repo,)).fetchone()
+        if row is None:
+            return None
+        return {"since": datetime.strptime(row[0], DATE_FORMAT), "synced_at": datetime.strptime(row[1], DATE_FORMAT),
+                "phase": row[2], "page": row[3], "cursor": row[4]}
+
+    def add_pull(self, repo, number, created_at, updated_at, closed_at):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO pulls VALUES (?, ?, ?, ?, ?)",
+                             (repo, number, created_at, updated_at, closed_at))
+
+    def set_commits(self, repo, number, commits):
+        """Replace the commits of a PR; `commits` is a list of (sha, committer date)."""
+        with self._lock:
+            # Force-pushes drop commits, so the latest full list wins
+            self._db.execute("DELETE FROM pr_commits WHERE repo = ? AND number = ?", (repo, number))
+            self._db.executemany("INSERT OR REPLACE INTO pr_commits VALUES (?, ?, ?, ?)",
+                                 [(repo, number, sha, date) for sha, date in commits])
+
+    def add_issue(self, repo, number, created_at, updated_at, closed_at):
+        with self._lock:
+            self._db.execute("INSERT OR REPLACE INTO issues VALUES (?, ?, ?, ?, ?)",
+                             (repo, number, created_at, updated_at, closed_at))
+
+    def set_comments(self, repo, number, comments):
+        """Replace the comments of an issue; `comments` is a list of (comment id, created date)."""
+        with self._lock:
+            self._db.execute("DELETE FROM issue_comments WHERE repo = ? AND number = ?", (repo, number))
+            self._db.executemany("INSERT OR REPLACE INTO issue_comments VALUES (?, ?, ?, ?)",
+                                 [(repo, number, str(comment_id), date) for comment_id, date in comments])
+
+    def event_times(self, repo, table, column, start, end):
+        """Sorted epoch seconds of the `column` timestamps of `repo` from start to end (DATE_FORMAT strings)."""
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT {EPOCH.format(column)} FROM {table} "
+                f"WHERE repo = ? AND {column} BETWEEN ? AND ? ORDER BY {column}", (repo, start, end)).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
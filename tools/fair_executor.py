@@ -0,0 +1,85 @@
+"""
+Description: Thread pool that serves per-lane work queues round-robin, used by github_stats.py --fair.
+
+With a plain ThreadPoolExecutor shared by several repositories, a giant repository that queues
+thousands of commit requests makes every smaller repository wait behind it. Here each repository
+submits into its own lane and idle workers take the next task from the next non-empty lane, so
+every repository keeps making progress at an equal share of the workers.
+"""
+
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+
+
+class FairExecutor:
+    def __init__(self, max_workers):
+        self._lanes = OrderedDict()
+        self._condition = threading.Condition()
+        self._shutdown = False
+        self._threads = [threading.Thread(target=self._work, daemon=True) for _ in range(max_workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, lane, fn, *args, **kwargs):
+        future = Future()
+        with self._condition:
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._lanes.setdefault(lane, deque()).append((future, fn, args, kwargs))
+            self._condition.notify()
+        return future
+
+    def lane(self, name):
+        """An executor-like view that submits everything into lane `name`."""
+        return _Lane(self, name)
+
+    def _next_task(self):
+        with self._condition:
+            while not self._lanes and not self._shutdown:
+                self._condition.wait()
+            if not self._lanes:
+                return None
+            # Take from the lane at the front, then move that lane to the back
+            name, queue = self._lanes.popitem(last=False)
+            task = queue.popleft()
+            if queue:
+                self._lanes[name] = queue
+            return task
+
+    def _work(self):
+        while True:
+            task = self._next_task()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        with self._condition:
+            self._shutdown = True
+            if cancel_futures:
+                for queue in self._lanes.values():
+                    for future, _, _, _ in queue:
+                        future.cancel()
+                self._lanes.clear()
+            self._condition.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class _Lane:
+    def __init__(self, executor, name):
+        self._executor = executor
+        self._name = name
+
+    def submit(self, fn, *args, **kwargs):
+        return self._executor.submit(self._name, fn, *args, **kwargs)
@@ -0,0 +1,556 @@
+"""
+Description: Local stand-in for the GitHub REST API that enforces rate limits, for measuring the tools offline.
+
+It serves a deterministic synthetic repository (pulls, PR commits, issues, issue comments, repo info),
+code search results and workflow file contents, plus the GraphQL queries issued by github_graphql.py
+(matched by operation name, not parsed), and answers with the same X-RateLimit-* headers,
+403 "rate limit exceeded" and secondary-limit (Retry-After) replies as api.github.com.
+
+Usage:
+python fake_github.py [--port 8000] [--core-limit 5000] [--window 3600] [--search-limit 10] [--search-window 60]
+python fake_github.py --bench [--core-limit 600] [--window 60] [--tokens 3]
+
+Sample:
+python fake_github.py --port 8000 &
+GITHUB_API_URL=http://127.0.0.1:8000 GITHUB_TOKEN=fake python github_stats.py fake/repo --days 30
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import math
+import os
+import random
+import re
+import ssl
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+SEARCH_RESULT_CAP = 1000
+
+WORKFLOW_TEMPLATE = """name: Intelligent Code Review
+on:
+  pull_request:
+    types: [opened, synchronize, reopened]
+
+jobs:
+  review:
+    runs-on: ubuntu-latest
+    steps:
+      - name: Checkout code
+        uses: actions/checkout@v3
+      - name: Intelligent GitHub Actions
+        uses: yike5460/intelli-ops@stable
+        with:
+          github-token: ${{ secrets.GITHUB_TOKEN }}
+          aws-region: us-east-1
+          model-id: anthropic.claude-3-sonnet-20240229-v1:0
+"""
+
+
+def workflow_content(index):
+    """Workflow file of search hit `index`: mostly the README example verbatim, every fourth customized."""
+    if index % 4:
+        return WORKFLOW_TEMPLATE
+    return WORKFLOW_TEMPLATE.replace("us-east-1", f"eu-west-{index}")
+
+
+def blob_sha(content):
+    """Git blob SHA of `content`, as in the sha field of search hits and contents."""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+class FakeRepo:
+    """Synthetic repository whose PRs and issues are spread over the last `history_days` days."""
+
+    def __init__(self, full_name, prs=200, issues=200, history_days=365, seed=0, now=None):
+        self.full_name = full_name
+        self.now = now or datetime.utcnow().replace(microsecond=0)
+        rng = random.Random(seed)
+        self.pulls = []
+        for number in range(1, prs + 1):
+            created = self._ago(rng.uniform(0, history_days))
+            updated = min(created + timedelta(days=rng.expovariate(1 / 10)), self.now)
+            closed = updated if rng.random() < 0.8 else None
+            # A few PRs and issues are long enough to need more than one page
+            commits = sorted(
+                min(created + timedelta(hours=rng.uniform(0, 72)), updated)
+                for _ in range(rng.randint(1, 250 if rng.random() < 0.05 else 40))
+            )
+            self.pulls.append({"number": number, "created_at": created, "updated_at": updated,
+                               "closed_at": closed, "commits": commits})
+        self.issues = []
+        for number in range(prs + 1, prs + issues + 1):
+            created = self._ago(rng.uniform(0, history_days))
+            comments = sorted(
+                min(created + timedelta(days=rng.expovariate(1 / 5)), self.now)
+                for _ in range(rng.randint(0, 150 if rng.random() < 0.05 else 15))
+            )
+            updated = max([created] + comments)
+            closed = updated if rng.random() < 0.6 else None
+            self.issues.append({"number": number, "created_at": created, "updated_at": updated,
+                                "closed_at": closed, "comments": comments})
+        self.pulls.sort(key=lambda p: p["updated_at"], reverse=True)
+
+    def _ago(self, days):
+        return (self.now - timedelta(days=days)).replace(microsecond=0)
+
+
+class Budget:
+    """Fixed-window request budget, the way GitHub accounts the primary rate limit."""
+
+    def __init__(self, limit, window):
+        self.limit = limit
+        self.window = window
+        self.reset = time.time() + window
+        self.used = 0
+
+    def take(self):
+        now = time.time()
+        if now >= self.reset:
+            self.reset = now + self.window
+            self.used = 0
+        if self.used >= self.limit:
+            return False
+        self.used += 1
+        return True
+
+    def headers(self, resource):
+        return {
+            "X-RateLimit-Limit": str(self.limit),
+            "X-RateLimit-Remaining": str(max(self.limit - self.used, 0)),
+            "X-RateLimit-Used": str(self.used),
+            "X-RateLimit-Reset": str(math.ceil(self.reset)),
+            "X-RateLimit-Resource": resource,
+        }
+
+
+class FakeGitHub:
+    def __init__(self, repos, core_limit=5000, window=3600, search_limit=10, search_window=60,
+                 search_min_interval=0.0, latency=0.0, search_hits=150):
+        self.repos = {repo.full_name: repo for repo in repos}
+        self.limits = {"core": (core_limit, window), "search": (search_limit, search_window),
+                       "graphql": (core_limit, window)}
+        self.search_min_interval = search_min_interval
+        self.latency = latency
+        self.search_hits = search_hits
+        self.budgets = {}
+        self.last_search = {}
+        self.counters = {"requests": 0, "rate_limited": 0, "secondary_limited": 0, "not_modified": 0,
+                         "connections": 0, "bytes_sent": 0}
+        self.lock = threading.Lock()
+        self.base_url = None
+
+    def budget(self, token, resource):
+        # Like GitHub, every token has its own budget per resource
+        key = (token, resource)
+        if key not in self.budgets:
+            self.budgets[key] = Budget(*self.limits[resource])
+        return self.budgets[key]
+
+    def admit(self, token, resource):
+        """Charge a request against the token's budget; returns (status, body, headers)."""
+        with self.lock:
+            self.counters["requests"] += 1
+            budget = self.budget(token, resource)
+            if resource == "search" and self.search_min_interval:
+                now = time.time()
+                wait = self.last_search.get(token, 0) + self.search_min_interval - now
+                if wait > 0:
+                    self.counters["secondary_limited"] += 1
+                    return 403, {"message": "You have exceeded a secondary rate limit. Please wait a few minutes before you try again."}, \
+                        {"Retry-After": str(math.ceil(wait))}
+                self.last_search[token] = now
+            if not budget.take():
+                self.counters["rate_limited"] += 1
+                return 403, {"message": "API rate limit exceeded for user."}, budget.headers(resource)
+            return None, None, budget.headers(resource)
+
+    def peek(self, token, resource, etag):
+        """Headers for a 304 reply, which is not charged against the budget."""
+        with self.lock:
+            self.counters["requests"] += 1
+            self.counters["not_modified"] += 1
+            headers = self.budget(token, resource).headers(resource)
+        headers["ETag"] = etag
+        return headers
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    # Route handlers return (status, body, extra headers)
+
+    def route(self, path, query):
+        m = re.fullmatch(r"/repos/([^/]+/[^/]+)(/.*)?", path)
+        if m:
+            repo = self.repos.get(m.group(1))
+            if repo is None:
+                return 404, {"message": "Not Found"}, {}
+            return self.route_repo(repo, m.group(2) or "", query)
+        if path == "/search/code":
+            return self.search_code(query)
+        return 404, {"message": "Not Found"}, {}
+
+    def route_repo(self, repo, rest, query):
+        repo_url = f"{self.base_url}/repos/{repo.full_name}"
+        if rest == "":
+            return 200, {"full_name": repo.full_name, "language": "Python", "stargazers_count": len(repo.pulls)}, {}
+        path = f"/repos/{repo.full_name}{rest}"
+        if rest == "/pulls":
+            return self.paginate(path, query, [self.pull_json(repo_url, pr) for pr in repo.pulls])
+        m = re.fullmatch(r"/pulls/(\d+)/commits", rest)
+        if m:
+            pr = next((p for p in repo.pulls if p["number"] == int(m.group(1))), None)
+            if pr is None:
+                return 404, {"message": "Not Found"}, {}
+            commits = [self.commit_json(pr["number"], i, date) for i, date in enumerate(pr["commits"])]
+            return self.paginate(path, query, commits)
+        if rest == "/issues":
+            items = [self.issue_json(repo_url, issue) for issue in repo.issues]
+            items += [self.pr_issue_json(repo_url, pr) for pr in repo.pulls]
+            since = query.get("since")
+            if since:
+                items = [item for item in items if item["updated_at"] >= since]
+            items.sort(key=lambda item: item["updated_at"], reverse=True)
+            return self.paginate(path, query, items)
+        m = re.fullmatch(r"/issues/(\d+)/comments", rest)
+        if m:
+            issue = next((i for i in repo.issues if i["number"] == int(m.group(1))), None)
+            comments = issue["comments"] if issue else []
+            return self.paginate(path, query, [
+                {"id": issue["number"] * 1000 + i, "created_at": date.strftime(DATE_FORMAT),
+                 "updated_at": date.strftime(DATE_FORMAT), "body": "Looks good to me.",
+                 "user": {"login": f"user{i}"}}
+                for i, date in enumerate(comments)
+            ])
+        m = re.fullmatch(r"/contents/(.+)", rest)
+        if m:
+            hit = re.search(r"review-(\d+)\.", m.group(1))
+            content = workflow_content(int(hit.group(1)) if hit else 1).encode()
+            return 200, {"path": m.group(1), "encoding": "base64",
+                         "sha": blob_sha(content),
+                         "content": base64.b64encode(content).decode()}, {}
+        return 404, {"message": "Not Found"}, {}
+
+    def search_code(self, query):
+        # Like GitHub: total_count covers every match, but only the first 1000 can be paged through
+        names = sorted(self.repos)
+        q = query.get("q", "")
+        size = re.search(r"size:(\d+)\.\.(\d+)", q)
+        extension = re.search(r"extension:(\w+)", q)
+        items = []
+        for i in range(self.search_hits):
+            file_extension = "yaml" if i % 3 == 0 else "yml"
+            # Sizes cluster like real workflow files, so several files share each size
+            file_size = 600 + (i * 7919) % 3000
+            if size and not int(size.group(1)) <= file_size <= int(size.group(2)):
+                continue
+            if extension and extension.group(1) != file_extension:
+                continue
+            items.append({
+                "name": f"review-{i}.{file_extension}",
+                "path": f".github/workflows/review-{i}.{file_extension}",
+                "sha": blob_sha(workflow_content(i).encode()),
+                "url": f"{self.base_url}/repos/{names[i % len(names)]}/contents/.github/workflows/review-{i}.{file_extension}",
+                "html_url": f"https://github.com/{names[i % len(names)]}/blob/main/.github/workflows/review-{i}.{file_extension}",
+                "repository": {"full_name": names[i % len(names)]},
+            })
+        page, per_page = int(query.get("page", 1)), min(int(query.get("per_page", 30)), 100)
+        if (page - 1) * per_page >= SEARCH_RESULT_CAP:
+            return 422, {"message": "Only the first 1000 search results are available"}, {}
+        status, chunk, headers = self.paginate("/search/code", query, items[:SEARCH_RESULT_CAP])
+        return status, {"total_count": len(items), "incomplete_results": False, "items": chunk}, headers
+
+    def graphql(self, body):
+        match = re.search(r"query\s+(\w+)", body.get("query", ""))
+        operation = match.group(1) if match else None
+        variables = body.get("variables") or {}
+        repo = self.repos.get(f"{variables.get('owner')}/{variables.get('name')}")
+        if repo is None:
+            return 200, {"data": {"repository": None},
+                         "errors": [{"type": "NOT_FOUND", "message": "Could not resolve to a Repository"}]}, {}
+        if operation == "PullRequests":
+            nodes, page_info = self.connection(repo.pulls, variables["first"], variables.get("cursor"))
+            result = {"pullRequests": {"pageInfo": page_info, "nodes": [{
+                "number": pr["number"],
+                "createdAt": pr["created_at"].strftime(DATE_FORMAT),
+                "updatedAt": pr["updated_at"].strftime(DATE_FORMAT),
+                "closedAt": pr["closed_at"].strftime(DATE_FORMAT) if pr["closed_at"] else None,
+                "commits": self.commit_connection(pr, variables["commits"], None),
+            } for pr in nodes]}}
+        elif operation == "PullRequestCommits":
+            pr = next(p for p in repo.pulls if p["number"] == variables["number"])
+            result = {"pullRequest": {"commits": self.commit_connection(pr, variables["first"], variables.get("cursor"))}}
+        elif operation == "Issues":
+            issues = sorted((i for i in repo.issues if i["updated_at"].strftime(DATE_FORMAT) >= variables["since"]),
+                            key=lambda i: i["updated_at"], reverse=True)
+            nodes, page_info = self.connection(issues, variables["first"], variables.get("cursor"))
+            result = {"issues": {"pageInfo": page_info, "nodes": [{
+                "number": issue["number"],
+                "createdAt": issue["created_at"].strftime(DATE_FORMAT),
+                "updatedAt": issue["updated_at"].strftime(DATE_FORMAT),
+                "closedAt": issue["closed_at"].strftime(DATE_FORMAT) if issue["closed_at"] else None,
+                "comments": self.comment_connection(issue, variables["comments"], None),
+            } for issue in nodes]}}
+        elif operation == "IssueComments":
+            issue = next(i for i in repo.issues if i["number"] == variables["number"])
+            result = {"issue": {"comments": self.comment_connection(issue, variables["first"], variables.get("cursor"))}}
+        else:
+            return 200, {"errors": [{"message": f"Unsupported operation {operation}"}]}, {}
+        return 200, {"data": {"repository": result}}, {}
+
+    @staticmethod
+    def connection(items, first, cursor):
+        """Slice `items` the way a GraphQL connection does; cursors are plain offsets."""
+        offset = int(cursor or 0)
+        nodes = items[offset:offset + first]
+        has_next = offset + first < len(items)
+        return nodes, {"hasNextPage": has_next, "endCursor": str(offset + len(nodes))}
+
+    def commit_connection(self, pr, first, cursor):
+        nodes, page_info = self.connection(pr["commits"], first, cursor)
+        offset = int(cursor or 0)
+        return {"pageInfo": page_info, "nodes": [
+            {"commit": {"oid": self.commit_sha(pr["number"], offset + i), "committedDate": date.strftime(DATE_FORMAT)}}
+            for i, date in enumerate(nodes)]}
+
+    def comment_connection(self, issue, first, cursor):
+        nodes, page_info = self.connection(issue["comments"], first, cursor)
+        offset = int(cursor or 0)
+        return {"pageInfo": page_info, "nodes": [
+            {"databaseId": issue["number"] * 1000 + offset + i, "createdAt": date.strftime(DATE_FORMAT)}
+            for i, date in enumerate(nodes)]}
+
+    def paginate(self, path, query, items):
+        page = int(query.get("page", 1))
+        per_page = min(int(query.get("per_page", 30)), 100)
+        chunk = items[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            next_query = urlencode(dict(query, page=page + 1))
+            headers["Link"] = f'<{self.base_url}{path}?{next_query}>; rel="next"'
+        return 200, chunk, headers
+
+    @staticmethod
+    def pull_json(repo_url, pr):
+        return {
+            "number": pr["number"],
+            "state": "closed" if pr["closed_at"] else "open",
+            "title": f"Change number {pr['number']}",
+            "user": {"login": f"user{pr['number'] % 17}", "type": "User"},
+            "labels": [{"name": "enhancement"}],
+            "created_at": pr["created_at"].strftime(DATE_FORMAT),
+            "updated_at": pr["updated_at"].strftime(DATE_FORMAT),
+            "closed_at": pr["closed_at"].strftime(DATE_FORMAT) if pr["closed_at"] else None,
+            "commits_url": f"{repo_url}/pulls/{pr['number']}/commits",
+        }
+
+    @staticmethod
+    def pr_issue_json(repo_url, pr):
+        item = FakeGitHub.pull_json(repo_url, pr)
+        item["comments_url"] = f"{repo_url}/issues/{pr['number']}/comments"
+        item["pull_request"] = {"url": f"{repo_url}/pulls/{pr['number']}"}
+        return item
+
+    @staticmethod
+    def issue_json(repo_url, issue):
+        return {
+            "number": issue["number"],
+            "state": "closed" if issue["closed_at"] else "open",
+            "title": f"Issue number {issue['number']}",
+            "user": {"login": f"user{issue['number'] % 13}", "type": "User"},
+            "created_at": issue["created_at"].strftime(DATE_FORMAT),
+            "updated_at": issue["updated_at"].strftime(DATE_FORMAT),
+            "closed_at": issue["closed_at"].strftime(DATE_FORMAT) if issue["closed_at"] else None,
+            "comments": len(issue["comments"]),
+            "comments_url": f"{repo_url}/issues/{issue['number']}/comments",
+        }
+
+    @staticmethod
+    def commit_sha(number, index):
+        return hashlib.sha1(f"{number}-{index}".encode()).hexdigest()
+
+    @staticmethod
+    def commit_json(number, index, date):
+        return {
+            "sha": FakeGitHub.commit_sha(number, index),
+            "commit": {
+                "author": {"name": "dev", "date": date.strftime(DATE_FORMAT)},
+                "committer": {"name": "dev", "date": date.strftime(DATE_FORMAT)},
+                "message": f"Commit {index} for PR {number}",
+            },
+        }
+
+
+class FakeGitHubHandler(BaseHTTPRequestHandler):
+    fake = None
+    # Keep-alive, so connection reuse by the clients is visible in the "connections" counter
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes; without TCP_NODELAY delayed ACKs stall kept-alive connections
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.fake.lock:
+            self.fake.counters["connections"] += 1
+
+    def do_GET(self):
+        parsed = urlparse(self.path)
+        query = {k: v[-1] for k, v in parse_qs(parsed.query).items()}
+        if parsed.path == "/_stats":
+            return self.reply(200, self.fake.stats(), {})
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        resource = "search" if parsed.path.startswith("/search/") else "core"
+        status, body, extra = self.fake.route(parsed.path, query)
+        etag = '"%s"' % hashlib.sha1(json.dumps(body).encode()).hexdigest()
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            # Conditional requests answered with 304 are free, as on GitHub
+            return self.reply(304, None, self.fake.peek(self.token(), resource, etag))
+        admit_status, admit_body, headers = self.fake.admit(self.token(), resource)
+        if admit_status is not None:
+            return self.reply(admit_status, admit_body, headers)
+        headers.update(extra)
+        if status == 200:
+            headers["ETag"] = etag
+        self.reply(status, body, headers)
+
+    def do_POST(self):
+        # Read the body first so a kept-alive connection stays in sync
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if urlparse(self.path).path != "/graphql":
+            return self.reply(404, {"message": "Not Found"}, {})
+        if self.fake.latency:
+            time.sleep(self.fake.latency)
+        status, reply, headers = self.fake.admit(self.token(), "graphql")
+        if status is None:
+            status, reply, extra = self.fake.graphql(body)
+            headers.update(extra)
+        self.reply(status, reply, headers)
+
+    def token(self):
+        # "token abc" (REST) and "bearer abc" (GraphQL) are the same credential
+        return self.headers.get("Authorization", "").split(" ")[-1]
+
+    def reply(self, status, body, headers):
+        payload = json.dumps(body).encode() if body is not None else b""
+        gzipped = len(payload) > 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            payload = gzip.compress(payload, compresslevel=5)
+        with self.fake.lock:
+            self.fake.counters["bytes_sent"] += len(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.debug("fake_github: " + format, *args)
+
+
+class FakeGitHubServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients that are killed or time out mid-request are expected, not server errors
+        if isinstance(sys.exc_info()[1], ConnectionError):
+            return
+        super().handle_error(request, client_address)
+
+
+def start_server(fake, host="127.0.0.1", port=0, certfile=None, keyfile=None, handler_class=None):
+    """Serve `fake` from a background thread, over HTTPS when certfile is given; returns (server, base_url)."""
+    handler = type("Handler", (handler_class or FakeGitHubHandler,), {"fake": fake})
+    server = FakeGitHubServer((host, port), handler)
+    server.daemon_threads = True
+    scheme = "http"
+    if certfile:
+        context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+        context.load_cert_chain(certfile, keyfile)
+        server.socket = context.wrap_socket(server.socket, server_side=True)
+        scheme = "https"
+    fake.base_url = f"{scheme}://{host}:{server.server_address[1]}"
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake.base_url
+
+
+def run_bench(args):
+    """Run github_stats against the fake server and report throughput against the budget."""
+    fake = FakeGitHub([FakeRepo("fake/repo", prs=args.prs, issues=args.issues)],
+                      core_limit=args.core_limit, window=args.window,
+                      search_limit=args.search_limit, search_window=args.search_window,
+                      search_min_interval=args.search_min_interval, latency=args.latency)
+    server, base_url = start_server(fake)
+    os.environ["GITHUB_API_URL"] = base_url
+    os.environ.setdefault("GITHUB_TOKEN", "fake-token")
+    if args.tokens > 1:
+        os.environ["GITHUB_TOKENS"] = ",".join(f"fake-token-{i + 1}" for i in range(args.tokens))
+    import github_stats
+    import rate_limiter
+
+    start = time.time()
+    stats = github_stats.get_github_stats("fake/repo", args.days, args.concurrency)
+    elapsed = time.time() - start
+    counters = fake.stats()
+    server.shutdown()
+    print(json.dumps({
+        "stats": stats,
+        "elapsed_seconds": round(elapsed, 2),
+        "requests": counters["requests"],
+        "rejected": counters["rate_limited"] + counters["secondary_limited"],
+        "requests_per_second": round(counters["requests"] / elapsed, 2),
+        "budget_per_second": round(args.core_limit / args.window * args.tokens, 2),
+        "slept_seconds": round(rate_limiter.get_limiter("core").slept, 2),
+        # Core requests each token spent in its current window, as the server counted them
+        "server_used": {token: budget.used for (token, resource), budget in sorted(fake.budgets.items())
+                        if resource == "core"},
+        "tokens": rate_limiter.token_stats(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake GitHub API with rate limits")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default 8000)")
+    parser.add_argument("--repos", default="fake/repo", help="Comma-separated list of fake repositories")
+    parser.add_argument("--prs", type=int, default=200, help="Pull requests per repository (default 200)")
+    parser.add_argument("--issues", type=int, default=200, help="Issues per repository (default 200)")
+    parser.add_argument("--core-limit", type=int, default=5000, help="Core requests per window (default 5000)")
+    parser.add_argument("--window", type=int, default=3600, help="Core rate-limit window in seconds (default 3600)")
+    parser.add_argument("--search-limit", type=int, default=10, help="Search requests per window (default 10)")
+    parser.add_argument("--search-window", type=int, default=60, help="Search rate-limit window in seconds (default 60)")
+    parser.add_argument("--search-min-interval", type=float, default=0.0, help="Secondary limit: minimum seconds between search requests")
+    parser.add_argument("--search-hits", type=int, default=150, help="Code search matches; only 1000 per query are reachable (default 150)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request in seconds")
+    parser.add_argument("--bench", action="store_true", help="Run github_stats against the server and report throughput")
+    parser.add_argument("--days", type=int, default=30, help="Days analyzed in --bench mode (default 30)")
+    parser.add_argument("--concurrency", type=int, default=8, help="github_stats workers in --bench mode (default 8)")
+    parser.add_argument("--tokens", type=int, default=1, help="Tokens in the GITHUB_TOKENS pool in --bench mode (default 1)")
+    args = parser.parse_args()
+
+    if args.bench:
+        run_bench(args)
+    else:
+        fake = FakeGitHub([FakeRepo(name.strip(), prs=args.prs, issues=args.issues, seed=i)
+                           for i, name in enumerate(args.repos.split(','))],
+                          core_limit=args.core_limit, window=args.window,
+                          search_limit=args.search_limit, search_window=args.search_window,
+                          search_min_interval=args.search_min_interval, latency=args.latency,
+                          search_hits=args.search_hits)
+        server, base_url = start_server(fake, port=args.port)
+        print(f"Fake GitHub API listening on {base_url}")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            server.shutdown()
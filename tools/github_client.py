@@ -0,0 +1,168 @@
+"""
+Description: Shared HTTP client for the GitHub tools.
+
+All API calls of github_stats.py, github_graphql.py and action_usage.py go through one pooled
+requests.Session. TCP and TLS connections are kept alive and reused across requests and worker
+threads instead of being opened per call. Authentication, gzip, timeouts and transport-level retries
+(connection errors and 502/503/504 on idempotent requests) are configured here once. Rate-limit
+retries stay with the callers because they depend on the shared limiters (rate_limiter.py).
+
+GITHUB_TOKENS may list several comma-separated tokens instead of the single GITHUB_TOKEN. The
+limiters pick one per request, and callers pass it as auth_headers(token).
+
+When httpx with HTTP/2 support is installed (pip install "httpx[http2]"), configure(http2=True)
+multiplexes all requests over a single connection per host instead.
+"""
+
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+import cassette
+import telemetry
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+DEFAULT_POOL_SIZE = 16
+# (connect, read) seconds
+DEFAULT_TIMEOUT = (5, 30)
+# Transport retries per request, and the default number of rate-limit retries of the callers
+MAX_RETRIES = 5
+
+
+def tokens():
+    """The tokens of GITHUB_TOKENS (comma-separated), or else GITHUB_TOKEN; empty if neither is set."""
+    pool = [token.strip() for token in os.environ.get("GITHUB_TOKENS", "").split(",") if token.strip()]
+    if not pool and os.environ.get("GITHUB_TOKEN"):
+        pool = [os.environ["GITHUB_TOKEN"]]
+    return pool
+
+
+def auth_headers(token, headers=None):
+    """`headers` plus the Authorization of `token`; None keeps the client's default token."""
+    headers = dict(headers or {})
+    if token:
+        headers["Authorization"] = f"token {token}"
+    return headers
+
+
+class GitHubClient:
+    def __init__(self, token=None, pool_size=DEFAULT_POOL_SIZE, timeout=DEFAULT_TIMEOUT,
+                 gzip=True, http2=False, verify=True):
+        token = token or next(iter(tokens()), None)
+        if not token:
+            raise ValueError("GITHUB_TOKEN (or GITHUB_TOKENS) environment variable is not set")
+        self.timeout = timeout
+        self.headers = {
+            "Authorization": f"token {token}",
+            "Accept": "application/vnd.github.v3+json",
+            "Accept-Encoding": "gzip" if gzip else "identity",
+        }
+        self.http2 = False
+        if http2 and httpx is not None:
+            try:
+                transport = httpx.HTTPTransport(http2=True, verify=verify, retries=MAX_RETRIES,
+                                                limits=httpx.Limits(max_connections=pool_size))
+                self._httpx = httpx.Client(headers=self.headers, transport=transport)
+                self.http2 = True
+            except ImportError:
+                # httpx is installed without the h2 package
+                logging.warning("HTTP/2 needs the h2 package (pip install \"httpx[http2]\"). Using HTTP/1.1.")
+        elif http2:
+            logging.warning("HTTP/2 needs httpx (pip install \"httpx[http2]\"). Using HTTP/1.1.")
+
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.verify = verify
+        retry = Retry(total=MAX_RETRIES, connect=MAX_RETRIES, read=2, status=2, backoff_factor=0.5,
+                      status_forcelist=(502, 503, 504), allowed_methods=frozenset({"GET", "HEAD"}),
+                      raise_on_status=False, respect_retry_after_header=False)
+        # One pool per host; pool_maxsize bounds the idle connections kept for reuse
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, headers=None, **kwargs):
+        return self.request("GET", url, params=params, headers=headers, **kwargs)
+
+    def post(self, url, json=None, headers=None, **kwargs):
+        return self.request("POST", url, json=json, headers=headers, **kwargs)
+
+    def request(self, method, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        # Every request is timed and counted per endpoint class, see telemetry.py
+        start = time.perf_counter()
+        try:
+            if self.http2:
+                response = self._request_http2(method, url, **kwargs)
+            else:
+                # Per request, because REQUESTS_CA_BUNDLE would override a session-level verify
+                kwargs.setdefault("verify", self.verify)
+                response = self.session.request(method, url, **kwargs)
+        except requests.exceptions.RequestException as e:
+            telemetry.record_request(method, url, start, error=e)
+            raise
+        telemetry.record_request(method, url, start, response)
+        # Written to the cassette of a --record run, see cassette.py
+        cassette.record(method, url, kwargs, response, start)
+        return response
+
+    def _request_http2(self, method, url, timeout, **kwargs):
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        try:
+            reply = self._httpx.request(method, url, timeout=httpx.Timeout(read, connect=connect), **kwargs)
+        except httpx.TransportError as e:
+            # Callers handle requests' exception hierarchy only
+            raise requests.exceptions.ConnectionError(str(e)) from e
+        return self._as_requests_response(reply)
+
+    @staticmethod
+    def _as_requests_response(reply):
+        response = requests.models.Response()
+        response.status_code = reply.status_code
+        response.reason = reply.reason_phrase
+        response.url = str(reply.url)
+        response.headers = CaseInsensitiveDict(reply.headers)
+        response.encoding = reply.encoding
+        response._content = reply.content
+        return response
+
+    def close(self):
+        self.session.close()
+        if self.http2:
+            self._httpx.close()
+
+
+_client = None
+_options = {}
+_lock = threading.Lock()
+
+
+def configure(**options):
+    """Set the options (see GitHubClient) of the shared client; it is created on first use."""
+    global _client, _options
+    with _lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+        _options = options
+
+
+def get_client():
+    """The shared client, created from GITHUB_TOKEN (or the first of GITHUB_TOKENS) on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            _client = GitHubClient(**_options)
+            logging.info(f"Using {'HTTP/2' if _client.http2 else 'HTTP/1.1'} client with a pool of "
+                         f"{_options.get('pool_size', DEFAULT_POOL_SIZE)} connections")
+        return _client
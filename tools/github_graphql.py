@@ -0,0 +1,259 @@
+"""
+Description: GraphQL backend for github_stats.py.
+
+Pulls PRs together with their commit dates and issues together with their comment timestamps in
+paginated, batched GraphQL queries, instead of one REST request per PR and per issue. Only PRs with
+more than COMMITS_PER_PR commits or issues with more than COMMENTS_PER_ISSUE comments need follow-up
+queries. Events are recorded in the same event store as the REST backend (commit SHAs and comment
+database IDs match), so both return the same stats dict and can share a persistent store.
+
+Usage:
+python github_stats.py <repo1,repo2,repo3> --days <number of days> --backend graphql
+"""
+
+import logging
+import os
+from datetime import datetime, timedelta
+
+import requests
+
+from github_client import get_client, auth_headers, MAX_RETRIES
+from rate_limiter import limiter_for_url, is_rate_limited
+from event_store import EventStore
+from event_columns import repo_stats, longest
+import telemetry
+
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+GITHUB_GRAPHQL_URL = os.environ.get("GITHUB_GRAPHQL_URL", f"{GITHUB_API_URL}/graphql")
+
+# Page sizes are kept below GitHub's node limit (first * nested first <= 500,000)
+PRS_PER_PAGE = 50
+ISSUES_PER_PAGE = 50
+COMMITS_PER_PR = 100
+COMMENTS_PER_ISSUE = 100
+
+PULL_REQUESTS_QUERY = """
+query PullRequests($owner: String!, $name: String!, $first: Int!, $commits: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(first: $first, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        createdAt
+        updatedAt
+        closedAt
+        commits(first: $commits) {
+          pageInfo { hasNextPage endCursor }
+          nodes { commit { oid committedDate } }
+        }
+      }
+    }
+  }
+}
+"""
+
+PULL_REQUEST_COMMITS_QUERY = """
+query PullRequestCommits($owner: String!, $name: String!, $number: Int!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      commits(first: $first, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { commit { oid committedDate } }
+      }
+    }
+  }
+}
+"""
+
+ISSUES_QUERY = """
+query Issues($owner: String!, $name: String!, $since: DateTime!, $first: Int!, $comments: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issues(first: $first, after: $cursor, orderBy: {field: UPDATED_AT, direction: DESC}, filterBy: {since: $since}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        createdAt
+        updatedAt
+        closedAt
+        comments(first: $comments) {
+          pageInfo { hasNextPage endCursor }
+          nodes { databaseId createdAt }
+        }
+      }
+    }
+  }
+}
+"""
+
+ISSUE_COMMENTS_QUERY = """
+query IssueComments($owner: String!, $name: String!, $number: Int!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    issue(number: $number) {
+      comments(first: $first, after: $cursor) {
+        pageInfo { hasNextPage endCursor }
+        nodes { databaseId createdAt }
+      }
+    }
+  }
+}
+"""
+
+
+def graphql_query(query, variables, max_retries=MAX_RETRIES):
+    """POST a query to the GraphQL API and return its `data`, or None on failure."""
+    limiter = limiter_for_url(GITHUB_GRAPHQL_URL)
+    retries = 0
+    while retries < max_retries:
+        token = limiter.acquire()
+        try:
+            response = get_client().post(GITHUB_GRAPHQL_URL, json={"query": query, "variables": variables},
+                                         headers=auth_headers(token))
+            limiter.update(response.headers, token)
+            response.raise_for_status()
+            body = telemetry.decode(response)
+        except requests.exceptions.RequestException as e:
+            if getattr(e, 'response', None) is not None and is_rate_limited(e.response):
+                sleep_time = limiter.backoff(e.response.headers, 2 ** retries, token)
+                logging.warning(f"Rate limited ({e.response.status_code}). Retrying in {sleep_time:.2f} seconds.")
+                retries += 1
+                continue
+            logging.error(f"Error running GraphQL query: {e}")
+            return None
+
+        errors = body.get("errors")
+        if errors:
+            if any(error.get("type") == "RATE_LIMITED" for error in errors):
+                sleep_time = limiter.backoff(response.headers, 2 ** retries, token)
+                logging.warning(f"GraphQL rate limited. Retrying in {sleep_time:.2f} seconds.")
+                retries += 1
+                continue
+            logging.error(f"GraphQL errors: {[error.get('message') for error in errors]}")
+            return None
+        return body.get("data")
+
+    logging.error("Max retries reached. Unable to run GraphQL query.")
+    return None
+
+
+def fetch_remaining_nodes(query, variables, path, connection):
+    """Nodes of `connection` beyond its first page, following endCursor; None if a page failed."""
+    nodes = []
+    page_info = connection["pageInfo"]
+    while page_info["hasNextPage"]:
+        data = graphql_query(query, dict(variables, cursor=page_info["endCursor"]))
+        if not data:
+            return None
+        for key in path:
+            data = data[key]
+        nodes.extend(data["nodes"])
+        page_info = data["pageInfo"]
+    return nodes
+
+
+def get_github_stats_graphql(repo, days=30, end_date=None, store=None, resume=False):
+    owner, name = repo.split('/', 1)
+
+    # Fails early if GITHUB_TOKEN is missing
+    get_client()
+
+    end_date = end_date or datetime.utcnow()
+    start_date = end_date - timedelta(days=longest(days))
+
+    store = store or EventStore()
+    resumed = store.load_progress(repo) if resume else None
+    if resumed:
+        since, synced_at = resumed["since"], resumed["synced_at"]
+    else:
+        since = store.sync_start(repo, start_date)
+        synced_at = datetime.utcnow()
+
+    logging.info(f"Analyzing repository: {repo} for the last {days} days (GraphQL)")
+    logging.info(f"Date range: {start_date} to {end_date}")
+    if resumed:
+        logging.info(f"Resuming {repo} after {resumed['phase']} page {resumed['page']}.")
+
+    # Pull requests, most recently updated first, each with its first page of commits
+    variables = {"owner": owner, "name": name, "first": PRS_PER_PAGE, "commits": COMMITS_PER_PR, "cursor": None}
+    page = 1
+    reached_since = False
+    complete = True
+    if resumed and resumed["phase"] == "pulls":
+        variables["cursor"], page = resumed["cursor"], resumed["page"] + 1
+    elif resumed:
+        reached_since = True
+    while not reached_since:
+        logging.info(f"Fetching pull requests page {page}")
+        data = graphql_query(PULL_REQUESTS_QUERY, variables)
+        if not data or not data.get("repository"):
+            complete = False
+            break
+        connection = data["repository"]["pullRequests"]
+
+        for pr in connection["nodes"]:
+            # Same early exit as the REST path: nothing older can fall inside the window
+            if datetime.strptime(pr["updatedAt"], "%Y-%m-%dT%H:%M:%SZ") < since:
+                reached_since = True
+                break
+
+            store.add_pull(repo, pr["number"], pr["createdAt"], pr["updatedAt"], pr["closedAt"])
+            more_commits = fetch_remaining_nodes(
+                PULL_REQUEST_COMMITS_QUERY,
+                {"owner": owner, "name": name, "number": pr["number"], "first": COMMITS_PER_PR},
+                ("repository", "pullRequest", "commits"), pr["commits"])
+            if more_commits is None:
+                complete = False
+                continue
+            store.set_commits(repo, pr["number"], [(node["commit"]["oid"], node["commit"]["committedDate"])
+                                                   for node in pr["commits"]["nodes"] + more_commits])
+
+        # The cursor after this page is where a resumed run continues
+        if complete:
+            store.save_progress(repo, since, synced_at, "pulls", page, connection["pageInfo"]["endCursor"])
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        variables["cursor"] = connection["pageInfo"]["endCursor"]
+        page += 1
+    if complete:
+        store.save_progress(repo, since, synced_at, "issues", 0)
+
+    # Issues updated inside the window; the issues connection already excludes pull requests
+    variables = {"owner": owner, "name": name, "since": since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                 "first": ISSUES_PER_PAGE, "comments": COMMENTS_PER_ISSUE, "cursor": None}
+    page = 1
+    if resumed and resumed["phase"] == "issues" and resumed["page"]:
+        variables["cursor"], page = resumed["cursor"], resumed["page"] + 1
+    while True:
+        logging.info(f"Fetching issues page {page}")
+        data = graphql_query(ISSUES_QUERY, variables)
+        if not data or not data.get("repository"):
+            complete = False
+            break
+        connection = data["repository"]["issues"]
+
+        for issue in connection["nodes"]:
+            store.add_issue(repo, issue["number"], issue["createdAt"], issue["updatedAt"], issue["closedAt"])
+            more_comments = fetch_remaining_nodes(
+                ISSUE_COMMENTS_QUERY,
+                {"owner": owner, "name": name, "number": issue["number"], "first": COMMENTS_PER_ISSUE},
+                ("repository", "issue", "comments"), issue["comments"])
+            if more_comments is None:
+                complete = False
+                continue
+            store.set_comments(repo, issue["number"], [(node["databaseId"], node["createdAt"])
+                                                       for node in issue["comments"]["nodes"] + more_comments])
+
+        if complete:
+            store.save_progress(repo, since, synced_at, "issues", page, connection["pageInfo"]["endCursor"])
+        if not connection["pageInfo"]["hasNextPage"]:
+            break
+        variables["cursor"] = connection["pageInfo"]["endCursor"]
+        page += 1
+
+    if complete:
+        store.checkpoint(repo, since, synced_at)
+    else:
+        logging.warning(f"Some requests for {repo} failed. Keeping the previous checkpoint.")
+
+    stats = repo_stats(store, repo, end_date, days)
+    logging.info(f"Stats for {repo}: { {key: value for key, value in stats.items() if key != 'daily'} }")
+    return stats
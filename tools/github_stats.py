@@ -2,59 +2,94 @@
 Description: This script fetches and analyzes GitHub repository statistics such as pull requests, issues, commits, and comments.
 
 Usage:
-python github_stats.py <repo1,repo2,repo3> --days <number of days>
+python github_stats.py <repo1,repo2,repo3> --days <days or list of days> [--concurrency <number of workers>] [--backend rest|graphql] [--cache-dir <dir> | --no-cache] [--store <path>] [--repo-workers <n>] [--fair] [--pool-size <n>] [--http2]
+    [--export <file.parquet>] [--metrics <file.json>] [--prometheus <file.prom>] [--trace <file.json>]
+python github_stats.py --resume [github_stats_<timestamp>.jsonl]
 
 Sample:
 nohup python github_stats.py "aws/aws-cdk,pingcap/tidb,taosdata/TDengine,langchain-ai/langchain,langgenius/dify,run-llama/llama_index,hiyouga/LLaMA-Factory" --days 30 > output.log 2>&1 &
+
+Nightly runs that share --store only fetch the activity since the previous run:
+python github_stats.py "aws/aws-cdk,pingcap/tidb" --days 30 --store github_stats.sqlite3
+
+Each finished repository is appended to github_stats_<timestamp>.jsonl right away, and the summary goes to
+github_stats_<timestamp>.json at the end. An interrupted run (crash, Ctrl-C, job timeout) continues with:
+python github_stats.py --resume
+
+Many repositories of very different sizes, processed side by side without the small ones waiting on the large ones:
+python github_stats.py "aws/aws-cdk,langgenius/dify,hiyouga/LLaMA-Factory" --days 30 --repo-workers 3 --fair
+
+Where the time of a run went (requests, latency, bytes, retries, rate-limit sleeps and JSON decoding per endpoint
+class and repository, see telemetry.py), with a timeline to open in chrome://tracing or ui.perfetto.dev:
+python github_stats.py "aws/aws-cdk" --days 30 --metrics metrics.json --prometheus metrics.prom --trace trace.json
+
+Several windows from a single fetch of the longest one, with per-day counts exported for dashboards (see event_columns.py):
+python github_stats.py "aws/aws-cdk,pingcap/tidb" --days 7,30,90 --export daily.parquet
+
+Several tokens share the work, each request going to the one with the most budget left (see rate_limiter.py);
+the run only sleeps once all of them are spent, and the summary shows each token's usage:
+GITHUB_TOKENS=ghp_aaa,ghp_bbb,ghp_ccc python github_stats.py "aws/aws-cdk,pingcap/tidb" --days 30
 """
 
 import requests
 import os
 from datetime import datetime, timedelta
 import logging
-import time
-import sys
 import json
 import argparse
+import glob
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from fair_executor import FairExecutor
+from rate_limiter import limiter_for_url, is_rate_limited, token_stats, token_report
+from github_graphql import get_github_stats_graphql
+import http_cache
+from http_cache import cached_get
+import github_client
+from github_client import get_client, auth_headers, MAX_RETRIES
+from event_store import EventStore
+from event_columns import repo_stats, longest
+from json_projection import Projection
+import event_columns
+import telemetry
+import cassette
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
-def fetch_data(url, headers=None, params=None, max_retries=5):
+# Defaults to the public API; point it at GitHub Enterprise or a local fake_github.py server
+GITHUB_API_URL = os.environ.get("GITHUB_API_URL", "https://api.github.com").rstrip('/')
+
+# Only these fields of each page item are decoded and kept, see json_projection.py
+PULL = Projection("Pull", ["number", "created_at", "updated_at", "closed_at", "commits_url"])
+ISSUE = Projection("Issue", ["number", "created_at", "updated_at", "closed_at", "comments_url", "pull_request"])
+COMMIT = Projection("Commit", ["sha", "commit.committer.date"])
+COMMENT = Projection("Comment", ["id", "created_at"])
+
+def fetch_data(url, headers=None, params=None, max_retries=MAX_RETRIES, projection=None):
+    # All callers share one token bucket per rate-limit resource, see rate_limiter.py
+    limiter = limiter_for_url(url)
     retries = 0
     while retries < max_retries:
+        # With a token pool, the token with the most headroom sends this request
+        token = limiter.acquire()
         try:
             if params:
                 params = {k: str(v) if isinstance(v, int) else v for k, v in params.items()}
             
-            response = requests.get(url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
+            # Revalidated against the response cache when one is configured, see http_cache.py
+            response = cached_get(url, headers=auth_headers(token, headers), params=params, send=get_client().get)
             # Refer to the https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api?apiVersion=2022-11-28
-            remaining = int(response.headers.get('X-RateLimit-Remaining', 0))
-            if remaining < 3:
-                reset_time = int(response.headers.get('X-RateLimit-Reset', 0))
-                current_time = datetime.utcnow().timestamp()
-                sleep_time = max(reset_time - current_time, 0) + 1
-                logging.warning(f"Rate limit low. Sleeping for {sleep_time:.2f} seconds.")
-                sleep_with_progress(sleep_time)
-            else:
-                time.sleep(0.1)  # Reduced delay between successful requests
-            
-            return response.json(), response.headers
+            limiter.update(response.headers, token)
+            response.raise_for_status()
+            # A projection decodes list pages into slim records instead of full dicts
+            return telemetry.decode(response, projection.decode if projection else None), response.headers
         
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, json.JSONDecodeError) as e:
             if hasattr(e, 'response') and e.response is not None:
-                if e.response.status_code == 403 and 'rate limit exceeded' in e.response.text.lower():
-                    reset_time = int(e.response.headers.get('X-RateLimit-Reset', 0))
-                    current_time = datetime.utcnow().timestamp()
-                    sleep_time = max(reset_time - current_time, 0) + (2 ** retries)
-                    logging.warning(f"Rate limit exceeded. Retrying in {sleep_time:.2f} seconds.")
-                    sleep_with_progress(sleep_time)
-                    retries += 1
-                elif e.response.status_code == 403 and 'abuse detection' in e.response.text.lower():
-                    sleep_time = (2 ** retries)
-                    logging.warning(f"Abuse detection triggered. Retrying in {sleep_time:.2f} seconds.")
-                    sleep_with_progress(sleep_time)
+                if is_rate_limited(e.response):
+                    sleep_time = limiter.backoff(e.response.headers, 2 ** retries, token)
+                    logging.warning(f"Rate limited ({e.response.status_code}). Retrying in {sleep_time:.2f} seconds.")
                     retries += 1
                 else:
                     logging.error(f"HTTP error occurred: {e}")
@@ -66,48 +101,138 @@ def fetch_data(url, headers=None, params=None, max_retries=5):
     logging.error("Max retries reached. Unable to fetch data.")
     return None, None
 
-def sleep_with_progress(sleep_time):
-    for i in range(int(sleep_time)):
-        remaining_time = max(sleep_time - i, 0)  # Ensure remaining time is never negative
-        sys.stdout.write(f"\rSleeping: {remaining_time:.1f} seconds remaining")
-        sys.stdout.flush()
-        time.sleep(1)
-    sys.stdout.write("\rResuming fetching data...                 \n")
-    sys.stdout.flush()
+def has_next_page(headers):
+    # parse_header_links returns one dict per link, so look at each link's rel
+    links = requests.utils.parse_header_links((headers or {}).get('Link', ''))
+    return any(link.get('rel') == 'next' for link in links)
+
+def parse_date(value):
+    # Validates the timestamp; the store keeps the original string
+    if value is None:
+        raise ValueError("timestamp is missing")
+    datetime.strptime(value, "%Y-%m-%dT%H:%M:%SZ")
+    return value
+
+def sync_pr_commits(store, repo, pr):
+    # Fetch commits for this PR
+    commits_url = pr.commits_url
+    commits_page = 1
+    pr_commits = []
+    while True:
+        commits_params = {"per_page": 100, "page": commits_page}
+        commits, commits_headers = fetch_data(commits_url, params=commits_params, projection=COMMIT)
+        if not commits:
+            logging.warning(f"No commits fetched for PR #{pr.number}")
+            if commits is None:
+                return False  # Failed fetch; keep what the store already has for this PR
+            break
+
+        if isinstance(commits, dict) and 'message' in commits:
+            logging.error(f"Error fetching commits for PR #{pr.number}: {commits['message']}")
+            if 'rate limit exceeded' in commits['message'].lower():
+                # Wait and retry
+                limiter_for_url(commits_url).pause(10)
+                continue
+            break
 
-def get_github_stats(repo, days=30):
+        for commit in commits:
+            try:
+                if isinstance(commit, COMMIT.record) and commit.sha:
+                    pr_commits.append((commit.sha, parse_date(commit.commit_committer_date)))
+                else:
+                    logging.warning(f"Unexpected commit format in PR #{pr.number}: {commit}")
+            except ValueError as e:
+                logging.error(f"ValueError in parsing commit date for PR #{pr.number}: {e}")
+                logging.debug(f"Commit data: {commit}")
+
+        if not has_next_page(commits_headers):
+            break
+        commits_page += 1
+
+    store.set_commits(repo, pr.number, pr_commits)
+    logging.info(f"Processed PR #{pr.number}. Commits in this PR: {len(pr_commits)}")
+    return True
+
+def sync_issue_comments(store, repo, issue):
+    # Fetch issue comments, following pagination so issues with long threads are fully counted
+    comments_url = issue.comments_url
+    comments_page = 1
+    issue_comments = []
+    while True:
+        comments, comments_headers = fetch_data(comments_url, params={"per_page": 100, "page": comments_page},
+                                                projection=COMMENT)
+        if comments is None:
+            return False  # Failed fetch; keep what the store already has for this issue
+        if not comments:
+            break
+        try:
+            for comment in comments:
+                issue_comments.append((comment.id, parse_date(comment.created_at)))
+        except AttributeError as e:
+            logging.error(f"Missing key in issue data: {e}")
+        except ValueError as e:
+            logging.error(f"Error parsing date: {e}")
+
+        if not has_next_page(comments_headers):
+            break
+        comments_page += 1
+    store.set_comments(repo, issue.number, issue_comments)
+    return True
+
+class PageProgress:
+    """Saves the last page whose commit/comment requests have all finished, for --resume."""
+
+    def __init__(self, store, repo, since, synced_at):
+        self.store = store
+        self.repo = repo
+        self.since = since
+        self.synced_at = synced_at
+        self.pending = deque()
+        self.failed = False
+
+    def add(self, phase, page, futures):
+        self.pending.append((phase, page, futures))
+        self.advance()
+
+    def advance(self):
+        last = None
+        while self.pending and not self.failed and all(future.done() for future in self.pending[0][2]):
+            phase, page, futures = self.pending.popleft()
+            # A failed page leaves a hole; later pages are not recorded so that a resume refetches it
+            if any(future.cancelled() or future.exception() or not future.result() for future in futures):
+                self.failed = True
+                break
+            last = (phase, page)
+        if last:
+            self.store.save_progress(self.repo, self.since, self.synced_at, *last)
+
+def get_github_stats(repo, days=30, concurrency=8, end_date=None, store=None, executor=None, resume=False):
     # GitHub API endpoint
-    api_url = f"https://api.github.com/repos/{repo}"
+    api_url = f"{GITHUB_API_URL}/repos/{repo}"
     
-    # Get GitHub token from environment variable
-    github_token = os.environ.get("GITHUB_TOKEN")
-    if not github_token:
-        raise ValueError("GITHUB_TOKEN environment variable is not set")
-
-    # Set up headers for authentication
-    headers = {
-        "Authorization": f"token {github_token}",
-        "Accept": "application/vnd.github.v3+json"
-    }
+    # Authentication comes from the shared client; fail before any request if GITHUB_TOKEN is missing
+    get_client()
 
     # Calculate the date range
-    end_date = datetime.utcnow()
-    start_date = end_date - timedelta(days=days)
-
-    # Initialize counters
-    stats = {
-        "pr_created": 0,
-        "pr_updated": 0,
-        "pr_closed": 0,
-        "issues_opened": 0,
-        "issues_closed": 0,
-        "issue_comments": 0,
-        "pr_commits": 0,  # New counter for PR commits
-        "prCommit_and_issueReply_all": 0  # New metric
-    }
+    end_date = end_date or datetime.utcnow()
+    start_date = end_date - timedelta(days=longest(days))
+
+    # Without a persistent store every run fetches its whole window
+    store = store or EventStore()
+    resumed = store.load_progress(repo) if resume else None
+    if resumed:
+        since, synced_at = resumed["since"], resumed["synced_at"]
+    else:
+        since = store.sync_start(repo, start_date)
+        synced_at = datetime.utcnow()
+    progress = PageProgress(store, repo, since, synced_at)
 
     logging.info(f"Analyzing repository: {repo} for the last {days} days")
     logging.info(f"Date range: {start_date} to {end_date}")
+    if resumed:
+        logging.info(f"Resuming {repo} after {resumed['phase']} page {resumed['page']}.")
+    elif since > start_date:
+        logging.info(f"Store covers {repo} up to {since}. Fetching newer activity only.")
 
     # Fetch pull requests
     pr_url = f"{api_url}/pulls"
@@ -118,186 +243,290 @@ def get_github_stats(repo, days=30):
         "per_page": 100
     }
     
-    page = 1
-    while True:
-        logging.info(f"Fetching pull requests page {page}")
-        prs, headers = fetch_data(pr_url, headers=headers, params=pr_params)
-        if not prs:
-            break
-        
-        for pr in prs:
-            pr_created_at = datetime.strptime(pr["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-            pr_updated_at = datetime.strptime(pr["updated_at"], "%Y-%m-%dT%H:%M:%SZ")
-            
-            if start_date <= pr_created_at <= end_date:
-                stats["pr_created"] += 1
-            
-            if start_date <= pr_updated_at <= end_date:
-                stats["pr_updated"] += 1
-            
-            if pr["closed_at"]:
-                pr_closed_at = datetime.strptime(pr["closed_at"], "%Y-%m-%dT%H:%M:%SZ")
-                if start_date <= pr_closed_at <= end_date:
-                    stats["pr_closed"] += 1
-            
-            # Fetch commits for this PR
-            commits_url = pr["commits_url"]
-            commits_page = 1
-            pr_commit_count = 0
-            while True:
-                commits_params = {"per_page": 100, "page": commits_page}
-                commits, commits_headers = fetch_data(commits_url, headers=headers, params=commits_params)
-                if not commits:
-                    logging.warning(f"No commits fetched for PR #{pr['number']}")
-                    break
-                
-                if isinstance(commits, dict) and 'message' in commits:
-                    logging.error(f"Error fetching commits for PR #{pr['number']}: {commits['message']}")
-                    if 'rate limit exceeded' in commits['message'].lower():
-                        # Wait and retry
-                        time.sleep(10)  # Reduced wait time before retrying
-                        continue
-                    break
+    # Per-PR commit and per-issue comment requests are fanned out to a
+    # bounded pool; page walking itself stays sequential. process_repos
+    # passes one pool shared by all repositories.
+    owns_executor = executor is None
+    if owns_executor:
+        executor = ThreadPoolExecutor(max_workers=concurrency)
+    futures = []
 
-                for commit in commits:
-                    try:
-                        if isinstance(commit, dict) and 'commit' in commit:
-                            commit_date = datetime.strptime(commit['commit']['committer']['date'], "%Y-%m-%dT%H:%M:%SZ")
-                            if start_date <= commit_date <= end_date:
-                                stats["pr_commits"] += 1
-                                stats["prCommit_and_issueReply_all"] += 1
-                                pr_commit_count += 1
-                        else:
-                            logging.warning(f"Unexpected commit format in PR #{pr['number']}: {commit}")
-                    except KeyError as e:
-                        logging.error(f"KeyError in commit data for PR #{pr['number']}: {e}")
-                        logging.debug(f"Commit data: {commit}")
-                    except ValueError as e:
-                        logging.error(f"ValueError in parsing commit date for PR #{pr['number']}: {e}")
-                        logging.debug(f"Commit data: {commit}")
-                
-                if 'next' not in requests.utils.parse_header_links(commits_headers.get('Link', '')):
+    try:
+        page = 1
+        reached_since = False
+        complete = True
+        if resumed and resumed["phase"] == "pulls":
+            page = resumed["page"] + 1
+            pr_params['page'] = page
+        elif resumed:
+            reached_since = True
+        while not reached_since:
+            logging.info(f"Fetching pull requests page {page}")
+            prs, pr_headers = fetch_data(pr_url, params=pr_params, projection=PULL)
+            if not prs:
+                complete = complete and prs is not None
+                break
+            page_futures = []
+        
+            for pr in prs:
+                pr_updated_at = datetime.strptime(pr.updated_at, "%Y-%m-%dT%H:%M:%SZ")
+
+                # PRs come most recently updated first, and a PR cannot have been created,
+                # closed or committed to after its last update, so the rest are out of range
+                if pr_updated_at < since:
+                    logging.info(f"PR #{pr.number} last updated before {since}. Stopping pagination.")
+                    reached_since = True
                     break
-                commits_page += 1
-                time.sleep(0.1)  # Reduced delay between commit requests
-            
-            logging.info(f"Processed PR #{pr['number']}. Commits in this PR: {pr_commit_count}. Total commits so far: {stats['pr_commits']}")
-            logging.info(f"Processed PR #{pr['number']}. Current commit count: {stats['pr_commits']}")
 
-        if 'next' not in requests.utils.parse_header_links(headers.get('Link', '')):
-            break
-        page += 1
-        pr_params['page'] = page
-        time.sleep(0.5)  # Reduced delay between PR page requests
+                store.add_pull(repo, pr.number, parse_date(pr.created_at), pr.updated_at,
+                               parse_date(pr.closed_at) if pr.closed_at else None)
+                page_futures.append(executor.submit(sync_pr_commits, store, repo, pr))
 
-    logging.info(f"Finished processing all pull requests. Total commits: {stats['pr_commits']}")
-
-    logging.info(f"Current stats after pull requests: {stats}")
-
-    # Fetch issues
-    issue_url = f"{api_url}/issues"
-    issue_params = {
-        "state": "all",
-        "sort": "updated",
-        "direction": "desc",
-        "per_page": 100
-    }
+            futures.extend(page_futures)
+            progress.add("pulls", page, page_futures)
+            if not has_next_page(pr_headers):
+                break
+            page += 1
+            pr_params['page'] = page
+        if complete:
+            progress.add("issues", 0, [])
+
+        # Fetch issues; `since` makes the server drop issues not updated inside the window
+        issue_url = f"{api_url}/issues"
+        issue_params = {
+            "state": "all",
+            "sort": "updated",
+            "direction": "desc",
+            "since": since.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "per_page": 100
+        }
     
-    page = 1
-    while True:
-        logging.info(f"Fetching issues page {page}")
-        issues, headers = fetch_data(issue_url, headers=headers, params=issue_params)
-        if not issues:
-            logging.warning("No issues fetched. Breaking the loop.")
-            break
+        page = 1
+        if resumed and resumed["phase"] == "issues" and resumed["page"]:
+            page = resumed["page"] + 1
+            issue_params['page'] = page
+        while True:
+            logging.info(f"Fetching issues page {page}")
+            issues, issue_headers = fetch_data(issue_url, params=issue_params, projection=ISSUE)
+            if not issues:
+                logging.warning("No issues fetched. Breaking the loop.")
+                complete = complete and issues is not None
+                break
         
-        if isinstance(issues, dict) and 'message' in issues:
-            logging.error(f"Error fetching issues: {issues['message']}")
-            break
-
-        for issue in issues:
-            if not isinstance(issue, dict):
-                logging.error(f"Unexpected issue format: {issue}")
-                continue
-
-            if "pull_request" in issue:
-                continue  # Skip pull requests
-
-            try:
-                issue_created_at = datetime.strptime(issue["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-                
-                if start_date <= issue_created_at <= end_date:
-                    stats["issues_opened"] += 1
-                
-                if issue["closed_at"]:
-                    issue_closed_at = datetime.strptime(issue["closed_at"], "%Y-%m-%dT%H:%M:%SZ")
-                    if start_date <= issue_closed_at <= end_date:
-                        stats["issues_closed"] += 1
-
-                # Fetch issue comments
-                comments_url = issue["comments_url"]
-                comments, _ = fetch_data(comments_url, headers=headers)
-                if comments:
-                    for comment in comments:
-                        comment_created_at = datetime.strptime(comment["created_at"], "%Y-%m-%dT%H:%M:%SZ")
-                        if start_date <= comment_created_at <= end_date:
-                            stats["issue_comments"] += 1
-                            stats["prCommit_and_issueReply_all"] += 1  # Count issue replies
-                time.sleep(1)  # Add a 1-second delay between comment requests
-            except KeyError as e:
-                logging.error(f"Missing key in issue data: {e}")
-            except ValueError as e:
-                logging.error(f"Error parsing date: {e}")
-
-        if headers and 'Link' in headers:
-            if 'next' not in requests.utils.parse_header_links(headers['Link']):
+            if isinstance(issues, dict) and 'message' in issues:
+                logging.error(f"Error fetching issues: {issues['message']}")
+                break
+            page_futures = []
+
+            for issue in issues:
+                if not isinstance(issue, ISSUE.record):
+                    logging.error(f"Unexpected issue format: {issue}")
+                    continue
+
+                if issue.pull_request is not None:
+                    continue  # Skip pull requests
+
+                try:
+                    store.add_issue(repo, issue.number, parse_date(issue.created_at), issue.updated_at,
+                                    parse_date(issue.closed_at) if issue.closed_at else None)
+                    page_futures.append(executor.submit(sync_issue_comments, store, repo, issue))
+                except ValueError as e:
+                    logging.error(f"Error parsing date: {e}")
+
+            futures.extend(page_futures)
+            progress.add("issues", page, page_futures)
+            if not has_next_page(issue_headers):
                 break
+            page += 1
+            issue_params['page'] = page
+
+        for future in futures:
+            complete = future.result() and complete
+        progress.advance()
+    finally:
+        # Drop queued work if the repo failed part-way through
+        if owns_executor:
+            executor.shutdown(cancel_futures=True)
         else:
-            break
-        page += 1
-        issue_params['page'] = page
-        time.sleep(0.5)  # Reduced delay between issue page requests
-
+            for future in futures:
+                future.cancel()
+
+    # Only a complete sync moves the checkpoint forward
+    if complete:
+        store.checkpoint(repo, since, synced_at)
+    else:
+        logging.warning(f"Some requests for {repo} failed. Keeping the previous checkpoint.")
+
+    # Every window and the per-day counts come from one columnar pass over the stored events
+    stats = repo_stats(store, repo, end_date, days)
+    logging.info(f"Stats for {repo}: { {key: value for key, value in stats.items() if key != 'daily'} }")
     return stats
 
-def process_repos(repos, days=30):
-    all_stats = {}
-    for repo in repos:
-        logging.info(f"Processing repository: {repo}")
-        try:
-            stats = get_github_stats(repo, days)
-            all_stats[repo] = stats
-        except Exception as e:
-            logging.error(f"Error processing {repo}: {str(e)}")
-            all_stats[repo] = {"error": str(e)}
-    return all_stats
+def collect_repo_stats(repo, days=30, concurrency=8, backend="rest", store=None, executor=None, end_date=None, resume=False):
+    """Stats for one repository, or {"error": ...} so one failing repo does not stop the others."""
+    logging.info(f"Processing repository: {repo}")
+    try:
+        if backend == "graphql":
+            return get_github_stats_graphql(repo, days, end_date=end_date, store=store, resume=resume)
+        return get_github_stats(repo, days, concurrency, end_date=end_date, store=store, executor=executor, resume=resume)
+    except Exception as e:
+        logging.error(f"Error processing {repo}: {str(e)}")
+        return {"error": str(e)}
+
+def iter_repo_stats(repos, days=30, concurrency=8, backend="rest", store=None, repo_workers=4, fair=False,
+                    end_date=None, resume=False):
+    """Yield (repo, stats) pairs as each repository finishes.
+
+    Up to repo_workers repositories are walked at once. Their commit and comment
+    requests go through one pool of `concurrency` workers and the shared rate
+    limiters, so adding repositories does not multiply the load on the API.
+    With fair=True the pool serves the repositories round-robin, so a small
+    repository is not queued behind the fan-out of a large one.
+    """
+    if not repos:
+        return
+    executor = FairExecutor(concurrency) if fair else ThreadPoolExecutor(max_workers=concurrency)
+    repo_executor = ThreadPoolExecutor(max_workers=max(1, min(repo_workers, len(repos))))
+    try:
+        futures = {}
+        for repo in repos:
+            repo_requests = executor.lane(repo) if fair else executor
+            futures[repo_executor.submit(collect_repo_stats, repo, days, concurrency, backend, store, repo_requests,
+                                         end_date, resume)] = repo
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+    finally:
+        repo_executor.shutdown(cancel_futures=True)
+        executor.shutdown(cancel_futures=True)
+
+def process_repos(repos, days=30, concurrency=8, backend="rest", store=None, repo_workers=4, fair=False):
+    return dict(iter_repo_stats(repos, days, concurrency, backend, store, repo_workers, fair))
+
+def find_unfinished_run():
+    """The most recent results file of a run that did not write its summary, or None."""
+    for path in sorted(glob.glob("github_stats_*.jsonl"), reverse=True):
+        if not os.path.exists(path[:-len(".jsonl")] + ".json"):
+            return path
+    return None
+
+def read_run(path):
+    """Parameters and finished repo stats of a results file; a torn last line is cut off."""
+    run, finished, valid = None, {}, 0
+    with open(path, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                record = json.loads(line)
+            except ValueError:
+                break
+            valid += len(line)
+            if "run" in record:
+                run = record["run"]
+            else:
+                finished[record["repo"]] = record["stats"]
+    os.truncate(path, valid)
+    return run, finished
+
+def stream_results(results_path, finished, pending_stats):
+    """Yield the repos finished by an earlier attempt, then append each new result to results_path as it arrives."""
+    yield from finished.items()
+    with open(results_path, 'a') as f:
+        for repo, stats in pending_stats:
+            f.write(json.dumps({"repo": repo, "stats": stats}) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+            yield repo, stats
 
 def generate_summary(all_stats, days):
-    summary = {
-        "total_repos": len(all_stats),
-        "successful_repos": sum(1 for stats in all_stats.values() if "error" not in stats),
-        "failed_repos": sum(1 for stats in all_stats.values() if "error" in stats),
-        "total_pr_created": sum(stats.get("pr_created", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_pr_updated": sum(stats.get("pr_updated", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_pr_closed": sum(stats.get("pr_closed", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_issues_opened": sum(stats.get("issues_opened", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_issues_closed": sum(stats.get("issues_closed", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_issue_comments": sum(stats.get("issue_comments", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_pr_commits": sum(stats.get("pr_commits", 0) for stats in all_stats.values() if "error" not in stats),
-        "total_prCommit_and_issueReply": sum(stats.get("prCommit_and_issueReply_all", 0) for stats in all_stats.values() if "error" not in stats),
+    """Summarize a dict of stats per repo, or consume (repo, stats) pairs as they arrive."""
+    items = all_stats.items() if isinstance(all_stats, dict) else all_stats
+    totals = {
+        "total_pr_created": "pr_created",
+        "total_pr_updated": "pr_updated",
+        "total_pr_closed": "pr_closed",
+        "total_issues_opened": "issues_opened",
+        "total_issues_closed": "issues_closed",
+        "total_issue_comments": "issue_comments",
+        "total_pr_commits": "pr_commits",
+        "total_prCommit_and_issueReply": "prCommit_and_issueReply_all",
     }
-
+    summary = {"total_repos": 0, "successful_repos": 0, "failed_repos": 0}
+    summary.update((total, 0) for total in totals)
+    # Totals per window when --days lists several; the top-level totals are those of the longest
+    windows = {}
+    details = {}
+
+    for repo, stats in items:
+        details[repo] = stats
+        summary["total_repos"] += 1
+        if "error" in stats:
+            summary["failed_repos"] += 1
+            continue
+        summary["successful_repos"] += 1
+        for total, key in totals.items():
+            summary[total] += stats.get(key, 0)
+        for window, window_stats in stats.get("windows", {}).items():
+            window_totals = windows.setdefault(window, dict.fromkeys(totals, 0))
+            for total, key in totals.items():
+                window_totals[total] += window_stats[key]
+        logging.info(f"Finished {repo} ({summary['total_repos']} done)")
+
+    if windows:
+        summary["windows"] = windows
     return {
         "summary": summary,
-        "details": all_stats,
+        "details": details,
         "analyzed_days": days,
         "date_generated": datetime.utcnow().isoformat()
     }
 
-def main(repos, days):
+def parse_days(value):
+    """`30` or `7,30,90`; a list asks for every window plus per-day counts."""
+    days = [int(day) for day in value.split(',') if day.strip()]
+    if not days or min(days) <= 0:
+        raise argparse.ArgumentTypeError(f"expected positive day counts, got {value!r}")
+    return days if ',' in value else days[0]
+
+def main(repos, days, concurrency=8, backend="rest", store=None, repo_workers=4, fair=False, resume=None, export=None):
     try:
-        all_stats = process_repos(repos, days)
-        summary = generate_summary(all_stats, days)
+        if resume:
+            results_path = find_unfinished_run() if resume == "latest" else resume
+            if not results_path or not os.path.exists(results_path):
+                logging.error("No interrupted run to resume.")
+                return
+            run, finished = read_run(results_path)
+            # The original parameters and end date keep the resumed numbers consistent
+            repos, days, backend = run["repos"], run["days"], run["backend"]
+            end_date = datetime.strptime(run["end_date"], "%Y-%m-%dT%H:%M:%SZ")
+            if store is None and run.get("store"):
+                store = EventStore(run["store"])
+            finished = {repo: stats for repo, stats in finished.items() if "error" not in stats}
+            logging.info(f"Resuming {results_path}: {len(finished)} of {len(repos)} repositories already done")
+        else:
+            results_path = f"github_stats_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.jsonl"
+            end_date = datetime.utcnow()
+            finished = {}
+            with open(results_path, 'w') as f:
+                f.write(json.dumps({"run": {"repos": repos, "days": days, "backend": backend,
+                                            "end_date": end_date.strftime("%Y-%m-%dT%H:%M:%SZ"),
+                                            "store": store.path if store else None}}) + "\n")
+        output_file = results_path[:-len(".jsonl")] + ".json"
+
+        # Without --store, events go to a store kept next to the results until the run completes,
+        # so that an interrupted repository resumes from its last stored page
+        run_store_path = None
+        if store is None:
+            run_store_path = results_path[:-len(".jsonl")] + ".sqlite3"
+            store = EventStore(run_store_path)
+
+        pending = [repo for repo in repos if repo not in finished]
+        # Repositories are summarized and written out as they finish rather than after the slowest one
+        stats = iter_repo_stats(pending, days, concurrency, backend, store, repo_workers, fair,
+                                end_date=end_date, resume=bool(resume))
+        summary = generate_summary(stream_results(results_path, finished, stats), days)
+        # Requests, remaining budget and sleep of each token of GITHUB_TOKENS
+        summary["summary"]["tokens"] = token_stats()
 
         # Print a brief summary to console
         print("\nSummary:")
@@ -309,6 +538,14 @@ def main(repos, days):
         print(f"Total Issues Opened: {summary['summary']['total_issues_opened']}")
         print(f"Total Issues Closed: {summary['summary']['total_issues_closed']}")
         print(f"Total Pull Request Commits: {summary['summary']['total_pr_commits']}")
+        for window, totals in summary['summary'].get('windows', {}).items():
+            print(f"Last {window} days: {totals['total_pr_created']} PRs created, {totals['total_pr_commits']} PR commits, "
+                  f"{totals['total_issues_opened']} issues opened, {totals['total_issue_comments']} issue comments")
+        cache = http_cache.get_cache()
+        if cache:
+            print(f"Cached responses revalidated (304): {cache.hits}, fetched: {cache.misses}")
+        print(token_report())
+        print(telemetry.get_telemetry().report())
 
         # Print detailed metrics for each repository
         print("\nDetailed Metrics per Repository:")
@@ -325,23 +562,66 @@ def main(repos, days):
                 print(f"  Issue Comments: {stats['issue_comments']}")
                 print(f"  Pull Request Commits: {stats['pr_commits']}")
                 print(f"  PR Commits and Issue Replies: {stats['prCommit_and_issueReply_all']}")
+                for window, window_stats in stats.get('windows', {}).items():
+                    print(f"  Last {window} days: {window_stats['pr_created']} PRs created, {window_stats['pr_commits']} PR commits, "
+                          f"{window_stats['issues_opened']} issues opened, {window_stats['issue_comments']} issue comments")
 
-        # Save detailed results to a JSON file
-        output_file = f"github_stats_{datetime.utcnow().strftime('%Y%m%d_%H%M%S')}.json"
+        # Save detailed results to a JSON file; its presence marks the run as finished
         with open(output_file, 'w') as f:
             json.dump(summary, f, indent=2)
         print(f"\nDetailed results saved to {output_file}")
+        if export:
+            rows = event_columns.export_daily(export, summary['details'])
+            print(f"Daily counts ({rows} rows) exported to {export}")
+        if run_store_path:
+            store.close()
+            os.remove(run_store_path)
 
     except Exception as e:
         logging.exception(f"An error occurred: {str(e)}")
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="GitHub Repository Statistics")
-    parser.add_argument("repos", help="Comma-separated list of GitHub repositories (format: owner/repo,owner/repo)")
-    parser.add_argument("--days", type=int, default=30, help="Number of days to analyze (default 30)")
+    parser.add_argument("repos", nargs="?", help="Comma-separated list of GitHub repositories (format: owner/repo,owner/repo)")
+    parser.add_argument("--days", type=parse_days, default=30,
+                        help="Number of days to analyze, or a comma-separated list such as 7,30,90 answered by one fetch (default 30)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Number of concurrent commit/comment requests (default 8, 1 = sequential)")
+    parser.add_argument("--backend", choices=["rest", "graphql"], default="rest", help="API used to collect the statistics (default rest)")
+    parser.add_argument("--cache-dir", default=http_cache.DEFAULT_CACHE_DIR, help=f"Directory of the HTTP response cache (default {http_cache.DEFAULT_CACHE_DIR})")
+    parser.add_argument("--no-cache", action="store_true", help="Do not cache or revalidate responses")
+    parser.add_argument("--store", help="SQLite event store; later runs only fetch activity since the last run")
+    parser.add_argument("--repo-workers", type=int, default=4, help="Number of repositories processed at once (default 4)")
+    parser.add_argument("--fair", action="store_true", help="Share request workers round-robin between repositories")
+    parser.add_argument("--pool-size", type=int, help="Keep-alive connections kept open (default the larger of 16 and --concurrency)")
+    parser.add_argument("--http2", action="store_true", help="Multiplex requests over HTTP/2 (needs httpx[http2])")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RESULTS",
+                        help="Continue an interrupted run (default the latest github_stats_*.jsonl without a summary)")
+    parser.add_argument("--export", metavar="PATH", help="Write daily counts per repository as Parquet (.parquet) or Arrow IPC (other names); needs pyarrow")
+    parser.add_argument("--metrics", help="Write request telemetry as a JSON summary to this file")
+    parser.add_argument("--prometheus", help="Write request telemetry in the Prometheus text format to this file")
+    parser.add_argument("--trace", help="Write a Chrome trace of every request, decode and limiter sleep to this file")
+    parser.add_argument("--record", metavar="CASSETTE", help="Record the API traffic for replay_github.py (gzipped JSON Lines, see cassette.py)")
     args = parser.parse_args()
-
-    repos = [repo.strip() for repo in args.repos.split(',')]
+    if not args.repos and not args.resume:
+        parser.error("the list of repositories is required unless --resume is given")
+    if args.export and event_columns.pyarrow is None:
+        parser.error("--export needs pyarrow (pip install pyarrow)")
+    if args.export and not isinstance(args.days, list):
+        # The daily counts come with the list form
+        args.days = [args.days]
+
+    http_cache.configure(None if args.no_cache else args.cache_dir)
+    github_client.configure(pool_size=args.pool_size or max(github_client.DEFAULT_POOL_SIZE, args.concurrency),
+                            http2=args.http2)
+    telemetry.configure(trace=bool(args.trace), by_repo=True)
+    store = EventStore(args.store) if args.store else None
+
+    repos = [repo.strip() for repo in args.repos.split(',')] if args.repos else []
     days = args.days
 
-    main(repos, days)
+    cassette.configure(args.record, GITHUB_API_URL)
+    try:
+        main(repos, days, args.concurrency, args.backend, store, args.repo_workers, args.fair, args.resume, args.export)
+    finally:
+        cassette.close()
+    telemetry.get_telemetry().write(args.metrics, args.prometheus, args.trace)
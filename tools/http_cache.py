@@ -0,0 +1,170 @@
+"""
+Description: Persistent HTTP response cache with ETag/Last-Modified revalidation for the GitHub tools.
+
+Responses are stored in SQLite, keyed by URL + query parameters. Every later request for the same key
+is sent as a conditional request (If-None-Match / If-Modified-Since). GitHub answers unchanged
+resources with 304 Not Modified, which does not count against the rate limit, and the stored body is
+served instead. Cached data is therefore never stale, and warm reruns cost almost no rate-limit
+budget. Entries not revalidated within max_age, and the least recently used entries beyond max_bytes,
+are evicted.
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import urlencode
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "intelli-ops-tools")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 30 * 24 * 3600
+
+# Headers worth replaying with a cached body; the rate-limit headers always come from the live reply
+STORED_HEADERS = ('Content-Type', 'ETag', 'Last-Modified', 'Link')
+
+
+class ResponseCache:
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, "responses.sqlite3")
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._stores = 0
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                validated_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )""")
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed_at)")
+        self._db.commit()
+        self.evict()
+
+    @staticmethod
+    def key(url, params=None):
+        if not params:
+            return url
+        separator = '&' if '?' in url else '?'
+        return url + separator + urlencode(sorted((k, str(v)) for k, v in params.items()))
+
+    def lookup(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT headers, body FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return json.loads(row[0]), row[1]
+
+    def store(self, key, response):
+        headers = {name: response.headers[name] for name in STORED_HEADERS if name in response.headers}
+        body = response.content
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, headers, body, size, validated_at, accessed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(headers), body, len(body), now, now))
+            self._db.commit()
+            self._stores += 1
+            evict = self._stores % 500 == 0
+        if evict:
+            self.evict()
+
+    def touch(self, key):
+        now = time.time()
+        with self._lock:
+            self._db.execute("UPDATE responses SET validated_at = ?, accessed_at = ? WHERE key = ?", (now, now, key))
+            self._db.commit()
+
+    def evict(self):
+        """Drop entries older than max_age, then least recently used ones until under max_bytes."""
+        with self._lock:
+            self._db.execute("DELETE FROM responses WHERE validated_at < ?", (time.time() - self.max_age,))
+            total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+                doomed = []
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    doomed.append((key,))
+                    total -= size
+                self._db.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            self._db.commit()
+
+    def get(self, url, params=None, headers=None, send=requests.get, **kwargs):
+        """Send a conditional GET through `send` and serve the stored body on 304."""
+        key = self.key(url, params)
+        cached = self.lookup(key)
+        headers = dict(headers or {})
+        if cached is not None:
+            cached_headers, _ = cached
+            if 'ETag' in cached_headers:
+                headers['If-None-Match'] = cached_headers['ETag']
+            if 'Last-Modified' in cached_headers:
+                headers['If-Modified-Since'] = cached_headers['Last-Modified']
+
+        response = send(url, params=params, headers=headers, **kwargs)
+
+        if response.status_code == 304 and cached is not None:
+            self.hits += 1
+            self.touch(key)
+            return self._replay(response, *cached)
+        self.misses += 1
+        if response.status_code == 200 and ('ETag' in response.headers or 'Last-Modified' in response.headers):
+            self.store(key, response)
+        return response
+
+    @staticmethod
+    def _replay(not_modified, cached_headers, body):
+        response = requests.models.Response()
+        response.status_code = 200
+        response.reason = "OK (cached)"
+        response.url = not_modified.url
+        response.request = not_modified.request
+        response.encoding = 'utf-8'
+        response._content = body
+        # Keep the live rate-limit headers so the limiter still sees the current budget
+        response.headers = CaseInsensitiveDict(not_modified.headers)
+        response.headers.update(cached_headers)
+        return response
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache = None
+
+
+def configure(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES, max_age=DEFAULT_MAX_AGE):
+    """Enable the shared cache in `cache_dir`, or disable it when cache_dir is None."""
+    global _cache
+    if _cache is not None:
+        _cache.close()
+    _cache = ResponseCache(cache_dir, max_bytes, max_age) if cache_dir else None
+    if _cache is not None:
+        logging.info(f"Using HTTP response cache at {_cache.path}")
+    return _cache
+
+
+def get_cache():
+    return _cache
+
+
+def cached_get(url, params=None, headers=None, send=requests.get, **kwargs):
+    """GET through the shared cache when one is configured, plainly otherwise."""
+    cache = _cache
+    if cache is None:
+        return send(url, params=params, headers=headers, **kwargs)
+    return cache.get(url, params=params, headers=headers, send=send, **kwargs)
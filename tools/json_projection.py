@@ -0,0 +1,85 @@
+"""
+Description: Field-projecting JSON decoding of list pages for github_stats.py.
+
+A 100-item PR or issue page is hundreds of KB of JSON. Each item carries user objects, label
+arrays, links and (for PRs) the full head and base repositories, while github_stats.py reads only
+a handful of fields per item. response.json() builds all of it as nested dicts, and the items stay
+alive while their commit and comment requests wait in the worker queue.
+
+A Projection names the fields a caller needs ("created_at", "commit.committer.date", ...). decode()
+walks the top-level array one element at a time with the C scanner of the json module. It keeps
+only those fields in a small __slots__ record (a namedtuple) and drops the element before decoding
+the next. The page text itself stays in memory until decode() returns; what is saved is the nested
+dicts of the other elements, so at most one element is decoded in full at a time and what stays
+queued is a few strings per item. Fields that are missing or null come out as None. A body that is
+not an array, such as an error message, is returned as decoded.
+
+Usage:
+PULL = Projection("Pull", ["number", "created_at", "commit.committer.date"])
+pulls = PULL.decode(response.content)  # [Pull(number=..., created_at=..., commit_committer_date=...)]
+"""
+
+import json
+import re
+from collections import namedtuple
+
+WHITESPACE = re.compile(r'[ \t\n\r]*')
+
+_decoder = json.JSONDecoder()
+
+
+class Projection:
+    def __init__(self, name, fields):
+        """`fields` are dotted paths; the record attribute of "a.b" is a_b."""
+        self.fields = list(fields)
+        self._paths = [tuple(field.split('.')) for field in self.fields]
+        self._flat = all(len(path) == 1 for path in self._paths)
+        # namedtuples have __slots__ = () and are built in C by _make, several times faster than
+        # assigning the slots of a regular class one by one
+        self.record = namedtuple(name, [field.replace('.', '_') for field in self.fields])
+        self._make = self.record._make
+
+    def project(self, item):
+        """The record of one decoded item; anything but an object is returned as is."""
+        if not isinstance(item, dict):
+            return item
+        if self._flat:
+            return self._make([item.get(key) for key, in self._paths])
+        values = []
+        for path in self._paths:
+            value = item.get(path[0])
+            for key in path[1:]:
+                value = value.get(key) if isinstance(value, dict) else None
+            values.append(value)
+        return self._make(values)
+
+    def project_all(self, data):
+        """Records of an already decoded page, e.g. one replayed from a fixture."""
+        return [self.project(item) for item in data] if isinstance(data, list) else data
+
+    def decode(self, body):
+        """Records of a JSON array (str or UTF-8 bytes), decoded one element at a time."""
+        text = body.decode('utf-8') if isinstance(body, (bytes, bytearray)) else body
+        index = WHITESPACE.match(text).end()
+        if not text.startswith('[', index):
+            return json.loads(text)
+        records = []
+        index = WHITESPACE.match(text, index + 1).end()
+        if text.startswith(']', index):
+            return self._end(text, index, records)
+        while True:
+            item, index = _decoder.raw_decode(text, index)
+            records.append(self.project(item))
+            index = WHITESPACE.match(text, index).end()
+            if text.startswith(']', index):
+                return self._end(text, index, records)
+            if not text.startswith(',', index):
+                raise json.JSONDecodeError("Expecting ',' delimiter", text, index)
+            index = WHITESPACE.match(text, index + 1).end()
+
+    @staticmethod
+    def _end(text, index, records):
+        index = WHITESPACE.match(text, index + 1).end()
+        if index != len(text):
+            raise json.JSONDecodeError("Extra data", text, index)
+        return records
@@ -0,0 +1,267 @@
+"""
+Description: Token-bucket scheduler shared by the GitHub tools (github_stats.py, action_usage.py).
+
+Each GitHub rate-limit resource (core REST, search, GraphQL) gets one bucket per token that every
+caller draws from. The bucket refills at remaining / seconds-until-reset, as read from the
+X-RateLimit-* headers of each response, so requests are spread evenly over the reset window
+instead of burning the budget early and stalling for the rest of the hour. Retry-After and
+403/429 rate-limit replies pause the token's bucket.
+
+With several tokens (GITHUB_TOKENS, see github_client.py) each request goes to the token with the
+most remaining budget that may send right away, and callers only sleep once every token is spent
+or paused. acquire() returns the token to send the request with.
+"""
+
+import logging
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+import github_client
+import telemetry
+
+# Default budgets until the first response tells us the real numbers
+# https://docs.github.com/en/rest/using-the-rest-api/rate-limits-for-the-rest-api
+DEFAULT_LIMITS = {
+    "core": (5000, 3600),
+    "search": (10, 60),  # code search is the strictest search budget
+    "graphql": (5000, 3600),
+}
+
+# Waits longer than this are shown with a countdown instead of sleeping silently
+PROGRESS_THRESHOLD = 10
+
+
+def sleep_with_progress(sleep_time):
+    for i in range(int(sleep_time)):
+        remaining_time = max(sleep_time - i, 0)  # Ensure remaining time is never negative
+        sys.stdout.write(f"\rSleeping: {remaining_time:.1f} seconds remaining")
+        sys.stdout.flush()
+        time.sleep(1)
+    time.sleep(sleep_time - int(sleep_time))
+    sys.stdout.write("\rResuming fetching data...                 \n")
+    sys.stdout.flush()
+
+
+class RateLimiter:
+    """Token bucket for one GitHub rate-limit resource.
+
+    burst_ratio is the fraction of the remaining budget that may be spent back to back,
+    so short runs are not paced at all while long runs settle at the even rate.
+    """
+
+    def __init__(self, name, limit, window, burst_ratio=0.1):
+        self.name = name
+        self.burst_ratio = burst_ratio
+        self.rate = limit / window
+        self.capacity = max(1.0, limit * burst_ratio)
+        self.tokens = self.capacity
+        self.remaining = limit
+        self.reset_time = time.time() + window
+        self.blocked_until = 0.0
+        # After a pause one request may go through to learn the new budget
+        self.probe = False
+        self.updated = time.monotonic()
+        self.requests = 0
+        self.slept = 0.0
+        self._lock = threading.Lock()
+        # Held by the one thread showing a countdown so the others don't print over it
+        self._pause_lock = threading.Lock()
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_acquire(self):
+        """Take a request slot without blocking: None if taken, else (seconds to wait, reason)."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now >= self.blocked_until and (self.tokens >= 1 or self.probe):
+                if self.probe:
+                    self.probe = False
+                else:
+                    self.tokens -= 1
+                self.requests += 1
+                return None
+            wait = max(self.blocked_until - now, (1 - self.tokens) / self.rate)
+            # Paused after a rate-limit reply or an exhausted budget, or just waiting for a token
+            return wait, "backoff" if now < self.blocked_until else "pacing"
+
+    def wait(self, seconds, reason):
+        """Sleep until the bucket may have a slot again, recording the sleep under `reason`."""
+        start = time.perf_counter()
+        self._sleep(seconds)
+        telemetry.record_sleep(self.name, reason, start)
+
+    def _sleep(self, wait):
+        if wait < PROGRESS_THRESHOLD:
+            time.sleep(wait)
+            with self._lock:
+                self.slept += wait
+            return
+        if not self._pause_lock.acquire(blocking=False):
+            # Someone else is already counting down; wait for them to finish
+            with self._pause_lock:
+                return
+        try:
+            logging.warning(f"{self.name} rate limit exhausted. Sleeping for {wait:.2f} seconds.")
+            sleep_with_progress(wait)
+            with self._lock:
+                self.slept += wait
+        finally:
+            self._pause_lock.release()
+
+    def update(self, headers):
+        """Re-derive the refill rate from a response's X-RateLimit-* headers."""
+        if not headers or 'X-RateLimit-Remaining' not in headers:
+            return
+        try:
+            remaining = int(headers['X-RateLimit-Remaining'])
+            reset_time = int(headers.get('X-RateLimit-Reset', 0))
+        except ValueError:
+            return
+        with self._lock:
+            # Concurrent responses can arrive out of order; never trust an older, higher count
+            if reset_time == self.reset_time and remaining > self.remaining:
+                return
+            new_window = reset_time > self.reset_time
+            self.remaining = remaining
+            self.reset_time = reset_time
+            now = time.monotonic()
+            self._refill(now)
+            window = max(reset_time - time.time(), 1)
+            if remaining <= 0:
+                self.tokens = 0
+                self.probe = True
+                self.blocked_until = max(self.blocked_until, now + window + 1)
+                return
+            self.rate = remaining / window
+            self.capacity = max(1.0, remaining * self.burst_ratio)
+            if new_window:
+                self.tokens = self.capacity
+            self.tokens = min(self.tokens, self.capacity, remaining)
+
+    def backoff(self, headers, default):
+        """Pause the bucket after a 403/429 rate-limit reply."""
+        retry_after = (headers or {}).get('Retry-After')
+        if retry_after is not None:
+            delay = float(retry_after)
+        elif (headers or {}).get('X-RateLimit-Remaining') == '0':
+            delay = max(int(headers.get('X-RateLimit-Reset', 0)) - time.time(), 0) + default
+        else:
+            delay = default
+        self.pause(delay)
+        return delay
+
+    def pause(self, seconds):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = 0
+            self.probe = True
+            self.updated = now
+            self.blocked_until = max(self.blocked_until, now + seconds)
+
+
+class TokenPool:
+    """The buckets of one rate-limit resource, one per token; a single token is just its bucket."""
+
+    def __init__(self, name, tokens, limit, window):
+        self.name = name
+        self.limiters = {token: RateLimiter(name, limit, window) for token in tokens}
+
+    @property
+    def requests(self):
+        return sum(limiter.requests for limiter in self.limiters.values())
+
+    @property
+    def slept(self):
+        return sum(limiter.slept for limiter in self.limiters.values())
+
+    def acquire(self):
+        """Block until some token may send a request, and return that token."""
+        while True:
+            waits = []
+            # Most headroom first, so the budgets drain evenly
+            for token, limiter in sorted(self.limiters.items(), key=lambda item: item[1].remaining, reverse=True):
+                wait = limiter.try_acquire()
+                if wait is None:
+                    return token
+                waits.append((wait, limiter))
+            (wait, reason), limiter = min(waits, key=lambda item: item[0][0])
+            limiter.wait(wait, reason)
+
+    def update(self, headers, token):
+        self.limiters[token].update(headers)
+
+    def backoff(self, headers, default, token):
+        """Pause the token after a 403/429 rate-limit reply; the others keep sending."""
+        return self.limiters[token].backoff(headers, default)
+
+    def pause(self, seconds, token=None):
+        """Pause one token, or all of them."""
+        for limiter in [self.limiters[token]] if token in self.limiters else self.limiters.values():
+            limiter.pause(seconds)
+
+    def stats(self):
+        """Per-token requests, last known remaining budget and seconds slept."""
+        return {mask(token, index): {"requests": limiter.requests, "remaining": limiter.remaining,
+                                     "slept": round(limiter.slept, 3)}
+                for index, (token, limiter) in enumerate(self.limiters.items())}
+
+
+def mask(token, index=0):
+    """A token as shown in logs and summaries: its position in the pool and last four characters."""
+    return f"#{index + 1} ...{token[-4:]}" if token else "default"
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(resource):
+    with _limiters_lock:
+        if resource not in _limiters:
+            limit, window = DEFAULT_LIMITS.get(resource, DEFAULT_LIMITS["core"])
+            # None sends with the client's default credentials
+            _limiters[resource] = TokenPool(resource, github_client.tokens() or [None], limit, window)
+        return _limiters[resource]
+
+
+def token_stats():
+    """{token: {resource: stats}} of every resource used in this run."""
+    with _limiters_lock:
+        pools = dict(_limiters)
+    stats = {}
+    for resource, pool in sorted(pools.items()):
+        for token, token_stats in pool.stats().items():
+            stats.setdefault(token, {})[resource] = token_stats
+    return stats
+
+
+def limiter_for_url(url):
+    path = urlparse(url).path
+    if '/search/' in path:
+        return get_limiter("search")
+    if path.endswith('/graphql'):
+        return get_limiter("graphql")
+    return get_limiter("core")
+
+
+def is_rate_limited(response):
+    """True for the 403/429 replies GitHub uses for primary and secondary rate limits."""
+    if response.status_code not in (403, 429):
+        return False
+    text = response.text.lower()
+    return response.status_code == 429 or 'rate limit' in text or 'abuse detection' in text
+
+
+def token_report():
+    """Console lines of token_stats()."""
+    lines = ["Token usage:"]
+    for token, resources in token_stats().items():
+        usage = ", ".join(f"{resource} {stats['requests']} requests ({stats['remaining']} left, slept {stats['slept']:.1f}s)"
+                          for resource, stats in resources.items())
+        lines.append(f"  {token}: {usage}")
+    return "\n".join(lines)
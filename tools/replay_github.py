@@ -0,0 +1,264 @@
+"""
+Description: Local GitHub API that replays a recorded cassette (see cassette.py) under controlled conditions.
+
+Every request is answered with the reply recorded for it: same status, body, ETag and Link header.
+Requests recorded more than once get their replies in recorded order, and the last one repeats.
+Recorded URLs in bodies and Link headers point at the replay server. Conditional requests that
+match the recorded ETag get a free 304. The traffic conditions are set here instead of coming from
+the network of the recording:
+
+- latency per request, fixed (--latency) or as recorded (--recorded-latency), plus uniform jitter
+- per-token rate limits like fake_github.py, with X-RateLimit-* headers of the replay budget and
+  403 "rate limit exceeded" replies once a budget is spent
+- injected 403 replies with Retry-After: primary rate limit (--rate-limit-errors) and
+  abuse detection / secondary limit (--abuse-errors)
+
+Jitter and injected errors are drawn per request from a generator seeded with --seed, the request
+key and its attempt number, so every run sees the same conditions whatever the thread interleaving.
+
+Requests missing from the cassette are answered with 404 and counted as misses. GET /_stats returns
+the counters.
+
+Usage:
+python replay_github.py <cassette.jsonl.gz> [--port 8000] [--latency 0.05] [--jitter 0.02] [--recorded-latency]
+    [--core-limit 5000] [--window 3600] [--search-limit 30] [--search-window 60]
+    [--rate-limit-errors 0.01] [--abuse-errors 0.01] [--retry-after 1] [--seed 0]
+
+Sample:
+GITHUB_API_URL=https://api.github.com python github_stats.py aws/aws-cdk --days 30 --no-cache --record cdk.jsonl.gz
+python replay_github.py cdk.jsonl.gz --port 8000 --latency 0.05 --jitter 0.03 &
+GITHUB_API_URL=http://127.0.0.1:8000 GITHUB_TOKEN=fake python github_stats.py aws/aws-cdk --days 30 --no-cache
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+import cassette
+from fake_github import Budget, FakeGitHubHandler, start_server
+
+RATE_LIMIT_MESSAGE = "API rate limit exceeded for user."
+ABUSE_MESSAGE = "You have triggered an abuse detection mechanism. Please wait a few minutes before you try again."
+
+
+def resource_of(interaction):
+    recorded = interaction["response_headers"].get("X-RateLimit-Resource")
+    if recorded in ("core", "search", "graphql"):
+        return recorded
+    path = urlsplit(interaction["path"]).path
+    if path.startswith("/search/"):
+        return "search"
+    return "graphql" if path.endswith("/graphql") else "core"
+
+
+def replayable(interaction):
+    """Only real answers are replayed; rate-limit replies, 304s and server errors come from the replay conditions."""
+    status = interaction["status"]
+    if status == 304 or status >= 500:
+        return False
+    if status in (403, 429):
+        text = (interaction["body"] or "").lower()
+        return not ("rate limit" in text or "abuse detection" in text)
+    return True
+
+
+class ReplayGitHub:
+    def __init__(self, cassette_path, core_limit=5000, window=3600, search_limit=30, search_window=60,
+                 latency=0.0, jitter=0.0, recorded_latency=False, rate_limit_errors=0.0, abuse_errors=0.0,
+                 retry_after=1, seed=0):
+        header, interactions = cassette.load(cassette_path)
+        parts = urlsplit(header["base_url"])
+        self.recorded_origin = f"{parts.scheme}://{parts.netloc}"
+        self.replies = defaultdict(list)
+        for interaction in interactions:
+            if replayable(interaction):
+                self.replies[cassette.key(interaction["method"], interaction["path"], interaction["request"])].append(interaction)
+        self.served = defaultdict(int)
+        self.limits = {"core": (core_limit, window), "search": (search_limit, search_window),
+                       "graphql": (core_limit, window)}
+        self.latency = latency
+        self.jitter = jitter
+        self.recorded_latency = recorded_latency
+        self.rate_limit_errors = rate_limit_errors
+        self.abuse_errors = abuse_errors
+        self.retry_after = retry_after
+        self.seed = seed
+        self.attempts = defaultdict(int)
+        self.budgets = {}
+        self.counters = {"requests": 0, "served": 0, "not_modified": 0, "misses": 0, "rate_limited": 0,
+                         "injected_rate_limit": 0, "injected_abuse": 0, "connections": 0, "bytes_sent": 0}
+        self.lock = threading.Lock()
+        self.base_url = None
+
+    def stats(self):
+        with self.lock:
+            return dict(self.counters)
+
+    def budget(self, token, resource):
+        key = (token, resource)
+        if key not in self.budgets:
+            self.budgets[key] = Budget(*self.limits[resource])
+        return self.budgets[key]
+
+    def next_reply(self, key):
+        """The recorded reply due for `key`, or None; it stays due until answered (see respond)."""
+        with self.lock:
+            replies = self.replies.get(key)
+            if not replies:
+                return None
+            return replies[min(self.served[key], len(replies) - 1)]
+
+    def conditions(self, key):
+        """The generator of the jitter and injected error of this attempt at `key`."""
+        with self.lock:
+            attempt = self.attempts[key]
+            self.attempts[key] += 1
+        return random.Random(f"{self.seed} {key} {attempt}")
+
+    def delay(self, interaction, rng):
+        seconds = interaction["elapsed"] if self.recorded_latency else self.latency
+        if self.jitter:
+            seconds += rng.uniform(-self.jitter, self.jitter)
+        return max(seconds, 0.0)
+
+    def draw(self, rng):
+        """The error injected into this request: "rate_limit", "abuse" or None."""
+        value = rng.random()
+        if value < self.rate_limit_errors:
+            return "rate_limit"
+        if value < self.rate_limit_errors + self.abuse_errors:
+            return "abuse"
+        return None
+
+    def rewrite(self, text):
+        # Recorded URLs (commits_url, Link, ...) point at the recorded host
+        return text.replace(self.recorded_origin, self.base_url) if text else text
+
+    def respond(self, method, path, token, request_headers, request=None):
+        """(status, body text, headers) of one request."""
+        with self.lock:
+            self.counters["requests"] += 1
+        key = cassette.key(method, path, request)
+        interaction = self.next_reply(key)
+        if interaction is None:
+            with self.lock:
+                self.counters["misses"] += 1
+            return 404, json.dumps({"message": "Not Found"}), {}
+        rng = self.conditions(key)
+        time.sleep(self.delay(interaction, rng))
+        resource = resource_of(interaction)
+        injected = self.draw(rng)
+        with self.lock:
+            budget = self.budget(token, resource)
+            if injected:
+                self.counters[f"injected_{injected}"] += 1
+                headers = budget.headers(resource)
+                headers["Retry-After"] = str(self.retry_after)
+                message = RATE_LIMIT_MESSAGE if injected == "rate_limit" else ABUSE_MESSAGE
+                return 403, json.dumps({"message": message}), headers
+            recorded = interaction["response_headers"]
+            etag = recorded.get("ETag")
+            if etag and request_headers.get("If-None-Match") == etag:
+                # Conditional requests answered with 304 are free, as on GitHub
+                self.counters["not_modified"] += 1
+                self.served[key] += 1
+                headers = budget.headers(resource)
+                headers["ETag"] = etag
+                return 304, None, headers
+            if not budget.take():
+                self.counters["rate_limited"] += 1
+                return 403, json.dumps({"message": RATE_LIMIT_MESSAGE}), budget.headers(resource)
+            self.counters["served"] += 1
+            self.served[key] += 1
+            headers = {name: value for name, value in recorded.items()
+                       if not name.startswith("X-RateLimit-") and name != "Content-Type"}
+            headers.update(budget.headers(resource))
+        if "Link" in headers:
+            headers["Link"] = self.rewrite(headers["Link"])
+        return interaction["status"], self.rewrite(interaction["body"]), headers
+
+
+class ReplayHandler(FakeGitHubHandler):
+    def do_GET(self):
+        if urlsplit(self.path).path == "/_stats":
+            return self.reply(200, json.dumps(self.fake.stats()), {})
+        self.reply(*self.fake.respond("GET", self.path, self.token(), self.headers))
+
+    def do_POST(self):
+        # Read the body first so a kept-alive connection stays in sync
+        payload = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        try:
+            request = cassette.request_digest(json.loads(payload)) if payload else None
+        except ValueError:
+            return self.reply(400, json.dumps({"message": "Problems parsing JSON"}), {})
+        self.reply(*self.fake.respond("POST", self.path, self.token(), self.headers, request))
+
+    def reply(self, status, text, headers):
+        payload = text.encode("utf-8") if text is not None else b""
+        gzipped = len(payload) > 1024 and "gzip" in self.headers.get("Accept-Encoding", "")
+        if gzipped:
+            payload = gzip.compress(payload, compresslevel=5)
+        with self.fake.lock:
+            self.fake.counters["bytes_sent"] += len(payload)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        logging.debug("replay_github: " + format, *args)
+
+
+def start_replay(replay, host="127.0.0.1", port=0):
+    """Serve `replay` from a background thread; returns (server, base_url)."""
+    return start_server(replay, host=host, port=port, handler_class=ReplayHandler)
+
+
+def add_condition_arguments(parser):
+    """The replay conditions, shared with bench_tools.py."""
+    parser.add_argument("--latency", type=float, default=0.0, help="Added latency per request in seconds (default 0)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Uniform +/- jitter on the latency in seconds (default 0)")
+    parser.add_argument("--recorded-latency", action="store_true", help="Use the latency of each recorded request instead of --latency")
+    parser.add_argument("--core-limit", type=int, default=5000, help="Core and GraphQL requests per window and token (default 5000)")
+    parser.add_argument("--window", type=int, default=3600, help="Core rate-limit window in seconds (default 3600)")
+    parser.add_argument("--search-limit", type=int, default=30, help="Search requests per window and token (default 30)")
+    parser.add_argument("--search-window", type=int, default=60, help="Search rate-limit window in seconds (default 60)")
+    parser.add_argument("--rate-limit-errors", type=float, default=0.0, help="Share of requests answered with an injected 403 rate-limit reply")
+    parser.add_argument("--abuse-errors", type=float, default=0.0, help="Share of requests answered with an injected 403 abuse-detection reply")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds of injected replies (default 1)")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the jitter and error injection (default 0)")
+
+
+def replay_from_args(path, args):
+    return ReplayGitHub(path, core_limit=args.core_limit, window=args.window, search_limit=args.search_limit,
+                        search_window=args.search_window, latency=args.latency, jitter=args.jitter,
+                        recorded_latency=args.recorded_latency, rate_limit_errors=args.rate_limit_errors,
+                        abuse_errors=args.abuse_errors, retry_after=args.retry_after, seed=args.seed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay a recorded cassette as a local GitHub API")
+    parser.add_argument("cassette", help="Cassette written with --record (see cassette.py)")
+    parser.add_argument("--port", type=int, default=8000, help="Port to listen on (default 8000)")
+    add_condition_arguments(parser)
+    args = parser.parse_args()
+
+    replay = replay_from_args(args.cassette, args)
+    server, base_url = start_replay(replay, port=args.port)
+    print(f"Replaying {sum(len(replies) for replies in replay.replies.values())} recorded replies on {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+        print(json.dumps(replay.stats(), indent=2))
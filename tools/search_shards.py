@@ -0,0 +1,122 @@
+"""
+Description: Splits a GitHub code search query into shards of at most 1000 results, used by action_usage.py.
+
+The search API returns at most 1000 results per query, however large total_count is. The planner
+fetches the first page of a shard, and when its total_count is over the cap it splits the shard
+instead of paging it: first by halving the `size:` range (code search only indexes files up to
+384 KB, so 0..393216 covers everything), then, once a range is down to a single size, by file
+extension. Shards that still exceed the cap are read up to the cap and reported as truncated.
+Hits are deduplicated across shards by repository and path.
+
+The planner state is plain JSON, so action_usage.py --resume can continue a scan part-way through.
+"""
+
+import logging
+
+MAX_RESULTS = 1000
+PER_PAGE = 100
+MAX_FILE_SIZE = 384 * 1024
+EXTENSIONS = ("yml", "yaml")
+
+
+class ShardedSearch:
+    def __init__(self, query, search, state=None):
+        """`search(query, page)` returns one page of search/code results, or None on failure."""
+        self.query = query
+        self.search = search
+        state = state or {"pending": [[None, None, None]], "current": None, "seen": [],
+                          "total_count": None, "truncated": [], "shards": 0, "requests": 0}
+        # Shards are [min size, max size, extension]; None means unrestricted
+        self.pending = [list(shard) for shard in state["pending"]]
+        self.current = list(state["current"]) if state["current"] else None
+        self.seen = set(state["seen"])
+        self.total_count = state["total_count"]
+        self.truncated = list(state["truncated"])
+        self.shards = state["shards"]
+        self.requests = state["requests"]
+
+    def state(self):
+        return {"pending": [list(shard) for shard in self.pending],
+                "current": list(self.current) if self.current else None,
+                "seen": sorted(self.seen), "total_count": self.total_count,
+                "truncated": list(self.truncated), "shards": self.shards, "requests": self.requests}
+
+    def shard_query(self, shard):
+        low, high, extension = shard
+        query = self.query
+        if low is not None:
+            query += f"+size:{low}..{high}"
+        if extension is not None:
+            query += f"+extension:{extension}"
+        return query
+
+    @staticmethod
+    def split(shard):
+        """Smaller shards covering `shard`, or None if it cannot be split further."""
+        low, high, extension = shard
+        if low is None:
+            low, high = 0, MAX_FILE_SIZE
+        if low < high:
+            middle = (low + high) // 2
+            return [[low, middle, extension], [middle + 1, high, extension]]
+        if extension is None:
+            return [[low, high, other] for other in EXTENSIONS]
+        return None
+
+    def next_page(self):
+        """Return (state, new hits) for the next page, or (state, None) when the scan is done.
+
+        `state` is the planner state before the page was fetched; restoring it refetches that page.
+        """
+        while True:
+            state = self.state()
+            if self.current is None:
+                if not self.pending:
+                    return state, None
+                self.current = self.pending.pop(0) + [1]
+            *shard, page = self.current
+            data = self.search(self.shard_query(shard), page)
+            self.requests += 1
+            if not data or 'items' not in data:
+                logging.warning(f"Search failed for shard {self.shard_query(shard)} page {page}. Skipping the shard.")
+                self.current = None
+                continue
+
+            if self.total_count is None:
+                self.total_count = data.get('total_count', 0)
+            if page == 1:
+                total = data.get('total_count', 0)
+                if total > MAX_RESULTS:
+                    parts = self.split(shard)
+                    if parts:
+                        logging.info(f"Shard {self.shard_query(shard)} has {total} results. Splitting it.")
+                        self.pending[:0] = parts
+                        self.current = None
+                        continue
+                    logging.warning(f"Shard {self.shard_query(shard)} has {total} results; only {MAX_RESULTS} are reachable.")
+                    self.truncated.append({"query": self.shard_query(shard), "total_count": total})
+                self.shards += 1
+
+            items = []
+            for item in data['items']:
+                key = f"{item['repository']['full_name']}/{item['path']}"
+                if key not in self.seen:
+                    self.seen.add(key)
+                    items.append(item)
+
+            if len(data['items']) < PER_PAGE or page * PER_PAGE >= min(data.get('total_count', 0), MAX_RESULTS):
+                self.current = None
+            else:
+                self.current = shard + [page + 1]
+            return state, items
+
+    def report(self):
+        unique = len(self.seen)
+        return {
+            "total_count": self.total_count,
+            "unique_hits": unique,
+            "coverage": round(unique / self.total_count, 4) if self.total_count else 1.0,
+            "shards": self.shards,
+            "truncated_shards": self.truncated,
+            "search_requests": self.requests,
+        }
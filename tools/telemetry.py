@@ -0,0 +1,324 @@
+"""
+Description: Request-level telemetry for the GitHub tools (github_stats.py, github_graphql.py, action_usage.py).
+
+Every API request sent through the shared client (github_client.py) is recorded under its endpoint
+class (pulls, pull_commits, issues, issue_comments, search, contents, repo, graphql, other) with its
+status, latency, response bytes and transport-level retries. 403/429 replies are counted as rate-limit
+or abuse (secondary rate limit) events. The callers time JSON decoding through decode(), and the
+shared limiters (rate_limiter.py) report the time threads spend sleeping, split into pacing (waiting
+for the token bucket) and backoff (pauses after a rate-limit reply or an exhausted budget).
+
+The metrics of a run can be written as a JSON summary, in the Prometheus text exposition format (for
+a node_exporter textfile collector or a Pushgateway), and as a Chrome trace (chrome://tracing or
+https://ui.perfetto.dev) with one span per request, decode and sleep on the thread that did it.
+Latency, decode and sleep seconds are summed over all worker threads, so they can add up to more
+than the wall time of the run.
+"""
+
+import bisect
+import json
+import re
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+
+# Upper bounds of the latency histogram, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+# First match wins; paths may carry a GitHub Enterprise prefix such as /api/v3
+ENDPOINT_CLASSES = [
+    (re.compile(r'/search/'), "search"),
+    (re.compile(r'/graphql$'), "graphql"),
+    (re.compile(r'/pulls/\d+/commits$'), "pull_commits"),
+    (re.compile(r'/issues/\d+/comments$'), "issue_comments"),
+    (re.compile(r'/repos/[^/]+/[^/]+/pulls$'), "pulls"),
+    (re.compile(r'/repos/[^/]+/[^/]+/issues$'), "issues"),
+    (re.compile(r'/repos/[^/]+/[^/]+/contents/'), "contents"),
+    (re.compile(r'/repos/[^/]+/[^/]+$'), "repo"),
+]
+REPO_PATTERN = re.compile(r'/repos/([^/]+/[^/]+)')
+
+
+def endpoint_class(url):
+    path = urlparse(url).path.rstrip('/')
+    for pattern, name in ENDPOINT_CLASSES:
+        if pattern.search(path):
+            return name
+    return "other"
+
+
+def rate_limit_kind(response):
+    """'abuse', 'rate_limit' or None; the same replies rate_limiter.is_rate_limited retries."""
+    if response.status_code == 429:
+        return "rate_limit"
+    if response.status_code != 403:
+        return None
+    text = response.text.lower()
+    if 'abuse' in text or 'secondary rate limit' in text:
+        return "abuse"
+    return "rate_limit" if 'rate limit' in text else None
+
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # the last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total, result = 0, []
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            result.append((bound, total))
+        return result
+
+    def quantile(self, share):
+        """Upper bound of the bucket holding the given share of observations."""
+        if not self.count:
+            return None
+        for bound, total in self.cumulative():
+            if total >= share * self.count:
+                return bound
+        return float('inf')
+
+
+class EndpointStats:
+    def __init__(self):
+        self.requests = 0
+        self.statuses = Counter()
+        self.latency = Histogram()
+        self.bytes = 0
+        self.transport_retries = 0
+        self.rate_limited = Counter()
+        self.decodes = 0
+        self.decode_seconds = 0.0
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "statuses": {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            "seconds": round(self.latency.sum, 3),
+            "mean_ms": round(self.latency.sum / self.latency.count * 1000, 1) if self.latency.count else None,
+            "p50_le_s": self.latency.quantile(0.5),
+            "p95_le_s": self.latency.quantile(0.95),
+            "latency_buckets": {("+Inf" if bound == float('inf') else str(bound)): total
+                                for bound, total in self.latency.cumulative()},
+            "bytes": self.bytes,
+            "retries": self.transport_retries + sum(self.rate_limited.values()),
+            "transport_retries": self.transport_retries,
+            "rate_limited": self.rate_limited["rate_limit"],
+            "abuse": self.rate_limited["abuse"],
+            "decode_seconds": round(self.decode_seconds, 3),
+        }
+
+
+class Telemetry:
+    """Thread-safe metrics of one run. With trace=True every span is kept for the Chrome trace."""
+
+    def __init__(self, trace=False, by_repo=False):
+        self.by_repo = by_repo
+        self._origin = time.perf_counter()
+        self.endpoints = {}
+        # repo -> endpoint class -> [requests, seconds, bytes]
+        self.repos = {}
+        # (limiter resource, reason) -> [sleeps, seconds]
+        self.sleeps = {}
+        self.events = [] if trace else None
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _endpoint(self, name):
+        stats = self.endpoints.get(name)
+        if stats is None:
+            stats = self.endpoints[name] = EndpointStats()
+        return stats
+
+    def _span(self, name, category, start, seconds, args):
+        thread = threading.current_thread()
+        self._threads[thread.ident] = thread.name
+        self.events.append({"name": name, "cat": category, "ph": "X", "pid": 1, "tid": thread.ident,
+                            "ts": round((start - self._origin) * 1e6), "dur": round(seconds * 1e6), "args": args})
+
+    def record_request(self, method, url, start, response=None, error=None):
+        seconds = time.perf_counter() - start
+        name = endpoint_class(url)
+        status = response.status_code if response is not None else type(error).__name__
+        size = len(response.content) if response is not None else 0
+        kind = rate_limit_kind(response) if response is not None else None
+        retries = getattr(getattr(getattr(response, 'raw', None), 'retries', None), 'history', None) or ()
+        repo = REPO_PATTERN.search(urlparse(url).path) if self.by_repo else None
+        with self._lock:
+            stats = self._endpoint(name)
+            stats.requests += 1
+            stats.statuses[status] += 1
+            stats.latency.observe(seconds)
+            stats.bytes += size
+            stats.transport_retries += len(retries)
+            if kind:
+                stats.rate_limited[kind] += 1
+            if repo:
+                totals = self.repos.setdefault(repo.group(1), {}).setdefault(name, [0, 0.0, 0])
+                totals[0] += 1
+                totals[1] += seconds
+                totals[2] += size
+            if self.events is not None:
+                self._span(f"{method} {name}", "request", start, seconds,
+                           {"url": url, "status": status, "bytes": size})
+
+    def decode(self, response, parse=None):
+        """response.json(), or parse(response.content), timed under the response's endpoint class."""
+        start = time.perf_counter()
+        try:
+            return parse(response.content) if parse else response.json()
+        finally:
+            seconds = time.perf_counter() - start
+            name = endpoint_class(response.url or "")
+            with self._lock:
+                stats = self._endpoint(name)
+                stats.decodes += 1
+                stats.decode_seconds += seconds
+                if self.events is not None:
+                    self._span(f"decode {name}", "decode", start, seconds, {"bytes": len(response.content)})
+
+    def record_sleep(self, resource, reason, start):
+        seconds = time.perf_counter() - start
+        with self._lock:
+            totals = self.sleeps.setdefault((resource, reason), [0, 0.0])
+            totals[0] += 1
+            totals[1] += seconds
+            if self.events is not None:
+                self._span(f"sleep {resource} ({reason})", "sleep", start, seconds, {})
+
+    def summary(self):
+        with self._lock:
+            endpoints = {name: stats.as_dict() for name, stats in sorted(self.endpoints.items())}
+            sleeps = {}
+            for (resource, reason), (count, seconds) in sorted(self.sleeps.items()):
+                sleeps.setdefault(resource, {})[reason] = {"sleeps": count, "seconds": round(seconds, 3)}
+            repos = {repo: {name: {"requests": count, "seconds": round(seconds, 3), "bytes": size}
+                            for name, (count, seconds, size) in sorted(classes.items())}
+                     for repo, classes in sorted(self.repos.items())}
+        summary = {
+            "wall_seconds": round(time.perf_counter() - self._origin, 3),
+            "requests": sum(stats["requests"] for stats in endpoints.values()),
+            "network_seconds": round(sum(stats["seconds"] for stats in endpoints.values()), 3),
+            "decode_seconds": round(sum(stats["decode_seconds"] for stats in endpoints.values()), 3),
+            "sleep_seconds": round(sum(reason["seconds"] for reasons in sleeps.values() for reason in reasons.values()), 3),
+            "bytes": sum(stats["bytes"] for stats in endpoints.values()),
+            "endpoints": endpoints,
+            "sleeps": sleeps,
+        }
+        if self.by_repo:
+            summary["repos"] = repos
+        return summary
+
+    def prometheus(self):
+        """The metrics in the Prometheus text exposition format."""
+        def labels(**values):
+            return "{" + ",".join(f'{key}="{str(value)}"' for key, value in values.items()) + "}"
+
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            lines.extend(f"{sample_name}{sample_labels} {value}" for sample_name, sample_labels, value in samples)
+
+        with self._lock:
+            endpoints = sorted(self.endpoints.items())
+            family("github_requests_total", "counter", "API requests by endpoint class and status.",
+                   [("github_requests_total", labels(endpoint=name, status=status), count)
+                    for name, stats in endpoints for status, count in sorted(stats.statuses.items(), key=str)])
+            samples = []
+            for name, stats in endpoints:
+                for bound, total in stats.latency.cumulative():
+                    samples.append(("github_request_duration_seconds_bucket",
+                                    labels(endpoint=name, le="+Inf" if bound == float('inf') else bound), total))
+                samples.append(("github_request_duration_seconds_sum", labels(endpoint=name), round(stats.latency.sum, 6)))
+                samples.append(("github_request_duration_seconds_count", labels(endpoint=name), stats.latency.count))
+            family("github_request_duration_seconds", "histogram", "Request latency, including transport retries.", samples)
+            family("github_response_bytes_total", "counter", "Decompressed response body bytes.",
+                   [("github_response_bytes_total", labels(endpoint=name), stats.bytes) for name, stats in endpoints])
+            family("github_request_retries_total", "counter", "Transport retries and rate-limit replies that were retried.",
+                   [("github_request_retries_total", labels(endpoint=name, reason=reason), count)
+                    for name, stats in endpoints
+                    for reason, count in (("transport", stats.transport_retries),
+                                          ("rate_limit", stats.rate_limited["rate_limit"]),
+                                          ("abuse", stats.rate_limited["abuse"]))])
+            family("github_json_decode_seconds_total", "counter", "Time spent decoding JSON responses.",
+                   [("github_json_decode_seconds_total", labels(endpoint=name), round(stats.decode_seconds, 6))
+                    for name, stats in endpoints])
+            sleeps = sorted(self.sleeps.items())
+            family("github_limiter_sleep_seconds_total", "counter", "Time threads slept in the shared rate limiters.",
+                   [("github_limiter_sleep_seconds_total", labels(resource=resource, reason=reason), round(seconds, 6))
+                    for (resource, reason), (_, seconds) in sleeps])
+            family("github_limiter_sleeps_total", "counter", "Sleeps in the shared rate limiters.",
+                   [("github_limiter_sleeps_total", labels(resource=resource, reason=reason), count)
+                    for (resource, reason), (count, _) in sleeps])
+        return "\n".join(lines) + "\n"
+
+    def trace(self):
+        """The recorded spans in the Chrome trace event format."""
+        with self._lock:
+            events = list(self.events or [])
+            names = [{"name": "thread_name", "ph": "M", "pid": 1, "tid": ident, "args": {"name": name}}
+                     for ident, name in self._threads.items()]
+        return {"traceEvents": names + events, "displayTimeUnit": "ms"}
+
+    def report(self):
+        """One console line per endpoint class and per sleeping limiter."""
+        summary = self.summary()
+        lines = [f"Requests: {summary['requests']} in {summary['wall_seconds']:.1f}s wall; network {summary['network_seconds']:.1f}s, "
+                 f"JSON decode {summary['decode_seconds']:.2f}s, limiter sleeps {summary['sleep_seconds']:.1f}s (summed over threads)"]
+        for name, stats in summary["endpoints"].items():
+            lines.append(f"  {name}: {stats['requests']} requests, mean {stats['mean_ms']} ms, p95 <= {stats['p95_le_s']}s, "
+                         f"{stats['bytes'] / 1e6:.1f} MB, {stats['retries']} retries, "
+                         f"{stats['rate_limited']} rate limited, {stats['abuse']} abuse")
+        for resource, reasons in summary["sleeps"].items():
+            for reason, totals in reasons.items():
+                lines.append(f"  {resource} limiter {reason}: {totals['sleeps']} sleeps, {totals['seconds']:.1f}s")
+        return "\n".join(lines)
+
+    def write(self, summary_path=None, prometheus_path=None, trace_path=None):
+        if summary_path:
+            with open(summary_path, 'w', encoding='utf-8') as f:
+                json.dump(self.summary(), f, indent=2)
+        if prometheus_path:
+            with open(prometheus_path, 'w', encoding='utf-8') as f:
+                f.write(self.prometheus())
+        if trace_path:
+            with open(trace_path, 'w', encoding='utf-8') as f:
+                json.dump(self.trace(), f)
+
+
+_telemetry = Telemetry()
+
+
+def configure(trace=False, by_repo=False):
+    """Start a fresh set of metrics; trace=True also keeps every span for the Chrome trace."""
+    global _telemetry
+    _telemetry = Telemetry(trace=trace, by_repo=by_repo)
+    return _telemetry
+
+
+def get_telemetry():
+    return _telemetry
+
+
+def record_request(method, url, start, response=None, error=None):
+    _telemetry.record_request(method, url, start, response, error)
+
+
+def decode(response, parse=None):
+    return _telemetry.decode(response, parse)
+
+
+def record_sleep(resource, reason, start):
+    _telemetry.record_sleep(resource, reason, start)
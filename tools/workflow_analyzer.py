@@ -0,0 +1,123 @@
+"""
+Description: Single-pass analyzer for GitHub Actions workflow files, used by action_usage.py.
+
+Reads a workflow once, line by line, keeping a stack of the enclosing (indent, key) pairs, so each
+key is classified by its real position (jobs.<job>, jobs.<job>.steps[], steps[].with) in O(n).
+Block scalars (run: |) are skipped, so script text that looks like YAML is not misread. It covers
+the block-style YAML workflows are written in; flow mappings ({...}) are kept as raw values.
+"""
+
+ACTION = 'yike5460/intelli-ops'
+# Bumped whenever analyze() output changes, so results cached by blob_cache.py are recomputed
+VERSION = 1
+
+
+def strip_comment(text):
+    """`text` without a trailing `# comment` outside quotes."""
+    if '#' not in text:
+        return text
+    quote = None
+    for i, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in '"\'':
+            quote = char
+        elif char == '#' and (i == 0 or text[i - 1] in ' \t'):
+            return text[:i].rstrip()
+    return text
+
+
+def unquote(value):
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        return value[1:-1]
+    return value
+
+
+def split_key(text):
+    """(key, value) of a `key: value` entry, or (None, text) for a plain scalar."""
+    colon = text.find(':')
+    while colon != -1:
+        if colon + 1 == len(text) or text[colon + 1] in ' \t':
+            return unquote(text[:colon].strip()), text[colon + 1:].strip()
+        colon = text.find(':', colon + 1)
+    return None, text
+
+
+def analyze(content, action=ACTION):
+    """Jobs of a workflow and every step that uses `action`.
+
+    Returns {"jobs": [job ids], "uses": [{"job", "step", "ref", "with"}]}, where "step" is the step
+    name (None if unnamed), "ref" the pinned version (tag, branch or SHA; None if unpinned) and
+    "with" the step's inputs.
+    """
+    jobs = []
+    uses = []
+    # Entries are [indent, key, step]; key is '-' for a list item, whose step dict collects its keys
+    stack = []
+    skip_indent = None
+
+    def close(entry):
+        step = entry[2]
+        if step is None:
+            return
+        ref = step.get('uses')
+        if ref and (ref == action or ref.startswith(action + '@')):
+            uses.append({"job": step['job'], "step": step.get('name'),
+                         "ref": ref.partition('@')[2] or None, "with": step['with']})
+
+    for raw in content.splitlines():
+        stripped = raw.strip()
+        if not stripped:
+            continue
+        indent = len(raw) - len(raw.lstrip())
+        if skip_indent is not None:
+            if indent > skip_indent:
+                continue
+            skip_indent = None
+        if stripped[0] == '#' or stripped in ('---', '...'):
+            continue
+        text = strip_comment(stripped)
+
+        # "- key: value" opens a list item, then continues as a key two columns further in
+        column = indent
+        item = False
+        if text == '-' or text.startswith('- '):
+            item = True
+            while stack and (stack[-1][0] > column or (stack[-1][0] == column and stack[-1][1] == '-')):
+                close(stack.pop())
+            path = [entry[1] for entry in stack]
+            step = None
+            if len(path) == 3 and path[0] == 'jobs' and path[2] == 'steps':
+                step = {'job': path[1], 'with': {}}
+            stack.append([column, '-', step])
+            text = text[1:].lstrip()
+            column = indent + (len(stripped) - len(stripped[1:].lstrip()))
+            if not text:
+                continue
+
+        key, value = split_key(text)
+        if key is None:
+            continue
+        if not item:
+            while stack and stack[-1][0] >= column:
+                close(stack.pop())
+        path = [entry[1] for entry in stack]
+        depth = len(path)
+
+        if depth == 1 and path[0] == 'jobs':
+            jobs.append(key)
+        elif depth == 4 and path[2] == 'steps' and path[0] == 'jobs' and stack[-1][2] is not None:
+            step = stack[-1][2]
+            if key in ('name', 'uses'):
+                step[key] = unquote(value)
+        elif depth == 5 and path[4] == 'with' and path[2] == 'steps' and stack[-2][2] is not None:
+            stack[-2][2]['with'][key] = '' if value[:1] in ('|', '>') else unquote(value)
+
+        if value and value[0] in '|>' and value[1:].strip('+-0123456789') == '':
+            skip_indent = column
+        stack.append([column, key, None])
+
+    while stack:
+        close(stack.pop())
+    return {"jobs": jobs, "uses": uses}